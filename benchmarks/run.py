@@ -0,0 +1,309 @@
+"""
+Benchmarks GeneThesaurus on synthetic data, offline.
+
+    python -m benchmarks.run --genes 45000 --output results.json
+    python -m benchmarks.run --compare old.json results.json
+
+Each stage runs in a fresh process, so that cold starts are cold and the
+peak RSS of a stage is its own.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SRC_DIR = os.path.join(_REPO_DIR, 'src')
+if os.path.isdir(_SRC_DIR):
+    # Benchmark the working tree rather than an installed copy
+    sys.path.insert(0, _SRC_DIR)
+
+from benchmarks import synthetic  # noqa: E402
+
+RELEASE = '2023-01-31'
+DEFAULT_SIZES = (10, 1000, 100000, 1000000)
+_MISS_FRACTION = 0.2
+# Small inputs are repeated until a measurement takes this long
+_MIN_SECONDS = 0.2
+
+
+def _peak_rss():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _in_fresh_process(func, *args):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def _timed(func):
+    # Repeats func until it has run for _MIN_SECONDS, returns seconds per
+    # call
+    n_calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        n_calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= _MIN_SECONDS:
+            return elapsed / n_calls
+
+
+def _with_peak_rss(results):
+    # The peak RSS of the process running a stage, up to its end
+    peak_rss = _peak_rss()
+    for result in results:
+        result['stage_peak_rss_bytes'] = peak_rss
+    return results
+
+
+def _result(name, seconds, n_items=None, **extra):
+    result = {'name': name, 'seconds': seconds}
+    if n_items is not None:
+        result['n_items'] = n_items
+        result['per_second'] = n_items / seconds if seconds else None
+    result.update(extra)
+    return result
+
+
+def measure_import(repeat=5):
+    """
+    Time to import gene_thesaurus in a fresh interpreter.
+    """
+    code = ("import time; start = time.perf_counter(); "
+            "import gene_thesaurus; print(time.perf_counter() - start)")
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        p for p in (_SRC_DIR, env.get('PYTHONPATH')) if p)
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], env=env,
+                             check=True, capture_output=True, text=True)
+        times.append(float(out.stdout))
+    return [_result('import', min(times), repeat=repeat)]
+
+
+def measure_index_build(data_dir):
+    """
+    Time to build the HGNC indexes and the cross-reference table.
+    """
+    from gene_thesaurus.hgnc_translation_provider import \
+        HgncTranslationProvider
+    from gene_thesaurus.ncbi_translation_provider import \
+        NcbiTranslationProvider
+    from gene_thesaurus.xref_translation_provider import \
+        XrefTranslationProvider
+
+    hgnc = HgncTranslationProvider(data_dir, release=RELEASE)
+    start = time.perf_counter()
+    hgnc.build_indexes(force=True)
+    hgnc_seconds = time.perf_counter() - start
+
+    # The constructor builds the table if it is missing, so only the
+    # forced rebuild is timed
+    xref = XrefTranslationProvider(data_dir, hgnc.data_path, hgnc.data_date,
+                                   NcbiTranslationProvider.fetch(data_dir))
+    start = time.perf_counter()
+    xref.build_table(force=True)
+    xref_seconds = time.perf_counter() - start
+    return _with_peak_rss([
+        _result('build_hgnc_indexes', hgnc_seconds,
+                input_bytes=os.path.getsize(hgnc.data_path)),
+        _result('build_xref_table', xref_seconds)])
+
+
+def measure_cold_start(data_dir):
+    """
+    Time from creating a GeneThesaurus to the answer of its first lookup,
+    with the indexes already built.
+    """
+    from gene_thesaurus import GeneThesaurus
+    start = time.perf_counter()
+    gt = GeneThesaurus(data_dir=data_dir, release=RELEASE)
+    gt.translate_genes(['NOTAREALGENE'])
+    symbol_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gt.translate_genes([1], source='entrez_id', target='symbol')
+    entrez_seconds = time.perf_counter() - start
+    return _with_peak_rss([_result('cold_start', symbol_seconds),
+                           _result('cold_start_xref', entrez_seconds)])
+
+
+def _queries(n_genes, seed, size):
+    # Known symbols, previous symbols and aliases, with some misses
+    docs = synthetic.make_hgnc_docs(n_genes, seed)
+    known = [s for doc in docs
+             for s in [doc['symbol'], *doc.get('prev_symbol', []),
+                       *doc.get('alias_symbol', [])]]
+    rng = random.Random(seed)
+    return [rng.choice(known) if rng.random() >= _MISS_FRACTION
+            else f"MISSING{i}" for i in range(size)]
+
+
+def measure_lookups(data_dir, n_genes, seed, sizes):
+    """
+    Warm lookups per second at each input size.
+    """
+    from gene_thesaurus import GeneThesaurus
+    gt = GeneThesaurus(data_dir=data_dir, release=RELEASE)
+    gt.warmup()
+    all_queries = _queries(n_genes, seed, max(sizes))
+
+    results = []
+    for size in sizes:
+        queries = all_queries[:size]
+        results.append(_result(
+            'translate_genes', _timed(lambda: gt.translate_genes(queries)),
+            size))
+        results.append(_result(
+            'update_gene_symbols',
+            _timed(lambda: gt.update_gene_symbols(queries)), size))
+    return _with_peak_rss(results)
+
+
+def run(n_genes, sizes, seed=0):
+    """
+    Runs every benchmark on synthetic data with n_genes HGNC genes.
+
+    Returns:
+        dict: The results, with the environment they were measured in.
+    """
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        synthetic.write_hgnc(data_dir, RELEASE, n_genes, seed)
+        synthetic.write_gene_info(data_dir, n_genes, seed=seed)
+        fixture_seconds = time.perf_counter() - start
+
+        results = measure_import()
+        results += _in_fresh_process(measure_index_build, data_dir)
+        results += _in_fresh_process(measure_cold_start, data_dir)
+        results += _in_fresh_process(measure_lookups, data_dir, n_genes,
+                                     seed, sizes)
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'n_genes': n_genes,
+        'seed': seed,
+        'fixture_seconds': fixture_seconds,
+        'results': results,
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=_REPO_DIR,
+                             check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _key(result):
+    return (result['name'], result.get('n_items'))
+
+
+def compare(old, new, threshold=1.2):
+    """
+    Compares two result sets.
+
+    Args:
+        old (dict): The baseline results.
+        new (dict): The results to check.
+        threshold (float): How many times slower a measurement may get
+        before it counts as a regression. Defaults to 1.2.
+
+    Returns:
+        list: (name, n_items, old seconds, new seconds, ratio, regressed)
+        for each measurement in both.
+    """
+    old_results = {_key(r): r for r in old['results']}
+    rows = []
+    for result in new['results']:
+        baseline = old_results.get(_key(result))
+        if not baseline or not baseline['seconds']:
+            continue
+        ratio = result['seconds'] / baseline['seconds']
+        rows.append((result['name'], result.get('n_items'),
+                     baseline['seconds'], result['seconds'], ratio,
+                     ratio > threshold))
+    return rows
+
+
+def _print_results(report):
+    for result in report['results']:
+        line = f"{result['name']:<22}"
+        if result.get('n_items') is not None:
+            line += f" n={result['n_items']:<10}"
+            line += f" {result['per_second']:>14,.0f}/s"
+        else:
+            line += f" {result['seconds'] * 1000:>12.1f} ms"
+        if result.get('stage_peak_rss_bytes'):
+            line += (f"  peak RSS "
+                     f"{result['stage_peak_rss_bytes'] / 2**20:.0f} MiB")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Benchmark gene-thesaurus on synthetic data.')
+    parser.add_argument('--genes', type=int, default=45000,
+                        help='number of synthetic HGNC genes '
+                             '(default: 45000)')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated lookup input sizes '
+                             '(default: 10,1000,100000,1000000)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed (default: 0)')
+    parser.add_argument('--output', default=None,
+                        help='write the results as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='slowdown ratio that counts as a regression '
+                             'when comparing (default: 1.2)')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as f:
+                reports.append(json.load(f))
+        rows = compare(*reports, threshold=args.threshold)
+        for name, n_items, old, new, ratio, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            size = f" n={n_items}" if n_items is not None else ''
+            print(f"{name}{size}: {old:.6f}s -> {new:.6f}s "
+                  f"({ratio:.2f}x){flag}")
+        return 1 if any(row[-1] for row in rows) else 0
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = run(args.genes, sizes, args.seed)
+    _print_results(report)
+    if args.output:
+        tmp_path = f"{args.output}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        shutil.move(tmp_path, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
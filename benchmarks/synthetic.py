@@ -0,0 +1,135 @@
+"""
+Synthetic HGNC and NCBI data files, shaped like the real downloads, for
+benchmarking without network access.
+"""
+import gzip
+import json
+import os
+import random
+import string
+
+# Roughly the proportions of the real HGNC complete set
+_ALIAS_FRACTION = 0.55
+_PREV_FRACTION = 0.3
+_SHARED_SYNONYM_FRACTION = 0.02
+_ENSEMBL_FRACTION = 0.9
+_ENTREZ_FRACTION = 0.97
+
+GENE_INFO_COLUMNS = (
+    '#tax_id', 'GeneID', 'Symbol', 'LocusTag', 'Synonyms', 'dbXrefs',
+    'chromosome', 'map_location', 'description', 'type_of_gene',
+    'Symbol_from_nomenclature_authority',
+    'Full_name_from_nomenclature_authority', 'Nomenclature_status',
+    'Other_designations', 'Modification_date', 'Feature_type')
+
+
+def _symbol(rng, i):
+    # Letters then digits, like most gene symbols, unique through i
+    letters = ''.join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 5)))
+    return f"{letters}{i}"
+
+
+def make_hgnc_docs(n_genes, seed=0):
+    """
+    Generates HGNC complete set records.
+
+    Args:
+        n_genes (int): The number of genes.
+        seed (int): Seed for the random generator. Defaults to 0.
+
+    Returns:
+        list: The records, with the fields of the real complete set that
+        matter for parsing cost.
+    """
+    rng = random.Random(seed)
+    docs = []
+    synonyms = []
+    for i in range(n_genes):
+        symbol = _symbol(rng, i)
+        doc = {
+            'hgnc_id': f"HGNC:{i + 1}",
+            'symbol': symbol,
+            'name': f"synthetic gene {i}",
+            'status': 'Approved',
+            'locus_group': 'protein-coding gene',
+            'locus_type': 'gene with protein product',
+            'location': f"{rng.randint(1, 22)}q{rng.randint(11, 36)}",
+            'date_approved_reserved': '1990-01-01',
+            'date_modified': '2023-01-01',
+            'uuid': f"{rng.getrandbits(128):032x}",
+        }
+        if rng.random() < _ALIAS_FRACTION:
+            doc['alias_symbol'] = [f"{symbol}A{k}"
+                                   for k in range(rng.randint(1, 4))]
+        if rng.random() < _PREV_FRACTION:
+            doc['prev_symbol'] = [f"{symbol}P{k}"
+                                  for k in range(rng.randint(1, 2))]
+        if synonyms and rng.random() < _SHARED_SYNONYM_FRACTION:
+            # A synonym used by several genes
+            doc.setdefault('alias_symbol', []).append(rng.choice(synonyms))
+        synonyms.extend(doc.get('alias_symbol', []))
+        if rng.random() < _ENSEMBL_FRACTION:
+            doc['ensembl_gene_id'] = f"ENSG{i + 1:011d}"
+        if rng.random() < _ENTREZ_FRACTION:
+            doc['entrez_id'] = str(i + 1)
+        docs.append(doc)
+    return docs
+
+
+def write_hgnc(data_dir, date, n_genes, seed=0):
+    """
+    Writes hgnc_complete_set_{date}.json with synthetic records.
+
+    Returns:
+        str: The path to the file.
+    """
+    docs = make_hgnc_docs(n_genes, seed)
+    path = os.path.join(data_dir, f"hgnc_complete_set_{date}.json")
+    with open(path, 'w') as f:
+        json.dump({'responseHeader': {'status': 0},
+                   'response': {'numFound': len(docs), 'start': 0,
+                                'docs': docs}}, f)
+    return path
+
+
+def write_gene_info(data_dir, n_genes, n_extra=None, seed=0):
+    """
+    Writes Homo_sapiens.gene_info.gz with one row per synthetic HGNC gene
+    that has an Entrez ID, plus NCBI-only genes.
+
+    Args:
+        data_dir (str): Where to write the file.
+        n_genes (int): The number of HGNC genes, as in write_hgnc.
+        n_extra (int): The number of NCBI-only genes. Defaults to three
+        times n_genes, like the real file.
+        seed (int): The seed used for write_hgnc. Defaults to 0.
+
+    Returns:
+        str: The path to the file.
+    """
+    if n_extra is None:
+        n_extra = 3 * n_genes
+    path = os.path.join(data_dir, 'Homo_sapiens.gene_info.gz')
+    with gzip.open(path, 'wt', compresslevel=6) as f:
+        f.write('\t'.join(GENE_INFO_COLUMNS) + '\n')
+        for doc in make_hgnc_docs(n_genes, seed):
+            if 'entrez_id' not in doc:
+                continue
+            xrefs = [f"HGNC:{doc['hgnc_id']}"]
+            if 'ensembl_gene_id' in doc:
+                xrefs.append(f"Ensembl:{doc['ensembl_gene_id']}")
+            synonyms = '|'.join(doc.get('alias_symbol', [])) or '-'
+            f.write(_gene_info_row(doc['entrez_id'], doc['symbol'], synonyms,
+                                   '|'.join(xrefs), doc['name']))
+        for i in range(n_extra):
+            gene_id = 100000000 + i
+            f.write(_gene_info_row(gene_id, f"LOC{gene_id}", '-', '-',
+                                   'uncharacterized locus'))
+    return path
+
+
+def _gene_info_row(gene_id, symbol, synonyms, db_xrefs, description):
+    return '\t'.join([
+        '9606', str(gene_id), symbol, '-', synonyms, db_xrefs, '1',
+        '1p36.33', description, 'protein-coding', symbol, description,
+        'O', description, '20230101', '-']) + '\n'
@@ -1,3 +1,27 @@
-from .gene_thesaurus import GeneThesaurus
+import importlib
 
-__all__ = ["GeneThesaurus"]
+# Each public name is imported from its module on first use, so that
+# `import gene_thesaurus` stays cheap and only loads what is used
+_EXPORTS = {
+    "GeneThesaurus": ".gene_thesaurus",
+    "ProviderRegistry": ".provider_registry",
+    "AsyncGeneThesaurus": ".async_gene_thesaurus",
+    "GeneThesaurusClient": ".client",
+    "SymbolCandidate": ".symbol_multimap",
+}
+
+__all__ = ["GeneThesaurus", "ProviderRegistry", "AsyncGeneThesaurus",
+           "GeneThesaurusClient", "SymbolCandidate"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,4 @@
+import sys
+from gene_thesaurus.cli import main
+
+sys.exit(main())
@@ -0,0 +1,140 @@
+import asyncio
+import functools
+import logging
+from gene_thesaurus.gene_thesaurus import GeneThesaurus
+
+
+class AsyncGeneThesaurus:
+    """
+    asyncio interface to GeneThesaurus for service deployments.
+
+    Each call first resolves the providers it needs in an executor, where
+    downloading, parsing, index builds and refreshes happen, so they never
+    block the event loop. Concurrent calls that need the same providers
+    wait for the same resolution. The lookups themselves then run directly
+    on the loop, as they only search indexes that are already open.
+    """
+
+    def __init__(self,
+                 data_dir='/tmp',
+                 executor=None,
+                 refresh_interval=60,
+                 **kwargs):
+        """
+        Args:
+            data_dir (str): Where downloaded data and indexes are cached.
+            Defaults to '/tmp'.
+            executor (concurrent.futures.Executor): Where data is loaded.
+            Defaults to the event loop's default executor.
+            refresh_interval (float): Minimum number of seconds between
+            checks for a newer cached HGNC release. Defaults to 60.
+            **kwargs: Passed on to GeneThesaurus.
+        """
+        self.__thesaurus = GeneThesaurus(data_dir=data_dir,
+                                         refresh_interval=refresh_interval,
+                                         **kwargs)
+        self.__executor = executor
+        self.__loading = {}
+        self.logger = logging.getLogger(__class__.__name__)
+
+    @property
+    def thesaurus(self) -> GeneThesaurus:
+        """The underlying GeneThesaurus, for synchronous lookups."""
+        return self.__thesaurus
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def _ensure_loaded(self, datasets, release=None):
+        # Coalesce concurrent requests onto a single resolution
+        key = (tuple(datasets), release)
+        task = self.__loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(*key))
+            self.__loading[key] = task
+            task.add_done_callback(lambda _: self.__loading.pop(key, None))
+        await asyncio.shield(task)
+
+    async def _load(self, datasets, release):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.__executor,
+            functools.partial(self.__thesaurus.warmup, datasets,
+                              release=release))
+
+    async def warmup(self, datasets=('hgnc', 'ncbi'), release=None):
+        """
+        Loads the given datasets ahead of the first lookup.
+
+        Args:
+            datasets (tuple): Any of 'hgnc' and 'ncbi'.
+            Defaults to both.
+            release (str): HGNC release date ('YYYY-MM-DD') to load.
+            Defaults to None (the release of this instance).
+        """
+        await self._ensure_loaded(datasets, release)
+
+    async def update_gene_symbols(self, gene_list, **kwargs):
+        """
+        Async version of GeneThesaurus.update_gene_symbols, with the same
+        keyword arguments.
+        """
+        await self._ensure_loaded(('hgnc',), kwargs.get('release'))
+        return self.__thesaurus.update_gene_symbols(gene_list, **kwargs)
+
+    async def translate_genes(self,
+                              gene_list: list,
+                              source: str = 'symbol',
+                              target: str = 'ensembl_id',
+                              **kwargs):
+        """
+        Async version of GeneThesaurus.translate_genes, with the same
+        keyword arguments.
+        """
+        await self._ensure_loaded(
+            self.__thesaurus.datasets_for(source, target),
+            kwargs.get('release'))
+        return self.__thesaurus.translate_genes(gene_list, source, target,
+                                                **kwargs)
+
+    async def translate_iter(self,
+                             genes,
+                             source: str = 'symbol',
+                             target: str = 'ensembl_id',
+                             **kwargs):
+        """
+        Async version of GeneThesaurus.translate_iter. The returned
+        iterator looks up each chunk on the loop as it is consumed.
+        """
+        await self._ensure_loaded(
+            self.__thesaurus.datasets_for(source, target))
+        return self.__thesaurus.translate_iter(genes, source, target,
+                                               **kwargs)
+
+    async def translate_array(self,
+                              values,
+                              source: str = 'symbol',
+                              target: str = 'ensembl_id',
+                              **kwargs):
+        """
+        Async version of GeneThesaurus.translate_array.
+        """
+        await self._ensure_loaded(
+            self.__thesaurus.datasets_for(source, target))
+        return self.__thesaurus.translate_array(values, source, target,
+                                                **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Same as GeneThesaurus.stats.
+        """
+        return self.__thesaurus.stats()
+
+    def close(self):
+        """
+        Releases the loaded data.
+        """
+        self.__thesaurus.close()
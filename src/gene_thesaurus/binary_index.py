@@ -0,0 +1,183 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+class BinaryIndexException(Exception):
+    def __init__(self, message="Invalid binary index file."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class BinaryIndex(Mapping):
+    """
+    Read-only string to string mapping stored in a compact binary file,
+    which is opened with mmap and queried in place.
+
+    The file holds the keys in sorted order, so lookups are a binary
+    search over the mapped pages and no dict is ever built. Processes that
+    open the same file share its pages through the OS page cache.
+
+    Layout (little-endian):
+        header          magic, number of entries
+        key offsets     (n + 1) x uint32, into the key blob
+        value offsets   (n + 1) x uint32, into the value blob
+        key blob        UTF-8 keys, concatenated in sorted order
+        value blob      values, concatenated in key order
+    """
+    _MAGIC = b'GTIDX001'
+    _HEADER = struct.Struct('<8sQ')
+
+    def __init__(self, path):
+        self.__path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < self._HEADER.size:
+                raise BinaryIndexException(
+                    f"{path} is not a binary index file.")
+            self.__mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n = self._HEADER.unpack_from(self.__mm, 0)
+        if magic != self._MAGIC:
+            self.__mm.close()
+            raise BinaryIndexException(f"{path} is not a binary index file.")
+
+        self.__n = n
+        offsets_start = self._HEADER.size
+        offsets_end = offsets_start + 2 * (n + 1) * 4
+        self.__key_offsets = self._offsets(offsets_start, n + 1)
+        self.__value_offsets = self._offsets(offsets_start + (n + 1) * 4,
+                                             n + 1)
+        self.__keys_start = offsets_end
+        self.__values_start = offsets_end + self.__key_offsets[n]
+
+    def _offsets(self, start, count):
+        view = memoryview(self.__mm)[start:start + count * 4]
+        if sys.byteorder == 'little':
+            return view.cast('I')
+        # Big-endian hosts pay for a private copy of the offsets
+        offsets = array('I', view)
+        offsets.byteswap()
+        return offsets
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def nbytes(self):
+        return len(self.__mm)
+
+    def __len__(self):
+        return self.__n
+
+    def key_bytes(self, i):
+        start = self.__keys_start
+        return self.__mm[start + self.__key_offsets[i]:
+                         start + self.__key_offsets[i + 1]]
+
+    def value_bytes(self, i):
+        start = self.__values_start
+        return self.__mm[start + self.__value_offsets[i]:
+                         start + self.__value_offsets[i + 1]]
+
+    def find(self, key):
+        """
+        Returns the position of key in the index, or -1 if it is missing.
+        """
+        if isinstance(key, str):
+            key = key.encode('utf8')
+        lo, hi = self._bisect_left(key), self.__n
+        if lo < hi and self.key_bytes(lo) == key:
+            return lo
+        return -1
+
+    def _bisect_left(self, key):
+        lo, hi = 0, self.__n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            raise KeyError(key)
+        i = self.find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.value_bytes(i).decode('utf8')
+
+    def get(self, key, default=None):
+        if not isinstance(key, str):
+            return default
+        i = self.find(key)
+        if i < 0:
+            return default
+        return self.value_bytes(i).decode('utf8')
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.find(key) >= 0
+
+    def __iter__(self):
+        for i in range(self.__n):
+            yield self.key_bytes(i).decode('utf8')
+
+    def close(self):
+        # Views on the map have to be released before it can be closed
+        if isinstance(self.__key_offsets, memoryview):
+            self.__key_offsets.release()
+            self.__value_offsets.release()
+        self.__mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def write(cls, path, mapping):
+        """
+        Writes a binary index file. The file is written next to its final
+        location and then renamed into place, so readers never see a
+        partially written index.
+
+        Args:
+            path (str): Where to write the index.
+            mapping (dict): The keys and values, as str or bytes.
+        """
+        items = sorted((cls._encode(k), cls._encode(v))
+                       for k, v in mapping.items())
+
+        key_offsets = array('I', [0])
+        value_offsets = array('I', [0])
+        for key, value in items:
+            key_offsets.append(key_offsets[-1] + len(key))
+            value_offsets.append(value_offsets[-1] + len(value))
+        if sys.byteorder != 'little':
+            key_offsets.byteswap()
+            value_offsets.byteswap()
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(cls._HEADER.pack(cls._MAGIC, len(items)))
+            f.write(key_offsets.tobytes())
+            f.write(value_offsets.tobytes())
+            for key, _ in items:
+                f.write(key)
+            for _, value in items:
+                f.write(value)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _encode(s):
+        if s is None:
+            return b''
+        if isinstance(s, bytes):
+            return s
+        return str(s).encode('utf8')
@@ -0,0 +1,237 @@
+import csv
+import gzip
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from gene_thesaurus.gene_thesaurus import GeneThesaurus
+
+logger = logging.getLogger(__name__)
+
+# Each worker process holds one GeneThesaurus. Its indexes are memory-mapped
+# from the shared data directory, so all workers share the same pages.
+_worker_thesaurus = None
+
+_CHUNK_SIZE = 10000
+
+
+def _init_worker(data_dir, release):
+    global _worker_thesaurus
+    _worker_thesaurus = GeneThesaurus(data_dir=data_dir, release=release)
+
+
+def _open_text(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf8', newline='')
+    return open(path, mode, encoding='utf8', newline='')
+
+
+def _column_index(header, column, path):
+    if column not in header:
+        raise ValueError(f"Error: column {column} not found in {path}.")
+    return header.index(column)
+
+
+def _guess_sep(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return ',' if name.endswith('.csv') else '\t'
+
+
+class _RowTranslator:
+    """
+    Rewrites one column of parsed rows, a chunk at a time.
+    """
+
+    def __init__(self, column_index, source, target, fill_value,
+                 keep_unmapped):
+        self.column_index = column_index
+        self.source = source
+        self.target = target
+        self.fill_value = fill_value
+        self.keep_unmapped = keep_unmapped
+
+    def translate(self, rows):
+        values = {row[self.column_index] for row in rows
+                  if len(row) > self.column_index}
+        if self.source == 'entrez_id':
+            values = {v for v in values if v.strip().isdigit()}
+        translated = dict(_worker_thesaurus.translate_iter(
+            values, self.source, self.target))
+
+        for row in rows:
+            if len(row) <= self.column_index:
+                continue
+            value = row[self.column_index]
+            new_value = translated.get(value)
+            if new_value is None:
+                new_value = value if self.keep_unmapped else self.fill_value
+            row[self.column_index] = new_value
+        return rows
+
+
+def _translate_rows(reader, writer, translator):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) == _CHUNK_SIZE:
+            writer.writerows(translator.translate(chunk))
+            chunk = []
+    if chunk:
+        writer.writerows(translator.translate(chunk))
+
+
+def _translate_whole_file(path, out_path, sep, column, translator_args):
+    with _open_text(path, 'r') as f_in, _open_text(out_path, 'w') as f_out:
+        reader = csv.reader(f_in, delimiter=sep)
+        writer = csv.writer(f_out, delimiter=sep, lineterminator='\n')
+        header = next(reader)
+        writer.writerow(header)
+        translator = _RowTranslator(_column_index(header, column, path),
+                                    *translator_args)
+        _translate_rows(reader, writer, translator)
+    return out_path
+
+
+def _iter_range_lines(f, start, end):
+    # A line belongs to the range that holds its first byte. Unless the
+    # range starts right after a newline, skip the line in progress.
+    f.seek(start - 1)
+    f.readline()
+    while f.tell() < end:
+        line = f.readline()
+        if not line:
+            return
+        yield line.decode('utf8')
+
+
+def _translate_range(path, part_path, start, end, sep, column_index,
+                     translator_args):
+    with open(path, 'rb') as f_in, \
+            open(part_path, 'w', encoding='utf8', newline='') as f_out:
+        reader = csv.reader(_iter_range_lines(f_in, start, end),
+                            delimiter=sep)
+        writer = csv.writer(f_out, delimiter=sep, lineterminator='\n')
+        translator = _RowTranslator(column_index, *translator_args)
+        _translate_rows(reader, writer, translator)
+    return part_path
+
+
+def _split_ranges(data_start, size, split_size):
+    starts = list(range(data_start, size, split_size)) or [data_start]
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def translate_files(paths,
+                    output_dir,
+                    column,
+                    source='symbol',
+                    target='ensembl_id',
+                    data_dir='/tmp',
+                    workers=None,
+                    split_size=64 * 1024 * 1024,
+                    sep=None,
+                    fill_value='',
+                    keep_unmapped=False):
+    """
+    Rewrites a named column of TSV/CSV files, optionally gzipped, from one
+    identifier type to another, using a pool of worker processes.
+
+    Uncompressed files larger than split_size are split into byte ranges
+    that are translated in parallel. Quoted fields must then not contain
+    newlines. Output is streamed to disk as it is produced.
+
+    Args:
+        paths (list): The files to translate.
+        output_dir (str): Where to write the translated files, under the
+        same names.
+        column (str): The header of the column to translate.
+        source (str): The format of the input genes. Defaults to 'symbol'.
+        target (str): The format of the output genes.
+        Defaults to 'ensembl_id'.
+        data_dir (str): Where downloaded data and indexes are cached.
+        workers (int): Number of worker processes. Defaults to the number
+        of CPUs.
+        split_size (int): Size in bytes of the ranges large files are split
+        into. Defaults to 64 MiB.
+        sep (str): The field separator. Defaults to ',' for .csv files and
+        a tab otherwise.
+        fill_value (str): The value for genes that cannot be translated.
+        Defaults to ''.
+        keep_unmapped (bool): Keep the original value of genes that cannot
+        be translated instead of using fill_value. Defaults to False.
+
+    Returns:
+        list: The paths of the translated files.
+    """
+    # Outputs keep the names of their inputs, so these must not clash
+    out_paths = [os.path.join(output_dir, os.path.basename(path))
+                 for path in paths]
+    for path, out_path in zip(paths, out_paths):
+        if os.path.abspath(out_path) == os.path.abspath(path):
+            raise ValueError(
+                f"Error: {path} would be overwritten by its output.")
+    names = [os.path.basename(path) for path in paths]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(
+            f"Error: several files are named {', '.join(duplicates)}, so "
+            f"their outputs would overwrite each other.")
+
+    # Validate the pair and make sure its indexes are built, so the
+    # workers only ever open them
+    gt = GeneThesaurus(data_dir=data_dir)
+    gt.translate_genes([], source=source, target=target)
+    release = gt.hgnc_release
+    gt.close()
+
+    os.makedirs(output_dir, exist_ok=True)
+    translator_args = (source, target, fill_value, keep_unmapped)
+    split_jobs = []
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(data_dir, release)) as executor:
+        futures = []
+        for path, out_path in zip(paths, out_paths):
+            file_sep = sep or _guess_sep(path)
+            size = os.path.getsize(path)
+
+            if path.endswith('.gz') or size <= split_size:
+                futures.append(executor.submit(
+                    _translate_whole_file, path, out_path, file_sep, column,
+                    translator_args))
+                continue
+
+            # Large plain files are translated in byte ranges, into part
+            # files that are concatenated after the header afterwards
+            with open(path, 'rb') as f:
+                header_line = f.readline()
+                data_start = f.tell()
+            header = next(csv.reader([header_line.decode('utf8')],
+                                     delimiter=file_sep))
+            part_futures = []
+            for i, (start, end) in enumerate(
+                    _split_ranges(data_start, size, split_size)):
+                part_path = f"{out_path}.part{i}"
+                part_futures.append(executor.submit(
+                    _translate_range, path, part_path, start, end, file_sep,
+                    _column_index(header, column, path), translator_args))
+            split_jobs.append((out_path, header, file_sep, part_futures))
+            futures.extend(part_futures)
+
+        for future in futures:
+            future.result()
+
+    for out_path, header, file_sep, part_futures in split_jobs:
+        with open(out_path, 'w', encoding='utf8', newline='') as f_out:
+            csv.writer(f_out, delimiter=file_sep,
+                       lineterminator='\n').writerow(header)
+            for future in part_futures:
+                part_path = future.result()
+                with open(part_path, 'r', encoding='utf8',
+                          newline='') as f_part:
+                    shutil.copyfileobj(f_part, f_out)
+                os.remove(part_path)
+
+    logger.info(f"Translated {len(out_paths)} files into {output_dir}")
+    return out_paths
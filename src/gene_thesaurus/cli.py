@@ -0,0 +1,186 @@
+import argparse
+import logging
+import sys
+from gene_thesaurus.bulk_translate import translate_files
+from gene_thesaurus.hgnc_translation_provider import HgncTranslationProvider
+from gene_thesaurus.ncbi_translation_provider import NcbiTranslationProvider
+from gene_thesaurus.server import DEFAULT_HOST, DEFAULT_PORT, \
+    TranslationServer
+from gene_thesaurus.xref_translation_provider import XrefTranslationProvider
+
+
+def build_index(args):
+    hgnc = HgncTranslationProvider(data_dir=args.data_dir,
+                                   release=args.release)
+    hgnc.build_indexes(force=args.force)
+    hgnc.close()
+    print(f"Built HGNC indexes for {hgnc.data_date} in {args.data_dir}")
+
+    if args.ncbi:
+        xref = XrefTranslationProvider(
+            args.data_dir, hgnc.data_path, hgnc.data_date,
+            NcbiTranslationProvider.fetch(args.data_dir), force=args.force)
+        xref.close()
+        print(f"Built cross-reference table in {args.data_dir}")
+
+
+def translate(args):
+    out_paths = translate_files(args.files,
+                                output_dir=args.output_dir,
+                                column=args.column,
+                                source=args.source,
+                                target=args.target,
+                                data_dir=args.data_dir,
+                                workers=args.workers,
+                                split_size=args.split_size,
+                                sep=args.sep,
+                                fill_value=args.fill_value,
+                                keep_unmapped=args.keep_unmapped)
+    for out_path in out_paths:
+        print(out_path)
+
+
+def serve(args):
+    server = TranslationServer(host=args.host,
+                               port=args.port,
+                               data_dir=args.data_dir,
+                               release=args.release,
+                               cache_size=args.cache_size,
+                               batch_window=args.batch_window / 1000)
+    server.warmup(args.datasets.split(','))
+    print(f"Serving gene translations on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def prune(args):
+    pruned = HgncTranslationProvider.prune_releases(args.data_dir,
+                                                    keep=args.keep)
+    for release in pruned:
+        print(f"Pruned HGNC {release}, kept in the release store")
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='gene-thesaurus',
+        description='Translate between gene identifiers using HGNC '
+                    'and NCBI data.')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='log progress to stderr')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_index_parser = subparsers.add_parser(
+        'build-index',
+        help='download the latest data and prebuild all indexes')
+    build_index_parser.add_argument(
+        '--data-dir', default='/tmp',
+        help='where data and indexes are stored (default: /tmp)')
+    build_index_parser.add_argument(
+        '--release', default=None,
+        help='HGNC release date (YYYY-MM-DD) to build, instead of the latest')
+    build_index_parser.add_argument(
+        '--force', action='store_true',
+        help='rebuild indexes that already exist')
+    build_index_parser.add_argument(
+        '--ncbi', action='store_true',
+        help='also download NCBI data and build the cross-reference '
+             'table')
+    build_index_parser.set_defaults(func=build_index)
+
+    translate_parser = subparsers.add_parser(
+        'translate',
+        help='rewrite a column of TSV/CSV files, optionally gzipped, from '
+             'one identifier type to another')
+    translate_parser.add_argument(
+        'files', nargs='+', help='the files to translate')
+    translate_parser.add_argument(
+        '--column', required=True,
+        help='header of the column to translate')
+    translate_parser.add_argument(
+        '--source', default='symbol',
+        help='identifier type of the column (default: symbol)')
+    translate_parser.add_argument(
+        '--target', default='ensembl_id',
+        help='identifier type to translate to (default: ensembl_id)')
+    translate_parser.add_argument(
+        '--output-dir', required=True,
+        help='where to write the translated files, under the same names')
+    translate_parser.add_argument(
+        '--data-dir', default='/tmp',
+        help='where data and indexes are stored (default: /tmp)')
+    translate_parser.add_argument(
+        '--workers', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    translate_parser.add_argument(
+        '--split-size', type=int, default=64 * 1024 * 1024,
+        help='split uncompressed files larger than this many bytes into '
+             'ranges translated in parallel (default: 64 MiB)')
+    translate_parser.add_argument(
+        '--sep', default=None,
+        help="field separator (default: ',' for .csv files, else tab)")
+    translate_parser.add_argument(
+        '--fill-value', default='',
+        help='value for genes that cannot be translated (default: empty)')
+    translate_parser.add_argument(
+        '--keep-unmapped', action='store_true',
+        help='keep the original value of genes that cannot be translated')
+    translate_parser.set_defaults(func=translate)
+
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help='host the data once and answer lookups from local clients '
+             'over HTTP')
+    serve_parser.add_argument(
+        '--host', default=DEFAULT_HOST,
+        help=f'address to listen on (default: {DEFAULT_HOST})')
+    serve_parser.add_argument(
+        '--port', type=int, default=DEFAULT_PORT,
+        help=f'port to listen on (default: {DEFAULT_PORT})')
+    serve_parser.add_argument(
+        '--data-dir', default='/tmp',
+        help='where data and indexes are stored (default: /tmp)')
+    serve_parser.add_argument(
+        '--release', default=None,
+        help='HGNC release date (YYYY-MM-DD) to serve, instead of the latest')
+    serve_parser.add_argument(
+        '--datasets', default='hgnc,ncbi',
+        help='comma-separated datasets to load at startup '
+             '(default: hgnc,ncbi)')
+    serve_parser.add_argument(
+        '--cache-size', type=int, default=100000,
+        help='number of recent lookup results to cache (default: 100000)')
+    serve_parser.add_argument(
+        '--batch-window', type=float, default=2,
+        help='milliseconds to wait for concurrent requests to batch '
+             'together (default: 2)')
+    serve_parser.set_defaults(func=serve)
+
+    prune_parser = subparsers.add_parser(
+        'prune',
+        help='remove the files of older HGNC releases, which can still '
+             'be pinned')
+    prune_parser.add_argument(
+        '--data-dir', default='/tmp',
+        help='where data and indexes are stored (default: /tmp)')
+    prune_parser.add_argument(
+        '--keep', type=int, default=1,
+        help='number of the newest releases to keep in full (default: 1)')
+    prune_parser.set_defaults(func=prune)
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO)
+    args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
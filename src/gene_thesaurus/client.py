@@ -0,0 +1,156 @@
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from gene_thesaurus.gene_thesaurus import GeneThesaurus
+from gene_thesaurus.release_store import ReleaseDiff
+from gene_thesaurus.server import DEFAULT_HOST, DEFAULT_PORT
+from gene_thesaurus.symbol_multimap import SymbolCandidate
+from gene_thesaurus.translation_provider import TranslationProvider
+
+
+class ServerException(Exception):
+    """
+    Raised when the translation server cannot answer a request.
+    """
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class _RemoteProvider(TranslationProvider):
+    """
+    Translation provider that forwards lookups to a TranslationServer.
+    """
+
+    def __init__(self, url, timeout, pool_size):
+        super().__init__()
+        self.__url = url
+        self.__timeout = timeout
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.__session.mount('http://', adapter)
+        self.logger = logging.getLogger(__class__.__name__)
+
+    def _request(self, method, path, payload=None):
+        try:
+            r = self.__session.request(method, self.__url + path,
+                                       json=payload, timeout=self.__timeout)
+        except requests.exceptions.RequestException as e:
+            raise ServerException(
+                f"Error: no answer from {self.__url}: {e}") from e
+        if r.status_code == 400:
+            raise ValueError(r.json()['error'])
+        if r.status_code != 200:
+            raise ServerException(
+                f"Error: {self.__url}{path} returned {r.status_code}: "
+                f"{r.text}")
+        return r.json()
+
+    @property
+    def data_date(self):
+        return self._request('GET', '/info')['hgnc_release']
+
+    def load(self):
+        # The server holds the data, so only check that it answers
+        self._request('GET', '/info')
+        return self
+
+    def close(self):
+        self.__session.close()
+
+    def lookup(self,
+               gene_list: list,
+               source: TranslationProvider._IDENTIFIER_TYPES,
+               target: TranslationProvider._IDENTIFIER_TYPES) -> list:
+        payload = {'genes': list(gene_list), 'source': source,
+                   'target': target}
+        return self._request('POST', '/lookup', payload)['results']
+
+    def lookup_symbols(self, gene_list):
+        return self.lookup(gene_list, 'symbol', None)
+
+    def lookup_candidates(self, gene_list, normalize=False):
+        target = 'normalized_candidates' if normalize else 'candidates'
+        return [[SymbolCandidate(*candidate) for candidate in candidates]
+                for candidates in self.lookup(gene_list, 'symbol', target)]
+
+    def complete(self, prefix, limit=10):
+        payload = {'prefix': prefix, 'limit': limit}
+        return [(symbol, [SymbolCandidate(*c) for c in candidates])
+                for symbol, candidates
+                in self._request('POST', '/complete', payload)['results']]
+
+    def releases(self):
+        return self._request('GET', '/releases')['results']
+
+    def diff_releases(self, old_release, new_release):
+        payload = {'old_release': old_release, 'new_release': new_release}
+        return ReleaseDiff(**self._request('POST', '/diff',
+                                           payload)['results'])
+
+    def update_gene_symbols(self, gene_list):
+        # Like HgncTranslationProvider, leave out misses and current symbols
+        return {gene: symbol for gene, symbol
+                in zip(gene_list, self.lookup_symbols(gene_list))
+                if symbol is not None and symbol != gene}
+
+    def translate_list(self,
+                       gene_list: list,
+                       source: TranslationProvider._IDENTIFIER_TYPES,
+                       target: TranslationProvider._IDENTIFIER_TYPES) -> dict:
+        if source == 'entrez_id':
+            # Like NcbiTranslationProvider, keyed by int with '' for misses
+            gene_list = [int(gene) for gene in gene_list]
+            return {gene: value or '' for gene, value
+                    in zip(gene_list, self.lookup(gene_list, source, target))}
+        return {gene: value for gene, value
+                in zip(gene_list, self.lookup(gene_list, source, target))
+                if value is not None and value != gene}
+
+
+class GeneThesaurusClient(GeneThesaurus):
+    """
+    GeneThesaurus that sends its lookups to a TranslationServer
+    (`gene-thesaurus serve`) instead of loading the data itself.
+    """
+
+    def __init__(self,
+                 url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}",
+                 timeout=30,
+                 pool_size=16):
+        """
+        Args:
+            url (str): The base URL of the server.
+            Defaults to 'http://127.0.0.1:8642'.
+            timeout (float): Seconds to wait for an answer. Defaults to 30.
+            pool_size (int): Maximum number of connections kept open, for
+            use from several threads. Defaults to 16.
+        """
+        super().__init__()
+        self.__remote = _RemoteProvider(url.rstrip('/'), timeout, pool_size)
+
+    def _hgnc(self, release=None):
+        if release is not None:
+            raise ValueError(
+                "Error: the server answers for the release it has loaded.")
+        return self.__remote
+
+    def _xref(self, release=None):
+        return self._hgnc(release)
+
+    def releases(self) -> list:
+        """
+        Same as GeneThesaurus.releases, for the data directory of the
+        server.
+        """
+        return self.__remote.releases()
+
+    def diff_releases(self, old_release, new_release) -> ReleaseDiff:
+        """
+        Same as GeneThesaurus.diff_releases, run on the server.
+        """
+        return self.__remote.diff_releases(old_release, new_release)
+
+    def close(self):
+        self.__remote.close()
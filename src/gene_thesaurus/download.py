@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import threading
+import time
+from gene_thesaurus import metrics
+
+
+class DownloadException(Exception):
+    def __init__(self, message="Could not download the file."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class Downloader:
+    """
+    Downloads files into a data directory over one pooled HTTP session.
+
+    Files are streamed in chunks to a .partial file next to their final
+    path and renamed into place once complete, so a failed download is
+    never mistaken for a cached file. An interrupted download is resumed
+    with a Range request, as long as the file on the server is unchanged.
+    Conditional downloads remember the ETag and Last-Modified of the file
+    and skip it while the server reports it unchanged.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+    _CHUNK_SIZE = 1 << 20
+    _PARTIAL_SUFFIX = '.partial'
+    # Validators of a partial or conditionally downloaded file
+    _VALIDATORS_SUFFIX = '.validators.json'
+
+    def __init__(self,
+                 pool_size=16,
+                 timeout=(1, 10)):
+        """
+        Args:
+            pool_size (int): Maximum number of connections kept open per
+            host. Defaults to 16.
+            timeout (tuple): Seconds to wait for a connection and for each
+            read. Defaults to (1, 10).
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.__session = None
+        self.__lock = threading.Lock()
+        self.logger = logging.getLogger(__class__.__name__)
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process-wide downloader, whose connections are reused
+        by every provider.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @property
+    def session(self):
+        # requests is only imported when the network is needed
+        with self.__lock:
+            if self.__session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.__session = session
+            return self.__session
+
+    def close(self):
+        with self.__lock:
+            if self.__session is not None:
+                self.__session.close()
+                self.__session = None
+
+    def exists(self, url):
+        """
+        Asks the server whether a file exists, without downloading it.
+
+        Returns:
+            bool: Whether it exists, or None if the server could not be
+            asked.
+        """
+        import requests
+        try:
+            r = self.session.head(url, timeout=self.timeout)
+            return r.status_code == 200
+        except requests.RequestException:
+            return None
+
+    @classmethod
+    def _read_validators(cls, path):
+        try:
+            with open(path + cls._VALIDATORS_SUFFIX, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def _write_validators(cls, path, validators):
+        validators_path = path + cls._VALIDATORS_SUFFIX
+        tmp_path = f"{validators_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(validators, f)
+        os.replace(tmp_path, validators_path)
+
+    @classmethod
+    def last_checked(cls, path):
+        """
+        Returns when a conditionally downloaded file was last confirmed
+        to be current, as a Unix time. Files placed by hand count from
+        their modification time.
+
+        Returns:
+            float: The time, or None if the file does not exist.
+        """
+        if not os.path.isfile(path):
+            return None
+        return cls._read_validators(path).get('checked',
+                                              os.path.getmtime(path))
+
+    def download(self, url, path, conditional=False, name='http', **tags):
+        """
+        Downloads url to path. Processes sharing path should hold a
+        FileLock around this, as they share its partial file.
+
+        Args:
+            url (str): The file to download.
+            path (str): Where to store it.
+            conditional (bool): If path exists, only download the file if
+            the server reports it changed. Defaults to False.
+            name (str): Reports the download to metrics as {name}.download
+            and {name}.bytes_downloaded. Defaults to 'http'.
+            **tags: Tags of the metrics, e.g. the release.
+
+        Returns:
+            bool: Whether path was (re)written, False if it was current.
+
+        Raises:
+            DownloadException: If the file could not be downloaded
+            completely. A partial download is kept to be resumed.
+        """
+        import requests
+        headers = {}
+        if conditional and os.path.isfile(path):
+            validators = self._read_validators(path)
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        partial_path = path + self._PARTIAL_SUFFIX
+        offset = 0
+        if os.path.isfile(partial_path):
+            # Resume only if the server still has the same file, which
+            # If-Range leaves to the server
+            partial = self._read_validators(partial_path)
+            if_range = partial.get('etag') or partial.get('last_modified')
+            if if_range:
+                offset = os.path.getsize(partial_path)
+                headers['Range'] = f"bytes={offset}-"
+                headers['If-Range'] = if_range
+                # Ranges count the bytes sent, which are only the bytes
+                # stored if the server does not encode them
+                headers['Accept-Encoding'] = 'identity'
+
+        n_bytes = 0
+        try:
+            with metrics.timer(f'{name}.download', **tags), \
+                    self.session.get(url, headers=headers, stream=True,
+                                     timeout=self.timeout) as r:
+                if r.status_code == 304:
+                    self.logger.debug(f"{url} is unchanged")
+                    self._write_validators(
+                        path, {**self._read_validators(path),
+                               'checked': time.time()})
+                    return False
+                if r.status_code == 416:
+                    # The partial file is no prefix of the current one
+                    self._discard(partial_path)
+                    raise DownloadException(
+                        f"Error: could not resume {url}, retry from the "
+                        f"start.")
+                r.raise_for_status()
+
+                validators = {'url': url,
+                              'etag': r.headers.get('ETag'),
+                              'last_modified': r.headers.get('Last-Modified')}
+                # The body of an encoded response is decoded while it is
+                # stored, so its Content-Length does not apply and a cut-off
+                # download cannot be resumed
+                encoded = r.headers.get('Content-Encoding',
+                                        'identity') != 'identity'
+                if r.status_code == 206:
+                    if encoded:
+                        self._discard(partial_path)
+                        raise DownloadException(
+                            f"Error: could not resume {url}, retry from "
+                            f"the start.")
+                    self.logger.info(f"Resuming {url} at byte {offset}")
+                    mode = 'ab'
+                    expected = offset + int(r.headers.get('Content-Length',
+                                                          -offset - 1))
+                elif encoded:
+                    mode = 'wb'
+                    expected = -1
+                    self._discard(partial_path)
+                else:
+                    mode = 'wb'
+                    expected = int(r.headers.get('Content-Length', -1))
+                    self._write_validators(partial_path, validators)
+
+                with open(partial_path, mode) as f:
+                    for chunk in r.iter_content(chunk_size=self._CHUNK_SIZE):
+                        f.write(chunk)
+                        n_bytes += len(chunk)
+                    size = f.tell()
+        except requests.RequestException as e:
+            raise DownloadException(
+                f"Error: could not download {url}: {e}") from e
+        finally:
+            metrics.count(f'{name}.bytes_downloaded', n_bytes, **tags)
+
+        if expected >= 0 and size != expected:
+            raise DownloadException(
+                f"Error: {url} ended after {size} of {expected} bytes.")
+        os.replace(partial_path, path)
+        self._discard(partial_path)
+        if conditional:
+            self._write_validators(path, {**validators,
+                                          'checked': time.time()})
+        return True
+
+    @classmethod
+    def _discard(cls, partial_path):
+        for p in (partial_path, partial_path + cls._VALIDATORS_SUFFIX):
+            if os.path.exists(p):
+                os.remove(p)
@@ -0,0 +1,94 @@
+import logging
+import os
+import time
+from gene_thesaurus import metrics
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive lock on a file, held by one process or thread at a time.
+
+    Processes sharing a data directory use these to download and build
+    each file once: the first one to take the lock does the work while the
+    others wait, and then find the result in place. The operating system
+    releases the lock of a process that dies, so a crashed build never
+    blocks the others.
+    """
+    # How often to retry where locks cannot be waited for (Windows)
+    _POLL_SECONDS = 0.1
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The lock file. It is created if missing, and never
+            removed.
+        """
+        self.path = path
+        self.__file = None
+        self.logger = logging.getLogger(__class__.__name__)
+
+    def _try_lock(self, f):
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        f = open(self.path, 'a+b')
+        if not self._try_lock(f):
+            name = os.path.basename(self.path)
+            self.logger.info(f"Waiting for {name}, held by another process")
+            metrics.count('lock.waits', lock=name)
+            with metrics.timer('lock.wait', lock=name):
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                else:
+                    while not self._try_lock(f):
+                        time.sleep(self._POLL_SECONDS)
+        self.__file = f
+
+    def release(self):
+        f, self.__file = self.__file, None
+        if f is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        f.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def data_dir_lock(data_dir, name) -> FileLock:
+    """
+    Returns the lock named name in data_dir, stored as {name}.lock.
+    """
+    return FileLock(data_dir + "/" + f"{name}.lock")
+
+
+def is_writable(data_dir) -> bool:
+    """
+    Returns whether files can be created in data_dir. Data directories
+    that are not, e.g. prebuilt into a container image, are used as they
+    are, without locks, downloads or builds.
+    """
+    return os.access(data_dir, os.W_OK)
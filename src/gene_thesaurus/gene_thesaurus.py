@@ -1,37 +1,344 @@
+import contextlib
+import functools
+import itertools
 import logging
+import numpy as np
+from gene_thesaurus import metrics
 from gene_thesaurus.translation_provider import TranslationProvider
 from gene_thesaurus.hgnc_translation_provider import HgncTranslationProvider
+from gene_thesaurus.matrix import is_dataframe, collapse_rows, factorize
 from gene_thesaurus.ncbi_translation_provider import NcbiTranslationProvider
+from gene_thesaurus.provider_registry import ProviderRegistry
+from gene_thesaurus.release_store import ReleaseDiff, ReleaseStore
+from gene_thesaurus.xref_translation_provider import XrefTranslationProvider
+
+
+def _collected(method):
+    # Reports the events of the method's work to the collector of the
+    # instance, if it collects stats
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._collecting():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class GeneThesaurus:
     def __init__(self,
-                 data_dir='/tmp'):
+                 data_dir='/tmp',
+                 shared=False,
+                 max_bytes=None,
+                 refresh_interval=60,
+                 release=None,
+                 collect_stats=False):
+        """
+        Args:
+            data_dir (str): Where downloaded data and indexes are cached.
+            Defaults to '/tmp'.
+            shared (bool): If True, loaded data is kept in a registry shared
+            by every GeneThesaurus in the process rather than one owned by
+            this instance. Defaults to False.
+            max_bytes (int): Memory cap for the loaded data of a registry
+            owned by this instance. Defaults to None (no cap).
+            refresh_interval (float): Minimum number of seconds between
+            checks for a newer cached HGNC release. Defaults to 60.
+            release (str): HGNC release date ('YYYY-MM-DD') to use instead
+            of the latest one. Defaults to None.
+            collect_stats (bool): Aggregate the timings and counts of every
+            pipeline stage run by this instance for stats().
+            Defaults to False.
+        """
         self.__data_dir = data_dir
+        self.__release = release
         self.logger = logging.getLogger(__class__.__name__)
 
-    def update_gene_symbols(self, gene_list):
-        hgnc = HgncTranslationProvider(self.__data_dir)
-        return hgnc.update_gene_symbols(gene_list)
+        self.__collector = None
+        if collect_stats:
+            self.__collector = metrics.StatsCollector()
+
+        if shared:
+            self.__registry = ProviderRegistry.shared()
+            self.__owns_registry = False
+        else:
+            self.__registry = ProviderRegistry(
+                max_bytes=max_bytes,
+                refresh_interval=refresh_interval)
+            self.__owns_registry = True
+
+    def __enter__(self):
+        return self
+
+    def _collecting(self):
+        if self.__collector is None:
+            return contextlib.nullcontext()
+        return metrics.collecting(self.__collector)
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _hgnc(self, release=None) -> HgncTranslationProvider:
+        release = release or self.__release
+        if release:
+            # A pinned release never needs refreshing
+            return self.__registry.get(
+                ('hgnc', self.__data_dir, release),
+                lambda: HgncTranslationProvider(self.__data_dir,
+                                                release=release))
+        return self.__registry.get(
+            ('hgnc', self.__data_dir),
+            lambda: HgncTranslationProvider(self.__data_dir),
+            self._refresh_hgnc)
+
+    @property
+    @_collected
+    def hgnc_release(self):
+        """The date of the HGNC release used for lookups."""
+        return self._hgnc().data_date
+
+    def _refresh_hgnc(self, hgnc):
+        latest = HgncTranslationProvider.latest_cached_release(
+            self.__data_dir)
+        if latest and latest > hgnc.data_date:
+            # The table of the superseded release is no longer looked up
+            self.__registry.evict(('xref', self.__data_dir, hgnc.data_date),
+                                  close=False)
+            return HgncTranslationProvider(self.__data_dir, release=latest)
+        return None
+
+    def _xref(self, release=None) -> XrefTranslationProvider:
+        # One table per HGNC release, joined with the NCBI data
+        hgnc = self._hgnc(release)
+        return self.__registry.get(
+            ('xref', self.__data_dir, hgnc.data_date),
+            lambda: XrefTranslationProvider(
+                self.__data_dir, hgnc.data_path, hgnc.data_date,
+                NcbiTranslationProvider.fetch(self.__data_dir)),
+            lambda xref: self._refresh_xref(xref, hgnc))
+
+    def _refresh_xref(self, xref, hgnc):
+        # Rebuilt once a newer NCBI file has been downloaded
+        ncbi_path = NcbiTranslationProvider.fetch(self.__data_dir)
+        if not xref.is_current(ncbi_path):
+            return XrefTranslationProvider(self.__data_dir, hgnc.data_path,
+                                           hgnc.data_date, ncbi_path)
+        return None
+
+    @_collected
+    def releases(self) -> list:
+        """
+        Returns:
+            list: The dates of the HGNC releases that can be pinned
+            without a download, oldest first.
+        """
+        return ReleaseStore(self.__data_dir).releases()
+
+    @_collected
+    def diff_releases(self, old_release, new_release) -> ReleaseDiff:
+        """
+        Compares two HGNC releases gene by gene.
+
+        Args:
+            old_release (str): The earlier release ('YYYY-MM-DD').
+            new_release (str): The later release ('YYYY-MM-DD').
+
+        Returns:
+            ReleaseDiff: The HGNC IDs of the genes added, removed and
+            changed.
+        """
+        for release in (old_release, new_release):
+            self._hgnc(release).store_release()
+        return ReleaseStore(self.__data_dir).diff(old_release, new_release)
+
+    @_collected
+    def warmup(self, datasets=('hgnc', 'ncbi'), release=None):
+        """
+        Loads the given datasets ahead of the first lookup, building and
+        opening their indexes, so that lookups do no more than search them.
+
+        Args:
+            datasets (tuple): Any of 'hgnc' and 'ncbi'.
+            Defaults to both.
+            release (str): HGNC release date ('YYYY-MM-DD') to load.
+            Defaults to None (the release of this instance).
+        """
+        loaders = {'hgnc': lambda: self._hgnc(release),
+                   'ncbi': lambda: self._xref(release)}
+        for dataset in datasets:
+            if dataset not in loaders:
+                err_msg = f"Error: datasets must be among {tuple(loaders)}."
+                raise ValueError(err_msg)
+            loaders[dataset]().load()
+
+    def close(self):
+        """
+        Releases the loaded data. A shared registry is left untouched,
+        since other instances may still be using it.
+        """
+        if self.__owns_registry:
+            self.__registry.close()
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of how the time was spent, with
+        collect_stats=True. Only the work of this instance is included,
+        also with shared=True, but a dataset loaded by another instance is
+        not loaded again.
+
+        Returns:
+            dict: 'counts' and 'timings' as in
+            metrics.StatsCollector.snapshot(), which are empty unless
+            collect_stats is set, and 'registry' with the number of loaded
+            providers and their size in bytes.
+        """
+        if self.__collector is not None:
+            snapshot = self.__collector.snapshot()
+        else:
+            snapshot = {'counts': {}, 'timings': {}}
+        snapshot['registry'] = {'providers': len(self.__registry),
+                                'nbytes': self.__registry.nbytes}
+        return snapshot
+
+    @_collected
+    def update_gene_symbols(self, gene_list, all_candidates=False,
+                            normalize=False, release=None):
+        """
+        Returns the current gene symbols for the given gene names.
+
+        Args:
+            gene_list (list): The gene symbols to update.
+            all_candidates (bool): Report every gene a symbol may refer to,
+            instead of a single one. Defaults to False.
+            normalize (bool): Match regardless of case, surrounding
+            whitespace and punctuation, e.g. 'erbb1' or 'TNFSF2 '. The
+            best-ranked candidate is used. Defaults to False.
+            release (str): HGNC release date ('YYYY-MM-DD') to use for
+            this call, e.g. to reproduce an earlier analysis.
+            Defaults to None (the release of this instance).
+
+        Returns:
+            dict: Each outdated gene mapped to its current symbol. With
+            all_candidates, each known gene mapped to a list of
+            SymbolCandidate, ranked from current symbols over previous
+            symbols to aliases.
+        """
+        if all_candidates or normalize:
+            gene_list = list(gene_list)
+            pairs = zip(gene_list, self.lookup_candidates(
+                gene_list, normalize, release))
+            if all_candidates:
+                return {gene: candidates for gene, candidates in pairs
+                        if candidates}
+            return {gene: candidates[0].symbol for gene, candidates in pairs
+                    if candidates and candidates[0].symbol != gene}
+        hgnc = self._hgnc(release)
+        gene_list = list(gene_list)
+        with metrics.timer('lookup', method='update_gene_symbols'):
+            updated = hgnc.update_gene_symbols(gene_list)
+        metrics.count('lookup.genes', len(gene_list))
+        return updated
+
+    @_collected
+    def lookup_candidates(self, gene_list, normalize=False,
+                          release=None) -> list:
+        """
+        Returns every gene each of the given gene names may refer to,
+        keeping the input order.
+
+        Args:
+            gene_list (list): The gene symbols to look up.
+            normalize (bool): Match regardless of case, surrounding
+            whitespace and punctuation. Defaults to False.
+            release (str): HGNC release date ('YYYY-MM-DD') to use for
+            this call. Defaults to None (the release of this instance).
+
+        Returns:
+            list: For each gene, a list of SymbolCandidate ranked from
+            current symbols over previous symbols to aliases. Unknown genes
+            give an empty list.
+        """
+        hgnc = self._hgnc(release)
+        gene_list = list(gene_list)
+        with metrics.timer('lookup', method='lookup_candidates',
+                           normalize=normalize):
+            candidates = hgnc.lookup_candidates(gene_list, normalize)
+        metrics.count('lookup.genes', len(gene_list))
+        return candidates
+
+    @_collected
+    def complete(self, prefix, limit=10) -> list:
+        """
+        Autocompletes a gene symbol over current, previous and alias
+        symbols, regardless of case.
+
+        Args:
+            prefix (str): What has been typed so far.
+            limit (int): The maximum number of completions. Defaults to 10.
+
+        Returns:
+            list: (symbol, candidates) pairs in sorted order, with the
+            symbols normalized and the candidates as in lookup_candidates.
+        """
+        return self._hgnc().complete(prefix, limit)
 
+    @_collected
     def translate_genes(self,
                         gene_list: list,
                         source: str = 'symbol',
-                        target: str = 'ensembl_id'):
+                        target: str = 'ensembl_id',
+                        normalize: bool = False,
+                        release: str = None):
         """
         Translates a list of genes from the source to the target format.
-        Valid values for source and target are 'symbol' and 'ensembl_id'.
+        Valid values for source and target are 'symbol', 'ensembl_id' and
+        'entrez_id', in any combination.
 
         Args:
             gene_list (list): A list of gene names to be translated.
             source (str): The format of the input genes. Defaults to 'symbol'.
             target (str): The format of the output genes.
             Defaults to 'ensembl_id'.
+            normalize (bool): Match symbols regardless of case, surrounding
+            whitespace and punctuation, using the best-ranked candidate.
+            Requires source 'symbol'. Defaults to False.
+            release (str): HGNC release date ('YYYY-MM-DD') to use for
+            this call, e.g. to reproduce an earlier analysis.
+            Defaults to None (the release of this instance).
 
         Returns:
             dict: A dictionary mapping each source gene to its target format.
         """
+        if normalize:
+            if source != 'symbol':
+                raise ValueError(
+                    "Error: normalize requires source 'symbol'.")
+            self.datasets_for(source, target)
+            gene_list = list(gene_list)
+            candidates = self.lookup_candidates(gene_list, normalize=True,
+                                                release=release)
+            translated = {gene: getattr(gene_candidates[0], target)
+                          for gene, gene_candidates
+                          in zip(gene_list, candidates) if gene_candidates}
+            return {gene: value for gene, value in translated.items()
+                    if value is not None}
+        provider = self._get_translation_provider(source, target, release)
+        gene_list = list(gene_list)
+        with metrics.timer('lookup', method='translate_genes', source=source,
+                           target=target):
+            translated = provider.translate_list(gene_list, source, target)
+        metrics.count('lookup.genes', len(gene_list))
+        return translated
 
+    def datasets_for(self, source: str, target: str) -> tuple:
+        """
+        Returns the datasets needed to translate from source to target.
+
+        Args:
+            source (str): The format of the input genes.
+            target (str): The format of the output genes.
+
+        Returns:
+            tuple: The names of the datasets, among 'hgnc' and 'ncbi'.
+        """
         # Extract valid values from the Literal type
         valid_identifier_types = TranslationProvider._IDENTIFIER_TYPES.__args__
 
@@ -48,28 +355,201 @@ class GeneThesaurus:
             err_msg = "Error: source and target must be different."
             raise ValueError(err_msg)
 
-        # Check the valid combinations
-        valid_combination = False
-        if source == 'symbol' and target == 'ensembl_id':
-            valid_combination = True
-        elif source == 'ensembl_id' and target == 'symbol':
-            valid_combination = True
-        elif source == 'entrez_id' and target == 'symbol':
-            valid_combination = True
-        elif source == 'entrez_id' and target == 'ensembl_id':
-            valid_combination = True
-        if not valid_combination:
-            err_msg = """Error: valid combinations of source and target are
-            'symbol' -> 'ensembl_id',
-            'ensembl_id' -> 'symbol',
-            'entrez_id' -> 'symbol',
-            'entrez_id' -> 'ensembl_id'."""
-            raise ValueError(err_msg)
+        # Symbols and Ensembl IDs are both in the HGNC indexes. Entrez IDs
+        # need the cross-reference table, which joins in the NCBI data.
+        if 'entrez_id' in (source, target):
+            return ('hgnc', 'ncbi')
+        return ('hgnc',)
+
+    def _get_translation_provider(self, source, target, release=None):
+        if 'ncbi' in self.datasets_for(source, target):
+            return self._xref(release)
+        return self._hgnc(release)
+
+    @staticmethod
+    def _chunks(genes, chunk_size):
+        if chunk_size < 1:
+            raise ValueError("Error: chunk_size must be at least 1.")
+        genes = iter(genes)
+        return iter(lambda: list(itertools.islice(genes, chunk_size)), [])
+
+    def translate_iter(self,
+                       genes,
+                       source: str = 'symbol',
+                       target: str = 'ensembl_id',
+                       chunk_size: int = 10000):
+        """
+        Lazily translates genes from the source to the target format.
+        The input is consumed in chunks, so memory use does not grow with
+        the size of the input.
+
+        Args:
+            genes (iterable): The genes to be translated.
+            source (str): The format of the input genes. Defaults to 'symbol'.
+            target (str): The format of the output genes.
+            Defaults to 'ensembl_id'.
+            chunk_size (int): How many genes to translate at a time.
+            Defaults to 10000.
+
+        Returns:
+            iterator: (gene, translation) pairs in input order, where the
+            translation is None if there is none.
+        """
+        with self._collecting():
+            provider = self._get_translation_provider(source, target)
+        chunks = self._chunks(genes, chunk_size)
+        return (pair for chunk in chunks
+                for pair in zip(chunk, self._lookup_chunk(
+                    provider.lookup, 'translate_iter', chunk, source,
+                    target)))
+
+    @_collected
+    def _lookup_chunk(self, lookup, method, chunk, *args):
+        # Reported per chunk, as the caller consumes the iterator
+        with metrics.timer('lookup', method=method):
+            results = lookup(chunk, *args)
+        metrics.count('lookup.genes', len(chunk))
+        return results
+
+    def update_iter(self, genes, chunk_size: int = 10000):
+        """
+        Lazily looks up the current gene symbol of each gene.
+
+        Args:
+            genes (iterable): The gene symbols to update.
+            chunk_size (int): How many genes to look up at a time.
+            Defaults to 10000.
+
+        Returns:
+            iterator: (gene, symbol) pairs in input order, where the symbol
+            is the gene itself if it is current and None if it is unknown.
+        """
+        with self._collecting():
+            hgnc = self._hgnc()
+        chunks = self._chunks(genes, chunk_size)
+        return (pair for chunk in chunks
+                for pair in zip(chunk, self._lookup_chunk(
+                    hgnc.lookup_symbols, 'update_iter', chunk)))
+
+    @_collected
+    def translate_array(self,
+                        values,
+                        source: str = 'symbol',
+                        target: str = 'ensembl_id',
+                        fill_value=None) -> np.ndarray:
+        """
+        Translates an array of genes from the source to the target format.
+        Each distinct gene is looked up once, however often it occurs.
+
+        Args:
+            values (array-like): A NumPy array, pd.Series or pd.Index of
+            genes.
+            source (str): The format of the input genes. Defaults to 'symbol'.
+            target (str): The format of the output genes.
+            Defaults to 'ensembl_id'.
+            fill_value: The value for genes that cannot be translated.
+            Defaults to None.
+
+        Returns:
+            np.ndarray: The translations, aligned with the input.
+        """
+        provider = self._get_translation_provider(source, target)
+
+        # Missing values get code -1, which picks the trailing fill_value
+        codes, uniques = factorize(np.asarray(values).ravel())
+        translated = np.empty(len(uniques) + 1, dtype=object)
+        with metrics.timer('lookup', method='translate_array', source=source,
+                           target=target):
+            translated[:-1] = provider.lookup(uniques.tolist(), source,
+                                              target)
+        metrics.count('lookup.genes', len(codes))
+        translated[np.equal(translated, None)] = fill_value
+        return translated[codes].reshape(np.shape(values))
+
+    def translate_series(self,
+                         series,
+                         source: str = 'symbol',
+                         target: str = 'ensembl_id',
+                         fill_value=None):
+        """
+        Translates a pd.Series or pd.Index of genes from the source to the
+        target format, e.g. to relabel the index of an expression matrix.
+
+        Args:
+            series (pd.Series or pd.Index): The genes to be translated.
+            source (str): The format of the input genes. Defaults to 'symbol'.
+            target (str): The format of the output genes.
+            Defaults to 'ensembl_id'.
+            fill_value: The value for genes that cannot be translated.
+            Defaults to None.
+
+        Returns:
+            pd.Series or pd.Index: The translations, with the same index
+            and name as the input.
+        """
+        import pandas as pd
+        translated = self.translate_array(series, source, target, fill_value)
+        if isinstance(series, pd.Index):
+            return pd.Index(translated, dtype=object, name=series.name)
+        return pd.Series(translated, index=series.index, dtype=object,
+                         name=series.name)
+
+    @_collected
+    def relabel_matrix(self,
+                       matrix,
+                       labels=None,
+                       source: str = 'symbol',
+                       target: str = None,
+                       agg: str = 'sum',
+                       drop_unmapped: bool = False):
+        """
+        Translates the row labels of a matrix and aggregates the rows that
+        end up with the same label, e.g. when several outdated symbols or
+        Ensembl IDs map to one gene in a count matrix.
+
+        Args:
+            matrix: A NumPy array, pd.DataFrame or SciPy sparse matrix with
+            one row per gene.
+            labels (array-like): The gene of each row. Defaults to the index
+            of a pd.DataFrame.
+            source (str): The format of the labels. Defaults to 'symbol'.
+            target (str): The format to translate the labels to. Defaults to
+            None, which updates gene symbols to the current ones.
+            agg (str): How to combine rows with the same label, one of
+            'sum', 'mean', 'max' and 'first'. Defaults to 'sum'.
+            drop_unmapped (bool): Drop rows whose label cannot be
+            translated, instead of keeping their original label.
+            Defaults to False.
+
+        Returns:
+            pd.DataFrame or tuple: For a pd.DataFrame, the collapsed frame
+            indexed by the new labels. Otherwise the collapsed matrix and
+            an array of its labels.
+        """
+        if labels is None:
+            if not is_dataframe(matrix):
+                raise ValueError(
+                    "Error: labels are required unless matrix is a "
+                    "pd.DataFrame.")
+            labels = matrix.index
+        labels = np.asarray(labels, dtype=object)
+
+        if target is None:
+            if source != 'symbol':
+                raise ValueError(
+                    "Error: updating labels requires source 'symbol'.")
+            codes, uniques = factorize(labels)
+            hgnc = self._hgnc()
+            current = np.empty(len(uniques) + 1, dtype=object)
+            with metrics.timer('lookup', method='relabel_matrix'):
+                current[:-1] = hgnc.lookup_symbols(uniques.tolist())
+            metrics.count('lookup.genes', len(codes))
+            new_labels = current[codes]
+        else:
+            new_labels = self.translate_array(labels, source, target)
 
-        if source == 'symbol' or source == 'ensembl_id':
-            hgnc = HgncTranslationProvider(self.__data_dir)
-            return hgnc.translate_list(gene_list, source, target)
+        if not drop_unmapped:
+            unmapped = np.equal(new_labels, None)
+            new_labels[unmapped] = labels[unmapped]
 
-        elif source == 'entrez_id':
-            ncbi = NcbiTranslationProvider(self.__data_dir)
-            return ncbi.translate_list(gene_list, source, target)
+        return collapse_rows(matrix, new_labels, agg)
@@ -0,0 +1,89 @@
+import json
+import re
+
+
+class HgncParseException(Exception):
+    def __init__(self, message="Could not parse HGNC data."):
+        self.message = message
+        super().__init__(self.message)
+
+
+# The fields of the HGNC complete set that the indexes are built from
+HGNC_FIELDS = ('hgnc_id', 'symbol', 'prev_symbol', 'alias_symbol',
+               'ensembl_gene_id', 'entrez_id')
+
+# How a symbol field relates to its gene, in order of precedence
+SYMBOL_RANKS = {'symbol': 0, 'prev_symbol': 1, 'alias_symbol': 2}
+
+_DOCS_START = re.compile(r'"docs"\s*:\s*\[')
+_SEPARATORS = ' \t\r\n,'
+_CHUNK_SIZE = 1 << 16
+
+
+def iter_hgnc_records(path, fields=HGNC_FIELDS, chunk_size=_CHUNK_SIZE):
+    """
+    Walks the docs of an HGNC complete set JSON file one record at a time,
+    keeping only the given fields of each record.
+
+    Only the current chunk of the file and the record being decoded are
+    held in memory, so memory use stays flat however large the file is.
+
+    Args:
+        path (str): Path to an hgnc_complete_set_{date}.json file.
+        fields (tuple): The fields to keep. Defaults to HGNC_FIELDS.
+        chunk_size (int): Number of characters read at a time.
+
+    Yields:
+        dict: The projected fields present in each record.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r', encoding='utf8') as f:
+        buf = ''
+        pos = 0
+        eof = False
+
+        def refill():
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf = buf[pos:] + chunk
+            pos = 0
+
+        # Skip ahead to the start of response.docs. Keep a little of the
+        # previous chunk, in case the marker straddles two chunks.
+        while True:
+            match = _DOCS_START.search(buf)
+            if match:
+                pos = match.end()
+                break
+            if eof:
+                raise HgncParseException(f"No docs found in {path}")
+            pos = max(0, len(buf) - 32)
+            refill()
+
+        while True:
+            # Skip whitespace and commas between records
+            while pos < len(buf) and buf[pos] in _SEPARATORS:
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    raise HgncParseException(f"Unexpected end of {path}")
+                refill()
+                continue
+            if buf[pos] == ']':
+                return
+
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The record continues in the next chunk
+                if eof:
+                    raise HgncParseException(f"Malformed record in {path}")
+                refill()
+                continue
+
+            pos = end
+            yield {field: record[field] for field in fields
+                   if field in record}
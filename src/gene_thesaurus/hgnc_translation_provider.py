@@ -1,9 +1,22 @@
 import os
-import requests
+import re
 import json
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Literal
 import logging
+from gene_thesaurus import metrics
+from gene_thesaurus.binary_index import BinaryIndex
+from gene_thesaurus.download import DownloadException, Downloader
+from gene_thesaurus.file_lock import data_dir_lock, is_writable
+from gene_thesaurus.index_builder import build_hgnc_maps, \
+    hgnc_maps_from_multimap, write_arrays, write_indexes
+from gene_thesaurus.release_store import ReleaseStore, \
+    iter_release_records, match_rows
+from gene_thesaurus.symbol_multimap import MULTIMAP_KEY_NAMES, \
+    MULTIMAP_NAMES, SymbolMultimap, SymbolMultimapBuilder, normalize_symbol
 from gene_thesaurus.translation_provider import TranslationProvider
 
 
@@ -19,9 +32,15 @@ class HgncTranslationProvider(TranslationProvider):
     """
     _HGNC_BASE_URL = 'https://storage.googleapis.com/public-download-files/hgnc/archive/archive/monthly/json/'  # noqa: E501
     _HGNC_BASE_FILENAME = 'hgnc_complete_set_{date}.json'
-    _SYMBOL_THESAURUS_BASE_FILENAME = 'symbol_thesaurus_{date}.json'
-    _SYMBOL_TO_ENSEMBL_DICT_BASE_FILENAME = 'symbol_to_ensembl_{date}.json'
-    _ENSEMBL_TO_SYMBOL_DICT_BASE_FILENAME = 'ensembl_to_symbol_{date}.json'
+    _HGNC_FILENAME_PATTERN = re.compile(
+        r'^hgnc_complete_set_(\d{4}-\d{2}-\d{2})\.json$')
+    _HGNC_MANIFEST_FILENAME = 'hgnc_manifest.json'
+    _JSON_BASE_FILENAME = '{name}_{date}.json'
+    _INDEX_BASE_FILENAME = '{name}_{date}.idx'
+    _INDEX_NAMES = ('symbol_thesaurus', 'symbol_to_ensembl',
+                    'ensembl_to_symbol')
+    _CANDIDATES_BASE_FILENAME = 'candidates_{name}_{date}.npy'
+    _NORMALIZED_BASE_FILENAME = 'normalized_{name}_{date}.npy'
     _IDENTIFIER_TYPES = Literal[
         'symbol',
         'ensembl_id'
@@ -29,71 +48,476 @@ class HgncTranslationProvider(TranslationProvider):
 
     def __init__(self,
                  data_dir='/tmp',
-                 data_end_date=datetime.now(),
+                 data_end_date=None,
                  n_attempted_months=6,
-                 n_attempted_days=31):
+                 n_attempted_days=31,
+                 release=None,
+                 base_url=None,
+                 max_workers=16,
+                 manifest_ttl=24 * 60 * 60,
+                 downloader=None):
+        """
+        Args:
+            data_dir (str): Where downloaded data and indexes are cached.
+            data_end_date (datetime): The newest date to look for a release
+            at. Defaults to now.
+            n_attempted_months (int): How many months back to look.
+            n_attempted_days (int): How many days of each month to try.
+            release (str): A specific release date ('YYYY-MM-DD') to load
+            instead of discovering the latest one.
+            base_url (str): Where to download releases from.
+            Defaults to the HGNC archive.
+            max_workers (int): Number of concurrent probes during
+            discovery. Defaults to 16.
+            manifest_ttl (float): How many seconds a discovered release is
+            trusted before discovery runs again. Defaults to one day.
+            downloader (Downloader): Optional. Defaults to the shared
+            Downloader.
+        """
         self.__data_dir = data_dir
-        self.__hgnc_data_end_date = data_end_date
+        self.__hgnc_base_url = base_url or self._HGNC_BASE_URL
+        self.__max_workers = max_workers
+        self.__manifest_ttl = manifest_ttl
+        self.__downloader = downloader or Downloader.shared()
+        self.__hgnc_data_end_date = data_end_date or datetime.now()
         self.__hgnc_n_attempted_months = n_attempted_months
         self.__hgnc_n_attempted_days = n_attempted_days
+        self.__hgnc_release = release
         self.__hgnc_data_date = None
         self.__hgnc_json_path = None
-        self.__hgnc_data = None
+        self.__indexes = {}
+        self.__candidates = None
+        self.__normalized = None
 
         super().__init__(self.__data_dir)
         self.logger = logging.getLogger(__class__.__name__)
         self._get_hgnc_data()
 
-    def _get_hgnc_data(self):
+    @property
+    def data_date(self):
+        """The date of the HGNC release backing this provider."""
+        return self.__hgnc_data_date
+
+    @property
+    def data_path(self):
+        """The path to the HGNC complete set backing this provider."""
+        return self.__hgnc_json_path
+
+    @property
+    def nbytes(self):
+        # Indexes are memory-mapped, so they only count for the pages
+        # they map
+        nbytes = sum(index.nbytes for index in self.__indexes.values())
+        for multimap in (self.__candidates, self.__normalized):
+            if multimap is not None:
+                nbytes += multimap.nbytes
+        return nbytes
+
+    def load(self):
+        """
+        Builds the indexes if needed and opens all of them, which lookups
+        otherwise do on first use.
+
+        Returns:
+            HgncTranslationProvider: This provider.
+        """
+        for name in self._INDEX_NAMES:
+            self._get_index(name)
+        self._get_multimap(normalize=False)
+        self._get_multimap(normalize=True)
+        return self
+
+    def close(self):
+        for index in self.__indexes.values():
+            index.close()
+        self.__indexes = {}
+        self.__candidates = None
+        self.__normalized = None
+
+    @classmethod
+    def latest_cached_release(cls, data_dir):
+        """
+        Returns the date of the newest HGNC release already present in
+        data_dir, without touching the network.
+
+        Args:
+            data_dir (str): The directory to look in.
+
+        Returns:
+            str: The release date as 'YYYY-MM-DD', or None if there is none.
+        """
+        try:
+            filenames = os.listdir(data_dir)
+        except FileNotFoundError:
+            return None
+        dates = [m.group(1) for m in map(cls._HGNC_FILENAME_PATTERN.match,
+                                         filenames) if m]
+        return max(dates, default=None)
+
+    @classmethod
+    def prune_releases(cls, data_dir, keep=1):
+        """
+        Removes the complete sets and indexes of all but the newest stored
+        releases. Pruned releases stay in the release store, and their
+        indexes are rebuilt from it when they are pinned again.
+
+        Args:
+            data_dir (str): The directory to prune.
+            keep (int): How many of the newest releases to keep in full.
+            Defaults to 1.
+
+        Returns:
+            list: The dates of the pruned releases.
+        """
+        if keep < 1:
+            raise ValueError("Error: keep must be at least 1.")
+        releases = ReleaseStore(data_dir).releases()
+        pruned = releases[:-keep]
+        patterns = [re.compile(rf'^(\w+_)?{re.escape(date)}(_\d+)?\.'
+                               r'(json|idx|npy)$') for date in pruned]
+        for filename in os.listdir(data_dir):
+            # Release manifests of the store are never pruned
+            if filename.startswith('hgnc_release_'):
+                continue
+            if any(pattern.match(filename) for pattern in patterns):
+                os.remove(data_dir + "/" + filename)
+        return pruned
+
+    def _get_candidate_dates(self):
         # Try getting HGNC data for the past n months and days
         months = self._get_last_n_months(self.__hgnc_data_end_date,
                                          self.__hgnc_n_attempted_months)
+        return [f"{month}-{day:02d}" for month in months
+                for day in range(1, self.__hgnc_n_attempted_days + 1)]
+
+    def _get_hgnc_path(self, date_str):
+        filename = self._HGNC_BASE_FILENAME.format(date=date_str)
+        return self.__data_dir + "/" + filename
+
+    def _get_hgnc_url(self, date_str):
+        filename = self._HGNC_BASE_FILENAME.format(date=date_str)
+        return self.__hgnc_base_url + filename
+
+    def _read_manifest(self, candidates):
+        # The manifest remembers the outcome of the last discovery, so
+        # that other processes can skip it while it is fresh
+        path = self.__data_dir + "/" + self._HGNC_MANIFEST_FILENAME
+        try:
+            with open(path, 'r', encoding='utf8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        release = manifest.get('release')
+        if (manifest.get('base_url') != self.__hgnc_base_url or
+                release not in candidates or
+                time.time() - manifest.get('checked', 0) >
+                self.__manifest_ttl or
+                not os.path.isfile(self._get_hgnc_path(release))):
+            return None
+        metrics.count('hgnc.manifest_hits')
+        return release
+
+    def _write_manifest(self, release):
+        path = self.__data_dir + "/" + self._HGNC_MANIFEST_FILENAME
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'release': release,
+                       'base_url': self.__hgnc_base_url,
+                       'checked': time.time()}, f)
+        os.replace(tmp_path, path)
+
+    def _probe(self, date_str):
+        # Returns whether the release exists, or None if the server
+        # could not be asked
+        url = self._get_hgnc_url(date_str)
+        self.logger.debug(f"Trying HGNC url: {url}")
+        return self.__downloader.exists(url)
+
+    def _download(self, date_str):
+        try:
+            self.__downloader.download(self._get_hgnc_url(date_str),
+                                       self._get_hgnc_path(date_str),
+                                       name='hgnc', release=date_str)
+            return True
+        except (DownloadException, OSError) as e:
+            self.logger.warning(f"Could not download HGNC {date_str}: "
+                                f"{getattr(e, 'message', e)}")
+            return False
+
+    def _discover_release(self, candidates):
+        """
+        Finds the newest release among the candidate dates, downloading it
+        if it is not cached yet.
 
-        for month in months:
-            for day in range(1, self.__hgnc_n_attempted_days + 1):
-                date_str = f"{month}-{day:02d}"
-                filename = self._HGNC_BASE_FILENAME.format(date=date_str)
-                path = self.__data_dir + "/" + filename
-                found = False
-
-                if os.path.isfile(path):
-                    found = True
-                else:
-                    url = self._HGNC_BASE_URL + filename
-                    self.logger.debug(f"Trying HGNC url: {url}")
-                    # 1 sec to connect, 10 sec to read
-                    try:
-                        r = requests.get(url, timeout=(1, 10))
-                        if r.status_code == 200:
-                            found = True
-                            with open(path, 'wb') as f:
-                                f.write(r.content)
-                    except requests.RequestException:
-                        continue
-
-                if found:
-                    self.__hgnc_data_date = date_str
-                    self.__hgnc_json_path = path
-                    break
-
-            if self.__hgnc_data_date:
-                break
+        Returns:
+            tuple: The release date or None, and whether every candidate
+            newer than it could be checked.
+        """
+        # Local candidates first. Only releases newer than the newest local
+        # one are worth asking the server about.
+        local = [d for d in candidates
+                 if os.path.isfile(self._get_hgnc_path(d))]
+        newest_local = max(local, default=None)
+        remote = sorted((d for d in candidates
+                         if newest_local is None or d > newest_local),
+                        reverse=True)
+        if not remote:
+            return newest_local, True
+
+        with metrics.timer('hgnc.discovery'), \
+                ThreadPoolExecutor(self.__max_workers) as executor:
+            found = list(executor.map(self._probe, remote))
+        metrics.count('hgnc.probes', len(remote))
+
+        # Newest first; fall back to older ones if a download fails
+        complete = True
+        for date_str, exists in zip(remote, found):
+            if exists and self._download(date_str):
+                return date_str, complete
+            complete = complete and exists is False
+        return newest_local, complete
+
+    def _is_available(self, release):
+        return (os.path.isfile(self._get_hgnc_path(release)) or
+                release in ReleaseStore(self.__data_dir))
+
+    def _discover_and_record(self, candidates):
+        metrics.count('hgnc.manifest_misses')
+        release, complete = self._discover_release(candidates)
+        # Do not let a network outage hide newer releases
+        if release is not None and complete:
+            self._write_manifest(release)
+        return release
+
+    def _get_hgnc_data(self):
+        if self.__hgnc_release:
+            release = self.__hgnc_release
+            # Pruned releases are rebuilt from the release store
+            if (not self._is_available(release) and
+                    not is_writable(self.__data_dir)):
+                release = None
+            elif not self._is_available(release):
+                with data_dir_lock(self.__data_dir, 'hgnc_download'):
+                    # Another process may have downloaded it meanwhile
+                    if (not self._is_available(release) and
+                            not self._download(release)):
+                        release = None
+        else:
+            candidates = self._get_candidate_dates()
+            release = self._read_manifest(candidates)
+            if release is None and not is_writable(self.__data_dir):
+                # Nothing could be downloaded into a read-only directory,
+                # so its newest release is used, however old
+                release = self.latest_cached_release(self.__data_dir)
+            elif release is None:
+                # One process discovers the release, the others wait for
+                # its manifest
+                with data_dir_lock(self.__data_dir, 'hgnc_download'):
+                    release = self._read_manifest(candidates)
+                    if release is None:
+                        release = self._discover_and_record(candidates)
 
         # If we have maxed out number of attempts, throw exception
-        if not self.__hgnc_data_date or not self.__hgnc_json_path:
+        if release is None:
             raise HgncException(
-                f"Could not retrieve HGNC data from {self._HGNC_BASE_URL}")
+                f"Could not retrieve HGNC data from {self.__hgnc_base_url}")
 
-        # Load the HGNC JSON data
-        with open(self.__hgnc_json_path, 'r', encoding='utf8') as f:
-            data = json.loads(f.read())
-            self.__hgnc_data = data['response']['docs']
+        self.__hgnc_data_date = release
+        self.__hgnc_json_path = self._get_hgnc_path(release)
 
     @staticmethod
     def _get_last_n_months(hgnc_data_end_date, n_months):
         return [(hgnc_data_end_date - timedelta(days=30 * i)).
                 strftime('%Y-%m') for i in range(n_months)]
 
+    def _index_paths(self):
+        return {name: self.__data_dir + "/" + self._INDEX_BASE_FILENAME.format(
+                    name=name, date=self.__hgnc_data_date)
+                for name in self._INDEX_NAMES}
+
+    def _candidate_paths(self, date=None):
+        return {name: self.__data_dir + "/" +
+                self._CANDIDATES_BASE_FILENAME.format(
+                    name=name, date=date or self.__hgnc_data_date)
+                for name in MULTIMAP_NAMES}
+
+    def _normalized_paths(self, date=None):
+        # Only the keys differ from the exact multimap, whose gene columns
+        # are shared
+        paths = self._candidate_paths(date)
+        paths.update({name: self.__data_dir + "/" +
+                      self._NORMALIZED_BASE_FILENAME.format(
+                          name=name, date=date or self.__hgnc_data_date)
+                      for name in MULTIMAP_KEY_NAMES})
+        return paths
+
+    def iter_records(self):
+        """
+        Yields the records of the release backing this provider, from its
+        complete set or, once that is pruned, from the release store.
+        """
+        return iter_release_records(self.__data_dir, self.__hgnc_data_date,
+                                    self.__hgnc_json_path)
+
+    def store_release(self):
+        """
+        Adds the release to the release store, unless it is there already.
+        """
+        store = ReleaseStore(self.__data_dir)
+        if self.__hgnc_data_date not in store:
+            store.add_release(self.__hgnc_data_date, self._timed_records())
+
+    def _base_release(self, store):
+        # The closest other stored release whose indexes are built, to
+        # update from: preferably an earlier one
+        release = self.__hgnc_data_date
+        built = [date for date in store.releases() if date != release and
+                 all(os.path.isfile(p) for p
+                     in self._normalized_paths(date).values())]
+        earlier = [date for date in built if date < release]
+        if earlier:
+            return earlier[-1]
+        return min(built, default=None)
+
+    def build_indexes(self, force=False):
+        """
+        Builds every HGNC-derived index, unless they all exist already.
+
+        When the indexes of another stored release exist, only the genes
+        that differ from it are applied. Otherwise the indexes are built in
+        a single pass over the records, which also adds the release to the
+        release store.
+
+        One process builds at a time; others that need the same indexes
+        wait for it and use its result.
+
+        Args:
+            force (bool): Rebuild even if the indexes exist.
+            Defaults to False.
+        """
+        if not force and self._indexes_exist():
+            return
+        with data_dir_lock(self.__data_dir, 'hgnc_build'):
+            # Another process may have built them while this one waited
+            if force or not self._indexes_exist():
+                self._build_indexes(force)
+
+    def _indexes_exist(self):
+        return all(os.path.isfile(p) for p in [
+            *self._index_paths().values(),
+            *self._normalized_paths().values()])
+
+    def _build_indexes(self, force):
+        paths = self._index_paths()
+        candidate_paths = self._candidate_paths()
+        normalized_paths = self._normalized_paths()
+        release = self.__hgnc_data_date
+        store = ReleaseStore(self.__data_dir)
+        base = None if force else self._base_release(store)
+        with metrics.timer('hgnc.build_indexes', release=release):
+            if base is None:
+                maps, candidates, normalized = self._build_multimaps(store)
+            else:
+                candidates, normalized = self._update_multimaps(store, base)
+                maps = hgnc_maps_from_multimap(candidates)
+            write_arrays(candidates, candidate_paths)
+            write_arrays(normalized, {name: normalized_paths[name]
+                                      for name in MULTIMAP_KEY_NAMES})
+            write_indexes(maps, paths)
+
+    def _timed_records(self):
+        release = self.__hgnc_data_date
+        if os.path.isfile(self.__hgnc_json_path):
+            metrics.count('hgnc.bytes_read',
+                          os.path.getsize(self.__hgnc_json_path),
+                          release=release)
+        # Parsing is timed on its own, although it happens in the same
+        # pass as the build
+        return metrics.timed_iter('hgnc.parse', self.iter_records(),
+                                  'hgnc.records', release=release)
+
+    def _build_multimaps(self, store):
+        release = self.__hgnc_data_date
+        self.logger.info(f"Building HGNC indexes for {release}")
+        records = self._timed_records()
+        writer = None
+        if release not in store:
+            writer = store.writer(release)
+            records = writer.consume(records)
+        candidates = SymbolMultimapBuilder()
+        normalized = SymbolMultimapBuilder(normalize=normalize_symbol)
+        maps = build_hgnc_maps(normalized.consume(
+            candidates.consume(records)))
+        if writer is not None:
+            writer.commit()
+        return maps, candidates.build(), normalized.build()
+
+    def _update_multimaps(self, store, base):
+        # Applies the genes that differ from the base release to its
+        # multimaps, from which the other indexes follow
+        release = self.__hgnc_data_date
+        self.store_release()
+        new_offsets = store.offsets(release)
+        row_map, rows = match_rows(store.offsets(base), new_offsets)
+        self.logger.info(f"Updating HGNC indexes from {base} to {release} "
+                         f"with {len(rows)} changed records")
+        metrics.count('hgnc.changed_records', len(rows), release=release)
+
+        candidates = SymbolMultimapBuilder()
+        normalized = SymbolMultimapBuilder(normalize=normalize_symbol)
+        for record in store.read_records(new_offsets[rows].tolist()):
+            candidates.add(record)
+            normalized.add(record)
+        base_arrays = {
+            name: {key: np.load(path, mmap_mode='r')
+                   for key, path in paths.items()}
+            for name, paths in (('candidates', self._candidate_paths(base)),
+                                ('normalized',
+                                 self._normalized_paths(base)))}
+        return (candidates.update(base_arrays['candidates'], row_map, rows),
+                normalized.update(base_arrays['normalized'], row_map, rows))
+
+    def _get_index(self, name):
+        # Derived maps are stored as memory-mapped binary indexes, which
+        # are queried in place instead of being loaded into a dict
+        if name not in self.__indexes:
+            self.build_indexes()
+            self.__indexes[name] = BinaryIndex(self._index_paths()[name])
+        return self.__indexes[name]
+
+    def export_json(self, data_dir=None):
+        """
+        Exports the derived maps as JSON dictionaries, named
+        symbol_thesaurus_{date}.json, symbol_to_ensembl_{date}.json and
+        ensembl_to_symbol_{date}.json.
+
+        Args:
+            data_dir (str): The directory to write to.
+            Defaults to the provider's data directory.
+        """
+        data_dir = data_dir or self.__data_dir
+        maps = build_hgnc_maps(self.iter_records())
+        for name in self._INDEX_NAMES:
+            dict_filename = self._JSON_BASE_FILENAME.format(
+                name=name, date=self.__hgnc_data_date)
+            path = data_dir + "/" + dict_filename
+            # Readers never see a half-written file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(maps[name], file)
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def _lookup(index, gene_list):
+        # Genes that are missing or map to themselves are left out
+        result = {}
+        for key in gene_list:
+            value = index.get(key)
+            if value is not None and value != key:
+                result[key] = value
+        return result
+
     def update_gene_symbols(self, gene_list):
         """
         Returns the latest gene symbols for the given list of gene names.
@@ -104,40 +528,7 @@ class HgncTranslationProvider(TranslationProvider):
         Returns:
             dict: A dictionary mapping each gene to its update gene symbol.
         """
-        self.__symbol_thesaurus = None
-
-        # Prepare the thesaurus, where each 'symbol', 'prev_symbol'
-        # and 'alias_symbol' all map to 'symbol'
-        dict_filename = self._SYMBOL_THESAURUS_BASE_FILENAME.format(
-            date=self.__hgnc_data_date)
-        dict_json_path = self.__data_dir + "/" + dict_filename
-
-        # Does it already exist?
-        if os.path.isfile(dict_json_path):
-            with open(dict_json_path, 'r', encoding='utf8') as f:
-                self.__symbol_thesaurus = json.loads(f.read())
-        else:
-            self.__symbol_thesaurus = {}
-            for item in self.__hgnc_data:
-                # The current gene name
-                symbol = item.get("symbol")
-                self.__symbol_thesaurus[symbol] = symbol
-
-                # Optionally available older synonyms
-                prev_symbols = item.get("prev_symbol", [])
-                for sym in prev_symbols:
-                    self.__symbol_thesaurus[sym] = symbol
-                alias_symbols = item.get("alias_symbol", [])
-                for sym in alias_symbols:
-                    self.__symbol_thesaurus[sym] = symbol
-
-            # Save the thesaurus
-            with open(dict_json_path, 'w') as file:
-                json.dump(self.__symbol_thesaurus, file)
-
-        return {key: self.__symbol_thesaurus[key] for key in gene_list
-                if key in self.__symbol_thesaurus and
-                key != self.__symbol_thesaurus[key]}
+        return self._lookup(self._get_index('symbol_thesaurus'), gene_list)
 
     def _translate_ensembl_ids_to_symbols(self, gene_list):
         """
@@ -149,34 +540,7 @@ class HgncTranslationProvider(TranslationProvider):
         Returns:
             dict: A dictionary mapping each Ensembl ID to its gene symbol.
         """
-        self.__ensembl_to_symbol_dict = None
-
-        # Prepare the dictionary, where each 'ensembl_id' maps to 'symbol'
-        dict_filename = self._ENSEMBL_TO_SYMBOL_DICT_BASE_FILENAME.format(
-            date=self.__hgnc_data_date)
-        dict_json_path = self.__data_dir + "/" + dict_filename
-
-        # Does it already exist?
-        if os.path.isfile(dict_json_path):
-            with open(dict_json_path, 'r', encoding='utf8') as f:
-                self.__ensembl_to_symbol_dict = json.loads(f.read())
-        else:
-            self.__ensembl_to_symbol_dict = {}
-            for item in self.__hgnc_data:
-                # The ensembl id
-                ensembl_id = item.get("ensembl_gene_id")
-
-                # The current gene name
-                symbol = item.get("symbol")
-                self.__ensembl_to_symbol_dict[ensembl_id] = symbol
-
-            # Save the dict
-            with open(dict_json_path, 'w') as file:
-                json.dump(self.__ensembl_to_symbol_dict, file)
-
-        return {key: self.__ensembl_to_symbol_dict[key] for key in gene_list
-                if key in self.__ensembl_to_symbol_dict and
-                key != self.__ensembl_to_symbol_dict[key]}
+        return self._lookup(self._get_index('ensembl_to_symbol'), gene_list)
 
     def _translate_symbols_to_ensembl_ids(self, gene_list):
         """
@@ -188,43 +552,78 @@ class HgncTranslationProvider(TranslationProvider):
         Returns:
             dict: A dictionary mapping each gene symbol to its Ensembl ID.
         """
-        self.__symbol_to_ensembl_dict = None
+        return self._lookup(self._get_index('symbol_to_ensembl'), gene_list)
+
+    def lookup_symbols(self, gene_list):
+        """
+        Returns the current gene symbol for each of the given gene names,
+        keeping the input order. Unknown genes give None.
+        """
+        index = self._get_index('symbol_thesaurus')
+        return [index.get(key) for key in gene_list]
+
+    def _get_multimap(self, normalize):
+        if normalize:
+            if self.__normalized is None:
+                self.build_indexes()
+                self.__normalized = SymbolMultimap.load(
+                    self._normalized_paths())
+            return self.__normalized
+        if self.__candidates is None:
+            self.build_indexes()
+            self.__candidates = SymbolMultimap.load(self._candidate_paths())
+        return self.__candidates
+
+    def lookup_candidates(self, gene_list, normalize=False):
+        """
+        Returns every gene each of the given gene names may refer to,
+        keeping the input order.
+
+        Args:
+            gene_list (list): The gene symbols to look up.
+            normalize (bool): Match regardless of case, surrounding
+            whitespace and punctuation. Defaults to False.
+
+        Returns:
+            list: For each gene, a list of SymbolCandidate ranked from
+            current symbols over previous symbols to aliases. Unknown genes
+            give an empty list.
+        """
+        if normalize:
+            gene_list = [normalize_symbol(gene) for gene in gene_list]
+        return self._get_multimap(normalize).lookup(gene_list)
+
+    def complete(self, prefix, limit=10):
+        """
+        Autocompletes a gene symbol over current, previous and alias
+        symbols, regardless of case.
 
-        # Prepare the dictionary, where each 'symbol', 'prev_symbol'
-        # and 'alias_symbol' all map to 'ensembl_id'
-        dict_filename = self._SYMBOL_TO_ENSEMBL_DICT_BASE_FILENAME.format(
-            date=self.__hgnc_data_date)
-        dict_json_path = self.__data_dir + "/" + dict_filename
+        Args:
+            prefix (str): What has been typed so far.
+            limit (int): The maximum number of completions. Defaults to 10.
 
-        # Does it already exist?
-        if os.path.isfile(dict_json_path):
-            with open(dict_json_path, 'r', encoding='utf8') as f:
-                self.__symbol_to_ensembl_dict = json.loads(f.read())
+        Returns:
+            list: (symbol, candidates) pairs in sorted order, with the
+            symbols normalized and the candidates as in lookup_candidates.
+        """
+        return self._get_multimap(True).complete(
+            normalize_symbol(prefix) or '', limit)
+
+    def lookup(self,
+               gene_list: list,
+               source: _IDENTIFIER_TYPES,
+               target: _IDENTIFIER_TYPES) -> list:
+        # One vectorized search over the exact multimap, rather than a
+        # binary search of the indexes per gene
+        if source == 'symbol' and target == 'ensembl_id':
+            return self._get_multimap(False).resolve(gene_list, 'ensembl_id')
+        elif source == 'ensembl_id' and target == 'symbol':
+            return self._get_multimap(False).resolve_by(
+                gene_list, 'ensembl_id', 'symbol')
         else:
-            self.__symbol_to_ensembl_dict = {}
-            for item in self.__hgnc_data:
-                # The ensembl id
-                ensembl_id = item.get("ensembl_gene_id")
-
-                # The current gene name
-                symbol = item.get("symbol")
-                self.__symbol_to_ensembl_dict[symbol] = ensembl_id
-
-                # Optionally available older synonyms
-                prev_symbols = item.get("prev_symbol", [])
-                for sym in prev_symbols:
-                    self.__symbol_to_ensembl_dict[sym] = ensembl_id
-                alias_symbols = item.get("alias_symbol", [])
-                for sym in alias_symbols:
-                    self.__symbol_to_ensembl_dict[sym] = ensembl_id
-
-            # Save the dict
-            with open(dict_json_path, 'w') as file:
-                json.dump(self.__symbol_to_ensembl_dict, file)
-
-        return {key: self.__symbol_to_ensembl_dict[key] for key in gene_list
-                if key in self.__symbol_to_ensembl_dict and
-                key != self.__symbol_to_ensembl_dict[key]}
+            err_msg = """Error: valid values for source and target are
+            'symbol' and 'ensembl_id'."""
+            raise ValueError(err_msg)
 
     def translate_list(self,
                        gene_list: list,
@@ -0,0 +1,138 @@
+import os
+import numpy as np
+from gene_thesaurus.binary_index import BinaryIndex
+
+
+def build_hgnc_maps(records):
+    """
+    Builds every HGNC-derived map in a single pass over the records.
+
+    Args:
+        records (iterable): HGNC records, e.g. from iter_hgnc_records.
+
+    Returns:
+        dict: The maps by name:
+            'symbol_thesaurus': each 'symbol', 'prev_symbol' and
+            'alias_symbol' maps to 'symbol',
+            'symbol_to_ensembl': each 'symbol', 'prev_symbol' and
+            'alias_symbol' maps to 'ensembl_gene_id',
+            'ensembl_to_symbol': each 'ensembl_gene_id' maps to 'symbol'.
+    """
+    symbol_thesaurus = {}
+    symbol_to_ensembl = {}
+    ensembl_to_symbol = {}
+
+    for item in records:
+        # The current gene name and its ensembl id
+        symbol = item.get("symbol")
+        ensembl_id = item.get("ensembl_gene_id")
+
+        # Optionally available older synonyms. Like before, when several
+        # genes share a synonym, the last one wins.
+        synonyms = [symbol]
+        synonyms.extend(item.get("prev_symbol", []))
+        synonyms.extend(item.get("alias_symbol", []))
+        for sym in synonyms:
+            symbol_thesaurus[sym] = symbol
+            symbol_to_ensembl[sym] = ensembl_id
+
+        ensembl_to_symbol[ensembl_id] = symbol
+
+    return {
+        'symbol_thesaurus': symbol_thesaurus,
+        'symbol_to_ensembl': symbol_to_ensembl,
+        'ensembl_to_symbol': ensembl_to_symbol,
+    }
+
+
+def hgnc_maps_from_multimap(arrays):
+    """
+    Derives the maps of build_hgnc_maps from an exact symbol multimap,
+    without going over the records again.
+
+    Args:
+        arrays (dict): The arrays of a SymbolMultimap, including the gene
+        columns.
+
+    Returns:
+        dict: The maps by name, as returned by build_hgnc_maps, without
+        the entries write_indexes leaves out.
+    """
+    keys = np.char.decode(arrays['keys'], 'utf8').tolist()
+    symbols = np.char.decode(arrays['symbol'], 'utf8')
+    ensembl_ids = np.char.decode(arrays['ensembl_id'], 'utf8')
+
+    # Like in build_hgnc_maps, the last record using a symbol wins, and
+    # wins even without a value
+    last = np.zeros(len(keys), dtype=np.int64)
+    if len(keys):
+        last = np.maximum.reduceat(arrays['gene_ids'],
+                                   arrays['offsets'][:-1].astype(np.int64))
+    symbol_thesaurus = {key: value for key, value
+                        in zip(keys, symbols[last].tolist()) if value}
+    symbol_to_ensembl = {key: value for key, value
+                         in zip(keys, ensembl_ids[last].tolist()) if value}
+    ensembl_to_symbol = dict(zip(ensembl_ids.tolist(), symbols.tolist()))
+    ensembl_to_symbol.pop('', None)
+
+    return {
+        'symbol_thesaurus': symbol_thesaurus,
+        'symbol_to_ensembl': symbol_to_ensembl,
+        'ensembl_to_symbol': {key: value for key, value
+                              in ensembl_to_symbol.items() if value},
+    }
+
+
+def write_indexes(maps, paths):
+    """
+    Writes a set of maps as binary indexes. All indexes are written to
+    temporary files first and only then renamed into place, so a failed
+    build never leaves a partial set behind.
+
+    Args:
+        maps (dict): The maps by name, as returned by build_hgnc_maps.
+        paths (dict): The index path for each map name.
+    """
+    tmp_paths = {}
+    try:
+        for name, path in paths.items():
+            tmp_paths[name] = f"{path}.{os.getpid()}.partial"
+            # Entries without a key or a value cannot be translated
+            BinaryIndex.write(tmp_paths[name],
+                              {key: value for key, value
+                               in maps[name].items()
+                               if key is not None and value is not None})
+    except BaseException:
+        for tmp_path in tmp_paths.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    for name, path in paths.items():
+        os.replace(tmp_paths[name], path)
+
+
+def write_arrays(arrays, paths):
+    """
+    Writes a set of arrays as .npy files, which can be memory-mapped. Like
+    write_indexes, all files are renamed into place only once every one of
+    them is written.
+
+    Args:
+        arrays (dict): The arrays by name.
+        paths (dict): The .npy path for each array name.
+    """
+    tmp_paths = {}
+    try:
+        for name, path in paths.items():
+            tmp_paths[name] = f"{path}.{os.getpid()}.partial"
+            with open(tmp_paths[name], 'wb') as f:
+                np.save(f, arrays[name])
+    except BaseException:
+        for tmp_path in tmp_paths.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    for name, path in paths.items():
+        os.replace(tmp_paths[name], path)
@@ -0,0 +1,163 @@
+import sys
+import numpy as np
+
+AGGREGATIONS = ('sum', 'mean', 'max', 'first')
+
+
+def _is_sparse(matrix):
+    # Only sparse matrices need scipy, so it is never imported here
+    sparse = sys.modules.get('scipy.sparse')
+    return sparse is not None and sparse.issparse(matrix)
+
+
+def is_dataframe(matrix):
+    """
+    Whether matrix is a pd.DataFrame, without importing pandas, which like
+    scipy is only needed for its own objects.
+    """
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(matrix, pd.DataFrame)
+
+
+def factorize(values):
+    """
+    Encodes values as codes into their distinct values, like pd.factorize,
+    which is used when pandas is loaded already.
+
+    Args:
+        values (array-like): The values.
+
+    Returns:
+        tuple: The code of each value, -1 for None and NaN, and the
+        distinct values in order of first appearance, as an object array.
+    """
+    values = np.asarray(values, dtype=object)
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        codes, uniques = pd.factorize(values)
+        return codes, np.asarray(uniques, dtype=object)
+
+    index = {}
+    # NaN is the only value that differs from itself
+    codes = np.fromiter((-1 if value is None or value != value
+                         else index.setdefault(value, len(index))
+                         for value in values.tolist()),
+                        dtype=np.int64, count=len(values))
+    uniques = np.empty(len(index), dtype=object)
+    for i, value in enumerate(index):
+        uniques[i] = value
+    return codes, uniques
+
+
+def _collapse_dense(matrix, codes, n_groups, agg):
+    if n_groups == 0:
+        return matrix[:0]
+    first_rows = _first_rows(codes, n_groups)
+    if agg == 'first':
+        return matrix[first_rows]
+
+    # Bring the rows of each group together. This is the only copy of the
+    # matrix, and it is skipped if the rows already are in group order.
+    keep = codes >= 0
+    order = np.argsort(codes, kind='stable')[np.count_nonzero(~keep):]
+    if not np.array_equal(order, np.arange(len(codes))):
+        matrix = matrix[order]
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+    if agg == 'max':
+        return np.maximum.reduceat(matrix, starts, axis=0)
+    collapsed = np.add.reduceat(matrix, starts, axis=0)
+    if agg == 'mean':
+        counts = np.diff(np.r_[starts, len(sorted_codes)])
+        collapsed = collapsed / counts[:, None]
+    return collapsed
+
+
+def _collapse_sparse(matrix, codes, n_groups, agg):
+    from scipy import sparse
+
+    matrix = matrix.tocsr()
+    if n_groups == 0:
+        return matrix[:0]
+    first_rows = _first_rows(codes, n_groups)
+    if agg == 'first':
+        return matrix[first_rows]
+
+    keep = codes >= 0
+    rows = np.flatnonzero(keep)
+    counts = np.bincount(codes[keep], minlength=n_groups)
+
+    if agg in ('sum', 'mean'):
+        # Summing is a product with a group indicator matrix
+        indicator = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=matrix.dtype), (codes[keep], rows)),
+            shape=(n_groups, matrix.shape[0]))
+        collapsed = indicator @ matrix
+        if agg == 'mean':
+            collapsed = sparse.diags(1 / counts) @ collapsed
+        return collapsed.tocsr()
+
+    # max: reduce the stored values of each (group, column) pair
+    coo = matrix.tocoo()
+    entry_codes = codes[coo.row]
+    kept = entry_codes >= 0
+    group, col, data = entry_codes[kept], coo.col[kept], coo.data[kept]
+    order = np.lexsort((col, group))
+    group, col, data = group[order], col[order], data[order]
+    if len(data) == 0:
+        return sparse.csr_matrix((n_groups, matrix.shape[1]),
+                                 dtype=matrix.dtype)
+    starts = np.flatnonzero(np.r_[True, (group[1:] != group[:-1]) |
+                                  (col[1:] != col[:-1])])
+    maxima = np.maximum.reduceat(data, starts)
+    # Pairs with fewer stored values than rows in the group also hold
+    # implicit zeros
+    n_stored = np.diff(np.r_[starts, len(data)])
+    has_zeros = n_stored < counts[group[starts]]
+    maxima = np.where(has_zeros, np.maximum(maxima, 0), maxima)
+    return sparse.csr_matrix((maxima, (group[starts], col[starts])),
+                             shape=(n_groups, matrix.shape[1]))
+
+
+def _first_rows(codes, n_groups):
+    # The first row of each group, in group order
+    keep = np.flatnonzero(codes >= 0)
+    _, first = np.unique(codes[keep], return_index=True)
+    return keep[first]
+
+
+def collapse_rows(matrix, labels, agg='sum'):
+    """
+    Aggregates the rows of a matrix that share a label, in one vectorized
+    pass. Rows labelled None are dropped.
+
+    Args:
+        matrix: A NumPy array, pd.DataFrame or SciPy sparse matrix, with
+        one row per label.
+        labels (array-like): The label of each row.
+        agg (str): How to combine rows with the same label, one of 'sum',
+        'mean', 'max' and 'first'. Defaults to 'sum'.
+
+    Returns:
+        tuple: The collapsed matrix, of the same kind as the input, and
+        its labels, in order of first appearance. A pd.DataFrame comes
+        back with the labels as its index instead.
+    """
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Error: agg must be one of {AGGREGATIONS}.")
+    if len(labels) != matrix.shape[0]:
+        raise ValueError("Error: there must be one label per row.")
+
+    codes, uniques = factorize(labels)
+    n_groups = len(uniques)
+
+    if is_dataframe(matrix):
+        import pandas as pd
+        collapsed = _collapse_dense(matrix.to_numpy(), codes, n_groups, agg)
+        return pd.DataFrame(collapsed,
+                            index=pd.Index(uniques, name=matrix.index.name),
+                            columns=matrix.columns)
+    if _is_sparse(matrix):
+        return _collapse_sparse(matrix, codes, n_groups, agg), uniques
+    return _collapse_dense(np.asarray(matrix), codes, n_groups, agg), uniques
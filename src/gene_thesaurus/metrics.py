@@ -0,0 +1,200 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from collections import namedtuple
+
+MetricEvent = namedtuple('MetricEvent', ['name', 'kind', 'value', 'tags'])
+MetricEvent.__doc__ = """
+A measurement of a pipeline stage. kind is 'timing' (value in seconds) or
+'count', and tags is a dict with details such as the HGNC release.
+"""
+
+# Each stage reports MetricEvents to these hooks. Without hooks, reporting
+# costs a check per stage. The tuple is replaced rather than
+# mutated, so reporting never needs a lock.
+_hooks = ()
+_hooks_lock = threading.Lock()
+# Hooks that only receive the events of the current thread or task, see
+# collecting()
+_context_hooks = contextvars.ContextVar('metrics_context_hooks', default=())
+_logger = logging.getLogger('metrics')
+
+
+def add_hook(hook):
+    """
+    Registers a callable that is called with each MetricEvent, from the
+    thread doing the work.
+
+    Args:
+        hook (callable): Takes a MetricEvent. Exceptions it raises are
+        logged and otherwise ignored.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    """
+    Unregisters a hook added with add_hook. Unknown hooks are ignored.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h != hook)
+
+
+@contextlib.contextmanager
+def collecting(hook):
+    """
+    Returns a context manager that reports the events of its block to hook,
+    in addition to the hooks added with add_hook. Only events of the
+    current thread or asyncio task are reported, so work done elsewhere at
+    the same time is left out. Nested blocks with the same hook report each
+    event once.
+
+    Args:
+        hook (callable): Takes a MetricEvent.
+    """
+    hooks = _context_hooks.get()
+    if hook in hooks:
+        yield
+        return
+    token = _context_hooks.set(hooks + (hook,))
+    try:
+        yield
+    finally:
+        _context_hooks.reset(token)
+
+
+def enabled() -> bool:
+    """Whether any hook receives events here."""
+    return bool(_hooks or _context_hooks.get())
+
+
+def _emit(event):
+    for hook in _hooks + _context_hooks.get():
+        try:
+            hook(event)
+        except Exception:
+            _logger.exception(f"Metrics hook {hook!r} failed")
+
+
+def count(name, value=1, **tags):
+    """
+    Reports a count, e.g. of bytes or records.
+    """
+    if _hooks or _context_hooks.get():
+        _emit(MetricEvent(name, 'count', value, tags))
+
+
+class _Timer:
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _emit(MetricEvent(self.name, 'timing',
+                          time.perf_counter() - self.__start, self.tags))
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **tags):
+    """
+    Returns a context manager that reports how long its block took.
+    """
+    if _hooks or _context_hooks.get():
+        return _Timer(name, tags)
+    return _NULL_TIMER
+
+
+def timed_iter(name, items, count_name=None, **tags):
+    """
+    Passes items on, reporting the time spent producing them, but not
+    the time the consumer spends on them. Used for parsers that are
+    consumed by index builders in the same pass.
+
+    Args:
+        name (str): The name of the timing.
+        items (iterable): The items, e.g. a parser's records.
+        count_name (str): Optional. The name of a count of the items.
+    """
+    if not (_hooks or _context_hooks.get()):
+        return items
+    return _timed_iter(name, items, count_name, tags)
+
+
+def _timed_iter(name, items, count_name, tags):
+    seconds = 0.0
+    n_items = 0
+    items = iter(items)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                seconds += time.perf_counter() - start
+                break
+            seconds += time.perf_counter() - start
+            n_items += 1
+            yield item
+    finally:
+        _emit(MetricEvent(name, 'timing', seconds, tags))
+        if count_name is not None:
+            _emit(MetricEvent(count_name, 'count', n_items, tags))
+
+
+class StatsCollector:
+    """
+    Hook that aggregates events by name: counts are summed, and timings
+    keep their number, total and maximum.
+    """
+
+    def __init__(self):
+        self.__counts = {}
+        self.__timings = {}
+        self.__lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.__lock:
+            if event.kind == 'count':
+                self.__counts[event.name] = \
+                    self.__counts.get(event.name, 0) + event.value
+                return
+            timing = self.__timings.setdefault(
+                event.name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            timing['count'] += 1
+            timing['total'] += event.value
+            timing['max'] = max(timing['max'], event.value)
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: 'counts', mapping each count to its sum, and 'timings',
+            mapping each timing to its count, total and max seconds.
+        """
+        with self.__lock:
+            return {'counts': dict(self.__counts),
+                    'timings': {name: dict(timing) for name, timing
+                                in self.__timings.items()}}
+
+    def reset(self):
+        with self.__lock:
+            self.__counts.clear()
+            self.__timings.clear()
@@ -1,88 +1,216 @@
-import requests
+import gzip
 import os
-import pandas as pd
+import re
+import time
+import numpy as np
 import logging
+from gene_thesaurus import metrics
+from gene_thesaurus.download import DownloadException, Downloader
+from gene_thesaurus.file_lock import data_dir_lock, is_writable
+from gene_thesaurus.index_builder import write_arrays
 from gene_thesaurus.translation_provider import TranslationProvider
 
+_ENSEMBL_XREF = re.compile(r'Ensembl:(ENSG\d{11})')
+# Columnar cache of read_gene_info, one array per column
+_GENE_INFO_BASE_FILENAME = 'ncbi_{column}_{stamp}.npy'
+_GENE_INFO_COLUMNS = ('gene_id', 'symbol', 'ensembl_id')
+
+
+def read_gene_info(path):
+    """
+    Reads the GeneID, Symbol and Ensembl ID (from dbXrefs) of each gene in
+    an NCBI gene_info file, sorted by GeneID.
+
+    The file is streamed line by line. It is tab-separated without
+    quoting, so only the leading columns of each line are split off.
+
+    Args:
+        path (str): The path to the gzipped gene_info file.
+
+    Returns:
+        tuple: Aligned arrays of GeneIDs (int64), symbols and Ensembl IDs,
+        where genes without an Ensembl ID have None.
+    """
+    gene_ids, symbols, ensembl_ids = [], [], []
+    with gzip.open(path, 'rt', encoding='utf8') as f:
+        header = f.readline().rstrip('\n').split('\t')
+        try:
+            columns = [header.index(name)
+                       for name in ('GeneID', 'Symbol', 'dbXrefs')]
+        except ValueError:
+            raise ValueError(
+                f"Error: {path} is not a gene_info file.") from None
+        gene_id_column, symbol_column, xrefs_column = columns
+        n_splits = max(columns) + 1
+
+        for line in f:
+            fields = line.split('\t', n_splits)
+            gene_ids.append(int(fields[gene_id_column]))
+            symbols.append(fields[symbol_column])
+            match = _ENSEMBL_XREF.search(fields[xrefs_column])
+            ensembl_ids.append(match.group(1) if match else None)
+
+    order = np.argsort(np.array(gene_ids, dtype=np.int64), kind='stable')
+    return (np.array(gene_ids, dtype=np.int64)[order],
+            np.array(symbols, dtype=object)[order],
+            np.array(ensembl_ids, dtype=object)[order])
+
+
+def load_gene_info(data_dir, path):
+    """
+    Same as read_gene_info, but from a columnar cache in data_dir. The
+    cache is built on first use, once per download of the gene_info file,
+    so every HGNC release is joined with it without parsing the file again.
+
+    Args:
+        data_dir (str): Where the cache is stored.
+        path (str): The path to the gzipped gene_info file.
+
+    Returns:
+        tuple: As returned by read_gene_info.
+    """
+    stamp = int(os.path.getmtime(path))
+    paths = {column: data_dir + "/" +
+             _GENE_INFO_BASE_FILENAME.format(column=column, stamp=stamp)
+             for column in _GENE_INFO_COLUMNS}
+    if not all(os.path.isfile(p) for p in paths.values()):
+        with data_dir_lock(data_dir, 'ncbi_index'):
+            # Another process may have built it while this one waited
+            if not all(os.path.isfile(p) for p in paths.values()):
+                with metrics.timer('ncbi.parse'):
+                    gene_ids, symbols, ensembl_ids = read_gene_info(path)
+                metrics.count('ncbi.bytes_read', os.path.getsize(path))
+                write_arrays({'gene_id': gene_ids,
+                              'symbol': _to_bytes(symbols),
+                              'ensembl_id': _to_bytes(ensembl_ids)}, paths)
+
+    columns = {column: np.load(p) for column, p in paths.items()}
+    return (columns['gene_id'],
+            _from_bytes(columns['symbol']),
+            _from_bytes(columns['ensembl_id']))
+
+
+def _to_bytes(values):
+    # Fixed-width byte strings load without unpickling, unlike objects
+    values = [v if isinstance(v, str) else '' for v in values]
+    return np.char.encode(np.array(values, dtype=str), 'utf8')
+
+
+def _from_bytes(values):
+    values = np.char.decode(values, 'utf8').astype(object)
+    values[values == ''] = None
+    return values
+
 
 class NcbiTranslationProvider(TranslationProvider):
     """
     NCBI Translation Provider for translating entrez ids to Ensembl ids or
     gene symbols.
+
+    Kept for compatibility: lookups are delegated to the cross-reference
+    table of the latest HGNC release, as in GeneThesaurus.translate_genes,
+    which is the preferred interface.
     """
     _NCBI_BASE_URL = 'https://ftp.ncbi.nlm.nih.gov/gene/DATA/GENE_INFO/Mammalia/'  # noqa: E501
     _NCBI_FILENAME = 'Homo_sapiens.gene_info.gz'
 
     def __init__(self,
                  data_dir='/tmp'):
-        self.__data_dir = data_dir
-        self.__ncbi_gz_path = None
-        self.__ncbi_data = None
+        # Imported here, as the cross-reference table is built from this
+        # module's data
+        from gene_thesaurus.hgnc_translation_provider import \
+            HgncTranslationProvider
+        from gene_thesaurus.xref_translation_provider import \
+            XrefTranslationProvider
 
+        self.__data_dir = data_dir
         super().__init__(self.__data_dir)
         self.logger = logging.getLogger(__class__.__name__)
-        self._get_ncbi_data()
 
-    def _get_ncbi_data(self):
-        self.__ncbi_gz_path = self.__data_dir + "/" + self._NCBI_FILENAME
-
-        if not os.path.isfile(self.__ncbi_gz_path):
-            url = self._NCBI_BASE_URL + self._NCBI_FILENAME
-            self.logger.debug(f"Trying NCBI url: {url}")
-
-            # 1 sec to connect, 10 sec to read
-            r = requests.get(url, stream=True)
-            with open(self.__ncbi_gz_path, 'wb') as f:
-                f.write(r.content)
-
-        # Load the data
-        self.__ncbi_data = pd.read_csv(self.__ncbi_gz_path,
-                                       sep='\t',
-                                       compression='gzip')
-
-    def _subset_ncbi_data(self, gene_list: list) -> list:
-        # Get all rows where GeneId is in the gene_list
-        entrez_df = self.__ncbi_data[self.__ncbi_data['GeneID'].isin(gene_list)]
-
-        # Sort entrez_df so that the GeneIds are in the same order as gene_list
-        entrez_df = entrez_df.set_index('GeneID')
-        entrez_df = entrez_df.reindex(gene_list)
-
-        return entrez_df
-
-    def _translate_list_to_symbol(self, gene_list: list) -> dict:
-        entrez_df = self._subset_ncbi_data(gene_list)
-        entrez_dict = entrez_df['Symbol'].fillna('').to_dict()
-        return entrez_dict
+        hgnc = HgncTranslationProvider(self.__data_dir)
+        self.__xref = XrefTranslationProvider(
+            self.__data_dir, hgnc.data_path, hgnc.data_date,
+            self.fetch(self.__data_dir))
+        hgnc.close()
+
+    @classmethod
+    def fetch(cls, data_dir='/tmp', max_age=24 * 60 * 60, base_url=None,
+              downloader=None):
+        """
+        Downloads the NCBI gene_info file into data_dir. A cached file is
+        checked with the server once max_age has passed, and only
+        downloaded again if the server reports it changed.
+
+        Args:
+            data_dir (str): Where downloaded data is cached.
+            max_age (float): How many seconds a cached file is used before
+            it is checked again, or None to never check it. Defaults to
+            one day.
+            base_url (str): Where to download the file from. Defaults to
+            the NCBI FTP site.
+            downloader (Downloader): Optional. Defaults to the shared
+            Downloader.
+
+        Returns:
+            str: The path to the file.
+        """
+        path = data_dir + "/" + cls._NCBI_FILENAME
+
+        def is_fresh(checked):
+            return checked is not None and (
+                max_age is None or time.time() - checked < max_age)
+
+        checked = Downloader.last_checked(path)
+        if is_fresh(checked):
+            return path
+        if checked is not None and not is_writable(data_dir):
+            # A newer file could not be stored, so the cached one is used
+            return path
+        with data_dir_lock(data_dir, 'ncbi_download'):
+            # Another process may have checked it while this one waited
+            checked = Downloader.last_checked(path)
+            if is_fresh(checked):
+                return path
+
+            url = (base_url or cls._NCBI_BASE_URL) + cls._NCBI_FILENAME
+            logger = logging.getLogger(cls.__name__)
+            logger.debug(f"Trying NCBI url: {url}")
+            try:
+                (downloader or Downloader.shared()).download(
+                    url, path, conditional=True, name='ncbi')
+            except DownloadException as e:
+                if checked is None:
+                    raise
+                # The cached file beats none while the server is
+                # unreachable
+                logger.warning(f"Could not check {url}, using the cached "
+                               f"file: {e.message}")
+        return path
+
+    @property
+    def nbytes(self):
+        return self.__xref.nbytes
+
+    def close(self):
+        self.__xref.close()
+
+    @staticmethod
+    def _check_types(source, target):
+        if source != 'entrez_id' or target not in ('symbol', 'ensembl_id'):
+            err_msg = """Error: valid values for source and target are
+            'symbol' and 'ensembl_id'."""
+            raise ValueError(err_msg)
 
-    def _translate_list_to_ensembl_id(self, gene_list: list) -> dict:
-        entrez_df = self._subset_ncbi_data(gene_list)
-        entrez_df['ensembl_id'] = entrez_df['dbXrefs'].str.extract(
-            r'Ensembl:(ENSG\d{11})')
-        entrez_dict = entrez_df['ensembl_id'].fillna('').to_dict()
-        # Sort the dictionary so that the keys are in the same order as gene_list
-        return entrez_dict
+    def lookup(self,
+               gene_list: list,
+               source: TranslationProvider._IDENTIFIER_TYPES,
+               target: TranslationProvider._IDENTIFIER_TYPES) -> list:
+        self._check_types(source, target)
+        return self.__xref.lookup(gene_list, source, target)
 
     def translate_list(self,
                        gene_list: list,
                        source: TranslationProvider._IDENTIFIER_TYPES,
                        target: TranslationProvider._IDENTIFIER_TYPES) -> dict:
-        # Cast list of ids to list of ints
-        gene_list = [int(gene) for gene in gene_list]
-
-        valid = True
-        if source == 'entrez_id':
-            if target == 'symbol':
-                return self._translate_list_to_symbol(gene_list)
-            elif target == 'ensembl_id':
-                return self._translate_list_to_ensembl_id(gene_list)
-            else:
-                valid = False
-        else:
-            valid = False
-
-        if not valid:
-            err_msg = """Error: valid values for source and target are
-            'symbol' and 'ensembl_id'."""
-            raise ValueError(err_msg)
-
+        self._check_types(source, target)
+        return self.__xref.translate_list(gene_list, source, target)
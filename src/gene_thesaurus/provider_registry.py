@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from gene_thesaurus import metrics
+
+
+class ProviderRegistry:
+    """
+    Keeps loaded translation providers alive between calls, so that each
+    dataset is downloaded and parsed once and later lookups are served
+    from memory.
+
+    Providers are kept in least recently used order. When max_bytes is set
+    and the combined size of the loaded providers exceeds it, the least
+    recently used providers are dropped. Sizes are measured on every
+    access, as providers open their indexes lazily and grow after loading.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self,
+                 max_bytes=None,
+                 refresh_interval=60):
+        """
+        Args:
+            max_bytes (int): Memory cap for all loaded providers, in bytes.
+            Defaults to None (no cap).
+            refresh_interval (float): Minimum number of seconds between
+            checks for a newer dataset. Defaults to 60.
+        """
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self.__providers = OrderedDict()
+        self.__last_refresh = {}
+        self.__key_locks = {}
+        self.__lock = threading.Lock()
+        self.logger = logging.getLogger(__class__.__name__)
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process-wide registry shared by all GeneThesaurus
+        instances created with shared=True.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def __len__(self):
+        return len(self.__providers)
+
+    def __contains__(self, key):
+        return key in self.__providers
+
+    @property
+    def nbytes(self):
+        """Combined size of all loaded providers."""
+        with self.__lock:
+            return self._nbytes()
+
+    def _nbytes(self):
+        return sum(p.nbytes for p in self.__providers.values())
+
+    def get(self, key, factory, refresh=None):
+        """
+        Returns the provider registered under key, loading it on first use.
+
+        Args:
+            key (hashable): Identifies the dataset, e.g. ('hgnc', data_dir).
+            factory (callable): Called without arguments to load the
+            provider.
+            refresh (callable): Optional. Called with the loaded provider at
+            most once every refresh_interval seconds. Returns a replacement
+            provider, or None if the loaded one is still current.
+
+        Returns:
+            TranslationProvider: The loaded provider.
+        """
+        with self.__lock:
+            provider = self.__providers.get(key)
+            if provider is not None:
+                self.__providers.move_to_end(key)
+                # The provider may have grown since it was last measured
+                self._evict()
+                if refresh is None or not self._refresh_due(key):
+                    metrics.count('registry.hits', key=key)
+                    return provider
+            key_lock = self.__key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock, so lookups against other datasets
+        # are not blocked, but only once per key
+        with key_lock:
+            with self.__lock:
+                current = self.__providers.get(key)
+            if current is not None and current is not provider:
+                # Another thread loaded or refreshed it while we waited
+                metrics.count('registry.hits', key=key)
+                return current
+
+            if current is None:
+                metrics.count('registry.misses', key=key)
+                with metrics.timer('registry.load', key=key):
+                    new_provider = factory()
+            else:
+                self.__last_refresh[key] = time.monotonic()
+                new_provider = refresh(current)
+                if new_provider is None:
+                    metrics.count('registry.hits', key=key)
+                    return current
+                self.logger.info(f"Replacing {key} with a newer dataset")
+                metrics.count('registry.refreshes', key=key)
+
+            # Replaced and evicted providers are only dropped, not closed,
+            # as other threads may still be in the middle of a lookup
+            self._put(key, new_provider)
+            return new_provider
+
+    def _refresh_due(self, key):
+        last = self.__last_refresh.get(key, 0)
+        return time.monotonic() - last >= self.refresh_interval
+
+    def _put(self, key, provider):
+        with self.__lock:
+            self.__providers.pop(key, None)
+            self.__providers[key] = provider
+            self.__last_refresh[key] = time.monotonic()
+            self._evict()
+
+    def _evict(self):
+        # Evicts least recently used providers, but never the most
+        # recently used one. Called with the registry lock held.
+        if self.max_bytes is None:
+            return
+        while (len(self.__providers) > 1 and
+               self._nbytes() > self.max_bytes):
+            old_key, _ = self.__providers.popitem(last=False)
+            self.__last_refresh.pop(old_key, None)
+            self.logger.debug(f"Evicting {old_key}")
+            metrics.count('registry.evictions', key=old_key)
+
+    def evict(self, key, close=True):
+        """
+        Closes and drops the provider registered under key, if any.
+
+        Args:
+            key (hashable): Identifies the dataset.
+            close (bool): Close the provider. Pass False while other
+            threads may still be using it. Defaults to True.
+        """
+        with self.__lock:
+            provider = self.__providers.pop(key, None)
+            self.__last_refresh.pop(key, None)
+        if provider is not None and close:
+            provider.close()
+
+    def close(self):
+        """
+        Closes and drops all loaded providers.
+        """
+        with self.__lock:
+            providers = list(self.__providers.values())
+            self.__providers.clear()
+            self.__last_refresh.clear()
+        for provider in providers:
+            provider.close()
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import namedtuple
+import numpy as np
+from gene_thesaurus.file_lock import data_dir_lock
+from gene_thesaurus.hgnc_parser import iter_hgnc_records
+from gene_thesaurus.index_builder import write_arrays
+
+ReleaseDiff = namedtuple('ReleaseDiff', ['added', 'removed', 'changed'])
+ReleaseDiff.__doc__ = """
+The genes that differ between two HGNC releases, as sorted lists of HGNC
+IDs.
+"""
+
+
+def record_key(record):
+    """
+    Returns the identity of a gene across releases: its HGNC ID, or its
+    symbol for records without one.
+    """
+    return record.get('hgnc_id') or record.get('symbol')
+
+
+def _canonical(record):
+    return json.dumps(record, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False)
+
+
+def _digest(line):
+    return hashlib.blake2b(line.encode('utf8'), digest_size=16).digest()
+
+
+class ReleaseWriter:
+    """
+    Adds the records of one release to a ReleaseStore. Records already
+    stored for an earlier release are not stored again.
+    """
+
+    def __init__(self, store, date):
+        self.__store = store
+        self.__date = date
+        self.__known = store._known_records()
+        self.__new_lines = {}
+        self.__digests = []
+
+    def add(self, record):
+        line = _canonical(record)
+        digest = _digest(line)
+        if digest not in self.__known:
+            self.__new_lines[digest] = line
+        self.__digests.append(digest)
+
+    def consume(self, records):
+        """
+        Adds each record while passing it on, so a release can be stored
+        in the same pass over the records as its indexes are built.
+        """
+        for record in records:
+            self.add(record)
+            yield record
+
+    def commit(self):
+        """
+        Appends the new records and writes the release manifest.
+        """
+        self.__store._write_release(self.__date, self.__digests,
+                                    self.__new_lines)
+
+
+class ReleaseStore:
+    """
+    Versioned, deduplicated storage of HGNC releases in a data directory.
+
+    Each distinct record is stored once, as a line of hgnc_records.jsonl,
+    and each release is a manifest of the offsets of its records, in
+    release order. A monthly release that changes a few hundred genes adds
+    only those records, so old releases can be reproduced without keeping
+    their complete sets.
+    """
+    _RECORDS_FILENAME = 'hgnc_records.jsonl'
+    _DIGESTS_BASE_FILENAME = 'hgnc_records_{name}.npy'
+    _DIGESTS_NAMES = ('digests', 'offsets')
+    _RELEASE_BASE_FILENAME = 'hgnc_release_{date}.npy'
+    _RELEASE_FILENAME_PATTERN = re.compile(
+        r'^hgnc_release_(\d{4}-\d{2}-\d{2})\.npy$')
+
+    def __init__(self, data_dir='/tmp'):
+        """
+        Args:
+            data_dir (str): The directory the store is kept in.
+        """
+        self.__data_dir = data_dir
+        self.logger = logging.getLogger(__class__.__name__)
+
+    def _path(self, filename):
+        return self.__data_dir + "/" + filename
+
+    def _release_path(self, date):
+        return self._path(self._RELEASE_BASE_FILENAME.format(date=date))
+
+    def _digests_paths(self):
+        return {name: self._path(self._DIGESTS_BASE_FILENAME.format(
+                    name=name))
+                for name in self._DIGESTS_NAMES}
+
+    def releases(self) -> list:
+        """
+        Returns:
+            list: The dates of the stored releases, oldest first.
+        """
+        try:
+            filenames = os.listdir(self.__data_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(m.group(1) for m in map(
+            self._RELEASE_FILENAME_PATTERN.match, filenames) if m)
+
+    def __contains__(self, date):
+        return os.path.isfile(self._release_path(date))
+
+    def _known_records(self):
+        # The offset of each stored record, by digest
+        paths = self._digests_paths()
+        if not all(os.path.isfile(p) for p in paths.values()):
+            return {}
+        digests, offsets = (np.load(paths[name])
+                            for name in self._DIGESTS_NAMES)
+        return dict(zip(digests.tolist(), offsets.tolist()))
+
+    def writer(self, date) -> ReleaseWriter:
+        """
+        Returns a ReleaseWriter for the records of a release.
+
+        Args:
+            date (str): The release date ('YYYY-MM-DD').
+        """
+        return ReleaseWriter(self, date)
+
+    def add_release(self, date, records):
+        """
+        Stores the records of a release.
+
+        Args:
+            date (str): The release date ('YYYY-MM-DD').
+            records (iterable): The records, e.g. from iter_hgnc_records.
+        """
+        writer = self.writer(date)
+        for record in records:
+            writer.add(record)
+        writer.commit()
+
+    def _write_release(self, date, digests, new_lines):
+        # One process appends at a time, and records another one added
+        # since this release was read are not added again
+        with data_dir_lock(self.__data_dir, 'hgnc_records'):
+            known = self._known_records()
+            new_lines = {digest: line for digest, line in new_lines.items()
+                         if digest not in known}
+            if new_lines:
+                with open(self._path(self._RECORDS_FILENAME), 'ab') as f:
+                    offset = f.tell()
+                    lines = []
+                    for digest, line in new_lines.items():
+                        data = (line + '\n').encode('utf8')
+                        known[digest] = offset
+                        offset += len(data)
+                        lines.append(data)
+                    f.write(b''.join(lines))
+                write_arrays(
+                    # Void rather than bytes_, which would drop trailing
+                    # zeros
+                    {'digests': np.frombuffer(b''.join(known), dtype='V16'),
+                     'offsets': np.array(list(known.values()),
+                                         dtype=np.int64)},
+                    self._digests_paths())
+            self.logger.info(f"Stored HGNC {date} with {len(new_lines)} new "
+                             f"of {len(digests)} records")
+
+            # Records are only referenced once they are written
+            write_arrays({'offsets': np.array([known[d] for d in digests],
+                                              dtype=np.int64)},
+                         {'offsets': self._release_path(date)})
+
+    def offsets(self, date) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The offset of each record of a release in the
+            records file, in release order. Equal records have equal
+            offsets, across releases too.
+        """
+        return np.load(self._release_path(date))
+
+    def read_records(self, offsets) -> list:
+        """
+        Returns the records at the given offsets.
+        """
+        records = []
+        with open(self._path(self._RECORDS_FILENAME), 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+        return records
+
+    def iter_records(self, date):
+        """
+        Yields the records of a stored release, in release order.
+        """
+        offsets = self.offsets(date).tolist()
+        with open(self._path(self._RECORDS_FILENAME), 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def diff(self, old_date, new_date) -> ReleaseDiff:
+        """
+        Compares two stored releases record by record. Only the records
+        that are not in both are read.
+
+        Args:
+            old_date (str): The earlier release.
+            new_date (str): The later release.
+
+        Returns:
+            ReleaseDiff: The genes added, removed and changed.
+        """
+        old_offsets = self.offsets(old_date)
+        new_offsets = self.offsets(new_date)
+        old_keys = {record_key(r) for r in self.read_records(
+            np.setdiff1d(old_offsets, new_offsets).tolist())}
+        new_keys = {record_key(r) for r in self.read_records(
+            np.setdiff1d(new_offsets, old_offsets).tolist())}
+        return ReleaseDiff(sorted(new_keys - old_keys),
+                           sorted(old_keys - new_keys),
+                           sorted(old_keys & new_keys))
+
+    def remove_release(self, date):
+        """
+        Removes the manifest of a release. Its records stay, as other
+        releases may share them.
+        """
+        if date in self:
+            os.remove(self._release_path(date))
+
+
+def iter_release_records(data_dir, date, path):
+    """
+    Yields the records of an HGNC release, from its complete set if it is
+    still there and from the release store otherwise.
+
+    Args:
+        data_dir (str): The data directory holding the release store.
+        date (str): The release date ('YYYY-MM-DD').
+        path (str): The path to the complete set of the release.
+    """
+    if os.path.isfile(path):
+        return iter_hgnc_records(path)
+    return ReleaseStore(data_dir).iter_records(date)
+
+
+def match_rows(old_offsets, new_offsets):
+    """
+    Matches the records of two releases by their offsets in the store.
+
+    Args:
+        old_offsets (np.ndarray): The offsets of the earlier release.
+        new_offsets (np.ndarray): The offsets of the new release.
+
+    Returns:
+        tuple: The row of each earlier record in the new release, -1 if it
+        was removed or changed, and the rows of the new release that are
+        not matched, i.e. the added and changed records.
+    """
+    old_offsets = np.asarray(old_offsets, dtype=np.int64)
+    new_offsets = np.asarray(new_offsets, dtype=np.int64)
+    row_map = np.full(len(old_offsets), -1, dtype=np.int64)
+    if len(new_offsets):
+        order = np.argsort(new_offsets, kind='stable')
+        positions = np.searchsorted(new_offsets[order], old_offsets)
+        positions[positions == len(order)] = 0
+        found = new_offsets[order][positions] == old_offsets
+        row_map[found] = order[positions[found]]
+
+    # A record listed twice in a release is matched once per listing
+    matched = np.flatnonzero(row_map >= 0)
+    _, first = np.unique(row_map[matched], return_index=True)
+    duplicates = np.ones(len(matched), dtype=bool)
+    duplicates[first] = False
+    row_map[matched[duplicates]] = -1
+
+    unmatched = np.ones(len(new_offsets), dtype=bool)
+    unmatched[row_map[row_map >= 0]] = False
+    return row_map, np.flatnonzero(unmatched)
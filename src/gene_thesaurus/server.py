@@ -0,0 +1,323 @@
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gene_thesaurus import metrics
+from gene_thesaurus.gene_thesaurus import GeneThesaurus
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8642
+
+
+class _ResultCache:
+    """
+    Bounded LRU of recent lookup results, keyed by (HGNC release, source,
+    target, gene), so that a newer release is never answered from results
+    of an older one. Misses are cached too, as None.
+    """
+
+    def __init__(self, max_entries):
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get_many(self, kind, genes):
+        found = {}
+        with self.__lock:
+            for gene in genes:
+                key = (kind, gene)
+                if key in self.__entries:
+                    self.__entries.move_to_end(key)
+                    found[gene] = self.__entries[key]
+        return found
+
+    def put_many(self, kind, results):
+        if not self.__max_entries:
+            return
+        with self.__lock:
+            for gene, value in results.items():
+                self.__entries[(kind, gene)] = value
+                self.__entries.move_to_end((kind, gene))
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+
+class _Batcher:
+    """
+    Merges lookups that arrive within batch_window seconds of each other
+    into one lookup per (source, target) pair, on a single thread that
+    owns the GeneThesaurus.
+    """
+
+    def __init__(self, thesaurus, cache, batch_window=0.002,
+                 max_batch_size=100000):
+        self.__thesaurus = thesaurus
+        self.__cache = cache
+        self.__batch_window = batch_window
+        self.__max_batch_size = max_batch_size
+        self.__queue = queue.Queue()
+        self.__n_batches = 0
+        self.__thread = threading.Thread(target=self._run, daemon=True)
+        self.__thread.start()
+
+    @property
+    def n_batches(self):
+        """Number of lookup batches run so far."""
+        return self.__n_batches
+
+    def submit(self, source, target, genes) -> list:
+        """
+        Queues a lookup and waits for its results, aligned with genes.
+        A target of None looks up current gene symbols, and 'candidates'
+        or 'normalized_candidates' every gene a symbol may refer to.
+        """
+        future = Future()
+        self.__queue.put((source, target, genes, future))
+        return future.result()
+
+    def close(self):
+        self.__queue.put(None)
+        self.__thread.join()
+
+    def _run(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            batch = [item]
+            size = len(item[2])
+            deadline = time.monotonic() + self.__batch_window
+            stop = False
+            while size < self.__max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.__queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                size += len(item[2])
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch):
+        groups = {}
+        for source, target, genes, future in batch:
+            groups.setdefault((source, target), []).append((genes, future))
+
+        for kind, pending in groups.items():
+            try:
+                results = self._lookup(kind, pending)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            for genes, future in pending:
+                future.set_result([results[gene] for gene in genes])
+
+    def _lookup(self, kind, pending):
+        genes = {gene for request_genes, _ in pending
+                 for gene in request_genes}
+        # Checked per batch, as the thesaurus moves on to newer releases
+        cache_kind = (self.__thesaurus.hgnc_release, *kind)
+        results = self.__cache.get_many(cache_kind, genes)
+        missing = [gene for gene in genes if gene not in results]
+        metrics.count('server.cache_hits', len(results))
+        metrics.count('server.cache_misses', len(missing))
+        if missing:
+            source, target = kind
+            if target is None:
+                pairs = self.__thesaurus.update_iter(missing)
+            elif target in ('candidates', 'normalized_candidates'):
+                pairs = zip(missing, self.__thesaurus.lookup_candidates(
+                    missing, normalize=target == 'normalized_candidates'))
+            else:
+                pairs = self.__thesaurus.translate_iter(missing, source,
+                                                        target)
+            looked_up = dict(pairs)
+            self.__cache.put_many(cache_kind, looked_up)
+            results.update(looked_up)
+        self.__n_batches += 1
+        return results
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/info':
+            self._send(200, {'hgnc_release': self.server.hgnc_release})
+        elif self.path == '/releases':
+            self._send(200, {'results': self.server.releases()})
+        else:
+            self._send(404, {'error': f"Error: unknown path {self.path}."})
+
+    def do_POST(self):
+        if self.path not in ('/lookup', '/complete', '/diff'):
+            self._send(404, {'error': f"Error: unknown path {self.path}."})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            if self.path == '/complete':
+                results = self.server.complete(request.get('prefix', ''),
+                                               request.get('limit', 10))
+            elif self.path == '/diff':
+                results = self.server.diff_releases(
+                    request.get('old_release'), request.get('new_release'))
+            else:
+                results = self.server.lookup(request.get('genes', []),
+                                             request.get('source', 'symbol'),
+                                             request.get('target'))
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.server.logger.exception("Lookup failed")
+            self._send(500, {'error': f"Error: lookup failed: {e}"})
+            return
+        self._send(200, {'results': results})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(format % args)
+
+
+class TranslationServer(ThreadingHTTPServer):
+    """
+    Local HTTP server that hosts one copy of the loaded data for several
+    client processes, see GeneThesaurusClient.
+
+    Concurrent requests are merged into batched lookups and recent results
+    are kept in a bounded LRU cache.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self,
+                 host=DEFAULT_HOST,
+                 port=DEFAULT_PORT,
+                 data_dir='/tmp',
+                 release=None,
+                 cache_size=100000,
+                 batch_window=0.002,
+                 refresh_interval=60):
+        """
+        Args:
+            host (str): The address to listen on. Defaults to '127.0.0.1'.
+            port (int): The port to listen on, 0 for any free port.
+            Defaults to 8642.
+            data_dir (str): Where downloaded data and indexes are cached.
+            Defaults to '/tmp'.
+            release (str): HGNC release date ('YYYY-MM-DD') to use instead
+            of the latest one. Defaults to None.
+            cache_size (int): Maximum number of cached lookup results.
+            Defaults to 100000.
+            batch_window (float): How many seconds to wait for concurrent
+            requests to batch together. Defaults to 0.002.
+            refresh_interval (float): Minimum number of seconds between
+            checks for a newer cached HGNC release. Defaults to 60.
+        """
+        self.logger = logging.getLogger(__class__.__name__)
+        self.__thesaurus = GeneThesaurus(data_dir=data_dir, release=release,
+                                         refresh_interval=refresh_interval)
+        self.__cache = _ResultCache(cache_size)
+        self.__batcher = _Batcher(self.__thesaurus, self.__cache,
+                                  batch_window=batch_window)
+        super().__init__((host, port), _RequestHandler)
+
+    @property
+    def url(self):
+        """The base URL clients should connect to."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def n_batches(self):
+        """Number of lookup batches run so far."""
+        return self.__batcher.n_batches
+
+    @property
+    def hgnc_release(self):
+        """The date of the HGNC release used for lookups."""
+        return self.__thesaurus.hgnc_release
+
+    def warmup(self, datasets=('hgnc', 'ncbi')):
+        """
+        Loads the given datasets before serving the first request.
+        """
+        self.__thesaurus.warmup(datasets)
+
+    def lookup(self, genes, source='symbol', target=None) -> list:
+        """
+        Looks up genes through the batcher, keeping the input order.
+        A target of None looks up current gene symbols, and 'candidates'
+        or 'normalized_candidates' every gene a symbol may refer to.
+
+        Returns:
+            list: The result for each gene, or None where there is none.
+        """
+        if not isinstance(genes, list):
+            raise ValueError("Error: genes must be a list.")
+        if target in (None, 'candidates', 'normalized_candidates'):
+            if source != 'symbol':
+                raise ValueError(
+                    "Error: updating genes requires source 'symbol'.")
+        else:
+            self.__thesaurus.datasets_for(source, target)
+        if source == 'entrez_id':
+            genes = [int(gene) for gene in genes]
+        return self.__batcher.submit(source, target, genes)
+
+    def complete(self, prefix, limit=10) -> list:
+        """
+        Autocompletes a gene symbol, see GeneThesaurus.complete. Unlike
+        lookups, completions are neither batched nor cached.
+        """
+        if not isinstance(prefix, str) or not isinstance(limit, int):
+            raise ValueError("Error: prefix must be a string and limit an "
+                             "integer.")
+        return self.__thesaurus.complete(prefix, limit)
+
+    def releases(self) -> list:
+        """
+        Same as GeneThesaurus.releases, for the data directory of the
+        server.
+        """
+        return self.__thesaurus.releases()
+
+    def diff_releases(self, old_release, new_release) -> dict:
+        """
+        Same as GeneThesaurus.diff_releases, as a dict of the ReleaseDiff
+        fields.
+        """
+        if not isinstance(old_release, str) or \
+                not isinstance(new_release, str):
+            raise ValueError("Error: old_release and new_release must be "
+                             "strings.")
+        return self.__thesaurus.diff_releases(old_release,
+                                              new_release)._asdict()
+
+    def server_close(self):
+        super().server_close()
+        self.__batcher.close()
+        self.__thesaurus.close()
@@ -0,0 +1,359 @@
+from collections import namedtuple
+import unicodedata
+import numpy as np
+from gene_thesaurus.hgnc_parser import SYMBOL_RANKS
+
+SymbolCandidate = namedtuple('SymbolCandidate',
+                             ['symbol', 'ensembl_id', 'entrez_id', 'match'])
+SymbolCandidate.__doc__ = """
+A gene a symbol may refer to. match is how the symbol relates to the gene:
+'symbol' (its current symbol), 'prev_symbol' or 'alias_symbol'.
+"""
+
+_MATCHES = tuple(sorted(SYMBOL_RANKS, key=SYMBOL_RANKS.get))
+
+# The arrays a multimap is stored as: the key side, then the gene columns
+MULTIMAP_KEY_NAMES = ('keys', 'offsets', 'gene_ids', 'ranks')
+MULTIMAP_NAMES = MULTIMAP_KEY_NAMES + ('symbol', 'ensembl_id', 'entrez_id')
+
+# Stray characters around symbols in hand-typed or exported lists
+_STRAY_CHARACTERS = ' \t\r\n"\'.,;:*'
+
+
+def normalize_symbol(symbol):
+    """
+    Normalizes a gene symbol for tolerant matching: Unicode compatibility
+    forms are folded, surrounding whitespace, quotes and punctuation are
+    stripped, and the symbol is uppercased.
+
+    Args:
+        symbol (str): The symbol to normalize.
+
+    Returns:
+        str: The normalized symbol, or None if symbol is not a string.
+    """
+    if not isinstance(symbol, str):
+        return None
+    symbol = unicodedata.normalize('NFKC', symbol)
+    return symbol.strip(_STRAY_CHARACTERS).upper()
+
+
+def _encode(values):
+    # Fixed-width UTF-8 byte strings, '' for missing values. Encoding in
+    # Python is several times faster than np.char.encode.
+    return np.array([v.encode('utf8') if isinstance(v, str) else b''
+                     for v in values], dtype=np.bytes_)
+
+
+class SymbolMultimapBuilder:
+    """
+    Collects every current, previous and alias symbol of HGNC records,
+    interning each gene as an integer ID.
+    """
+
+    def __init__(self, normalize=None):
+        """
+        Args:
+            normalize (callable): Applied to each symbol to get its key,
+            e.g. normalize_symbol. Defaults to None (exact symbols).
+        """
+        self.__normalize = normalize
+        self.__symbols = []
+        self.__ensembl_ids = []
+        self.__entrez_ids = []
+        self.__keys = []
+        self.__gene_ids = []
+        self.__ranks = []
+
+    def add(self, record):
+        gene_id = len(self.__symbols)
+        self.__symbols.append(record.get('symbol'))
+        self.__ensembl_ids.append(record.get('ensembl_gene_id'))
+        self.__entrez_ids.append(int(record.get('entrez_id') or 0))
+        for field, rank in SYMBOL_RANKS.items():
+            synonyms = record.get(field) or []
+            if isinstance(synonyms, str):
+                synonyms = [synonyms]
+            if self.__normalize is not None:
+                synonyms = [self.__normalize(s) for s in synonyms]
+            self.__keys.extend(synonyms)
+            self.__gene_ids.extend([gene_id] * len(synonyms))
+            self.__ranks.extend([rank] * len(synonyms))
+
+    def consume(self, records):
+        """
+        Adds each record while passing it on, so the multimap can be built
+        in the same pass over the records as other indexes.
+        """
+        for record in records:
+            self.add(record)
+            yield record
+
+    def build(self) -> dict:
+        """
+        Returns:
+            dict: The arrays by name, see SymbolMultimap.
+        """
+        return _build_arrays(
+            _encode(self.__keys),
+            np.array(self.__gene_ids, dtype=np.int32),
+            np.array(self.__ranks, dtype=np.uint8),
+            {'symbol': _encode(self.__symbols),
+             'ensembl_id': _encode(self.__ensembl_ids),
+             'entrez_id': np.array(self.__entrez_ids, dtype=np.int64)})
+
+    def update(self, arrays, row_map, rows) -> dict:
+        """
+        Builds the multimap of a release from the multimap of an earlier
+        one, where the records added to this builder are the genes that
+        were added or changed since. Unchanged genes are carried over
+        without being looked at again.
+
+        Args:
+            arrays (dict): The arrays of the earlier multimap, including
+            the gene columns.
+            row_map (np.ndarray): The row of each earlier gene in the new
+            release, or -1 if it was removed or changed.
+            rows (list): The row of each added record in the new release.
+
+        Returns:
+            dict: The arrays by name, see SymbolMultimap.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        row_map = np.asarray(row_map, dtype=np.int64)
+        kept = np.flatnonzero(row_map >= 0)
+        n_rows = len(kept) + len(rows)
+
+        # Expand the earlier multimap to (key, gene, rank) triples and
+        # keep those of the unchanged genes, at their new rows
+        keys = np.repeat(arrays['keys'], np.diff(arrays['offsets']))
+        gene_ids = row_map[arrays['gene_ids']]
+        keep = gene_ids >= 0
+        added_gene_ids = rows[np.array(self.__gene_ids, dtype=np.int64)]
+
+        columns = {}
+        added_columns = {
+            'symbol': _encode(self.__symbols),
+            'ensembl_id': _encode(self.__ensembl_ids),
+            'entrez_id': np.array(self.__entrez_ids, dtype=np.int64)}
+        for name, added in added_columns.items():
+            column = np.zeros(n_rows, dtype=np.result_type(arrays[name],
+                                                           added))
+            column[row_map[kept]] = arrays[name][kept]
+            column[rows] = added
+            columns[name] = column
+
+        return _build_arrays(
+            np.concatenate([keys[keep], _encode(self.__keys)]),
+            np.concatenate([gene_ids[keep],
+                            added_gene_ids]).astype(np.int32),
+            np.concatenate([arrays['ranks'][keep],
+                            np.array(self.__ranks, dtype=np.uint8)]),
+            columns)
+
+
+def _build_arrays(keys, gene_ids, ranks, columns):
+    # A symbol listed twice for one gene keeps its best rank
+    order = np.lexsort((ranks, gene_ids, keys))
+    keys, gene_ids, ranks = keys[order], gene_ids[order], ranks[order]
+    first = np.r_[True, (keys[1:] != keys[:-1]) |
+                  (gene_ids[1:] != gene_ids[:-1])][:len(keys)]
+    first &= keys != b''
+    keys, gene_ids, ranks = keys[first], gene_ids[first], ranks[first]
+
+    # Rank the genes of each symbol, in record order within a rank
+    order = np.lexsort((gene_ids, ranks, keys))
+    keys, gene_ids, ranks = keys[order], gene_ids[order], ranks[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]
+                            [:len(keys)])
+
+    return {
+        'keys': keys[starts],
+        'offsets': np.r_[starts, len(keys)].astype(np.uint32),
+        'gene_ids': gene_ids,
+        'ranks': ranks,
+        **columns,
+    }
+
+
+class SymbolMultimap:
+    """
+    Maps each current, previous and alias symbol to every gene that uses
+    it, without letting one gene win.
+
+    Symbols are stored as a sorted array of keys. Like a CSR matrix, the
+    candidates of key i are entries offsets[i] to offsets[i + 1] of the
+    gene_ids and ranks arrays, sorted by rank. Gene IDs are rows of the
+    symbol, ensembl_id and entrez_id columns.
+    """
+
+    def __init__(self, arrays):
+        """
+        Args:
+            arrays (dict): The arrays by name, as built by
+            SymbolMultimapBuilder.build().
+        """
+        self.__arrays = arrays
+        self.__last_gene_ids = None
+        self.__sorted_columns = {}
+
+    @classmethod
+    def load(cls, paths):
+        """
+        Memory-maps a multimap written with write_arrays. Multimaps built
+        from the same records can share their gene columns.
+
+        Args:
+            paths (dict): The .npy path for each of MULTIMAP_NAMES.
+        """
+        return cls({name: np.load(path, mmap_mode='r')
+                    for name, path in paths.items()})
+
+    @property
+    def nbytes(self):
+        nbytes = sum(a.nbytes for a in self.__arrays.values())
+        if self.__last_gene_ids is not None:
+            nbytes += self.__last_gene_ids.nbytes
+        for values, rows in self.__sorted_columns.values():
+            nbytes += values.nbytes + rows.nbytes
+        return nbytes
+
+    def __len__(self):
+        return len(self.__arrays['keys'])
+
+    def _find(self, genes):
+        keys = self.__arrays['keys']
+        values = _encode(genes)
+        positions = np.full(len(values), -1, dtype=np.int64)
+        if len(keys) and len(values):
+            found_positions = np.searchsorted(keys, values)
+            found_positions[found_positions == len(keys)] = 0
+            found = keys[found_positions] == values
+            positions[found] = found_positions[found]
+        return positions
+
+    def _candidate(self, gene_id, rank):
+        symbol = self.__arrays['symbol'][gene_id].decode('utf8')
+        ensembl_id = self.__arrays['ensembl_id'][gene_id].decode('utf8')
+        entrez_id = int(self.__arrays['entrez_id'][gene_id])
+        return SymbolCandidate(symbol or None, ensembl_id or None,
+                               entrez_id or None, _MATCHES[rank])
+
+    def _candidates_at(self, position):
+        start, end = self.__arrays['offsets'][position:position + 2]
+        return [self._candidate(gene_id, rank) for gene_id, rank
+                in zip(self.__arrays['gene_ids'][start:end].tolist(),
+                       self.__arrays['ranks'][start:end].tolist())]
+
+    def lookup(self, gene_list) -> list:
+        """
+        Returns every gene each symbol may refer to, keeping the input
+        order.
+
+        Args:
+            gene_list (list): The symbols to look up.
+
+        Returns:
+            list: For each symbol, a list of SymbolCandidate ranked from
+            current symbols over previous symbols to aliases. Unknown
+            symbols give an empty list.
+        """
+        return [self._candidates_at(position) if position >= 0 else []
+                for position in self._find(list(gene_list)).tolist()]
+
+    def _last_genes(self):
+        # The last record using each key, which wins in the symbol indexes
+        if self.__last_gene_ids is None:
+            last = np.zeros(0, dtype=np.int64)
+            if len(self):
+                last = np.maximum.reduceat(
+                    self.__arrays['gene_ids'],
+                    self.__arrays['offsets'][:-1].astype(np.int64))
+            self.__last_gene_ids = last
+        return self.__last_gene_ids
+
+    def _sorted_column(self, column):
+        # The distinct values of a gene column in sorted order, with the
+        # last gene holding each value
+        if column not in self.__sorted_columns:
+            values = self.__arrays[column]
+            order = np.argsort(values, kind='stable')
+            values = values[order]
+            last = np.r_[values[1:] != values[:-1], True][:len(values)]
+            last &= values != b''
+            self.__sorted_columns[column] = (values[last], order[last])
+        return self.__sorted_columns[column]
+
+    def _column_values(self, column, gene_ids, found):
+        # Decoded values of the found genes, None where there is none
+        values = np.full(len(found), None, dtype=object)
+        values[found] = [
+            value.decode('utf8') or None for value
+            in self.__arrays[column][gene_ids[found]].tolist()]
+        return values.tolist()
+
+    def resolve(self, gene_list, column) -> list:
+        """
+        Returns one value of a gene column per symbol, from the last
+        record that uses the symbol, like the HGNC symbol indexes.
+
+        Args:
+            gene_list (list): The symbols to look up.
+            column (str): 'symbol' or 'ensembl_id'.
+
+        Returns:
+            list: The value for each symbol, or None.
+        """
+        positions = self._find(list(gene_list))
+        found = positions >= 0
+        gene_ids = np.zeros(len(positions), dtype=np.int64)
+        gene_ids[found] = self._last_genes()[positions[found]]
+        return self._column_values(column, gene_ids, found)
+
+    def resolve_by(self, values, column, target) -> list:
+        """
+        Returns the target value of the gene with each value in a gene
+        column, the last record with it if several are, like the HGNC
+        ensembl_to_symbol index.
+
+        Args:
+            values (list): The values to look up, e.g. Ensembl IDs.
+            column (str): The column they are from, e.g. 'ensembl_id'.
+            target (str): The column to return, e.g. 'symbol'.
+
+        Returns:
+            list: The target value for each value, or None.
+        """
+        keys, rows = self._sorted_column(column)
+        encoded = _encode(values)
+        found = np.zeros(len(encoded), dtype=bool)
+        gene_ids = np.zeros(len(encoded), dtype=np.int64)
+        if len(keys) and len(encoded):
+            positions = np.searchsorted(keys, encoded)
+            positions[positions == len(keys)] = 0
+            found = keys[positions] == encoded
+            gene_ids[found] = rows[positions[found]]
+        return self._column_values(target, gene_ids, found)
+
+    def complete(self, prefix, limit=10) -> list:
+        """
+        Returns the keys that start with a prefix, in sorted order, with
+        the genes they may refer to.
+
+        Args:
+            prefix (str): The start of the keys to find.
+            limit (int): The maximum number of keys. Defaults to 10.
+
+        Returns:
+            list: (key, candidates) pairs, where candidates is a list of
+            SymbolCandidate ranked as in lookup.
+        """
+        keys = self.__arrays['keys']
+        start_key = _encode([prefix])[0]
+        # No UTF-8 byte is 0xff, so this sorts after every key with the
+        # prefix
+        start, end = np.searchsorted(keys, [start_key, start_key + b'\xff'])
+        end = min(end, start + limit)
+        return [(keys[position].decode('utf8'),
+                 self._candidates_at(position))
+                for position in range(start, end)]
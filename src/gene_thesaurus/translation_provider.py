@@ -25,9 +25,46 @@ class TranslationProvider(ABC):
         # Data
         self.__data_dir = data_dir
 
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate number of bytes held by this provider. Used by the
+        provider registry to enforce its memory cap.
+        """
+        return 0
+
+    def load(self):
+        """
+        Prepares this provider for lookups, e.g. by opening its indexes.
+        Providers that have nothing to prepare return at once.
+
+        Returns:
+            TranslationProvider: This provider.
+        """
+        return self
+
+    def close(self):
+        """
+        Releases any resources held by this provider.
+        """
+        pass
+
     @abstractmethod
     def translate_list(self,
                        gene_list: list,
                        source: _IDENTIFIER_TYPES,
                        target: _IDENTIFIER_TYPES) -> dict:
         pass
+
+    @abstractmethod
+    def lookup(self,
+               gene_list: list,
+               source: _IDENTIFIER_TYPES,
+               target: _IDENTIFIER_TYPES) -> list:
+        """
+        Translates a list of genes, keeping the input order.
+
+        Returns:
+            list: The translation of each gene, or None where there is none.
+        """
+        pass
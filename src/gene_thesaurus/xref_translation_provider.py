@@ -0,0 +1,249 @@
+import logging
+import os
+import numpy as np
+from gene_thesaurus import metrics
+from gene_thesaurus.file_lock import data_dir_lock
+from gene_thesaurus.hgnc_parser import SYMBOL_RANKS
+from gene_thesaurus.index_builder import write_arrays
+from gene_thesaurus.ncbi_translation_provider import load_gene_info
+from gene_thesaurus.release_store import iter_release_records
+from gene_thesaurus.translation_provider import TranslationProvider
+
+
+def _encode(values):
+    # Fixed-width UTF-8 byte strings, '' for missing values
+    values = [v if isinstance(v, str) else '' for v in values]
+    return np.char.encode(np.array(values, dtype=str), 'utf8')
+
+
+def _secondary_index(keys, rows, ranks, n_hgnc_rows):
+    # Sorts the keys for binary search. A key held by several rows points
+    # at the one with the lowest rank. Among those, like in the HGNC
+    # indexes, the last HGNC record wins, and genes only in NCBI come last.
+    keep = keys != (0 if keys.dtype.kind == 'i' else b'')
+    keys, rows, ranks = keys[keep], rows[keep], ranks[keep]
+    ties = np.where(rows < n_hgnc_rows, n_hgnc_rows - rows, rows)
+    order = np.lexsort((ties, ranks, keys))
+    keys, rows = keys[order], rows[order]
+    first = np.r_[True, keys[1:] != keys[:-1]][:len(keys)]
+    return keys[first], rows[first].astype(np.int32)
+
+
+def build_cross_references(hgnc_records, gene_info):
+    """
+    Joins HGNC records and NCBI genes on their Entrez ID into a table with
+    one row per gene and one column per identifier type, plus a sorted
+    secondary index for each type.
+
+    HGNC values take precedence. NCBI fills in the identifiers HGNC lacks
+    and adds the genes HGNC does not have.
+
+    Args:
+        hgnc_records (iterable): HGNC records, e.g. from
+        iter_hgnc_records.
+        gene_info (tuple): Aligned GeneIDs, symbols and Ensembl IDs, as
+        returned by read_gene_info or load_gene_info.
+
+    Returns:
+        dict: Arrays by name: the 'symbol', 'ensembl_id' and 'entrez_id'
+        columns (0 for no Entrez ID), and '{type}_keys' and '{type}_rows'
+        for each identifier type. Symbol keys include previous symbols and
+        aliases.
+    """
+    symbols, ensembl_ids, entrez_ids = [], [], []
+    symbol_keys, symbol_rows, symbol_ranks = [], [], []
+
+    for item in hgnc_records:
+        row = len(symbols)
+        symbols.append(item.get('symbol'))
+        ensembl_ids.append(item.get('ensembl_gene_id'))
+        entrez_ids.append(int(item.get('entrez_id') or 0))
+        for field, rank in SYMBOL_RANKS.items():
+            synonyms = item.get(field) or []
+            if isinstance(synonyms, str):
+                synonyms = [synonyms]
+            symbol_keys.extend(synonyms)
+            symbol_rows.extend([row] * len(synonyms))
+            symbol_ranks.extend([rank] * len(synonyms))
+
+    n_hgnc_rows = len(symbols)
+    rows_by_entrez = {entrez_id: row for row, entrez_id
+                      in enumerate(entrez_ids) if entrez_id}
+    for gene_id, symbol, ensembl_id in zip(*gene_info):
+        gene_id = int(gene_id)
+        row = rows_by_entrez.get(gene_id)
+        if row is None:
+            row = len(symbols)
+            symbols.append(symbol)
+            ensembl_ids.append(ensembl_id)
+            entrez_ids.append(gene_id)
+            symbol_keys.append(symbol)
+            symbol_rows.append(row)
+            symbol_ranks.append(SYMBOL_RANKS['symbol'])
+            continue
+        if not ensembl_ids[row]:
+            ensembl_ids[row] = ensembl_id
+        if not symbols[row]:
+            symbols[row] = symbol
+
+    table = {
+        'symbol': _encode(symbols),
+        'ensembl_id': _encode(ensembl_ids),
+        'entrez_id': np.array(entrez_ids, dtype=np.int64),
+    }
+    n_rows = len(symbols)
+    table['symbol_keys'], table['symbol_rows'] = _secondary_index(
+        _encode(symbol_keys), np.array(symbol_rows, dtype=np.int64),
+        np.array(symbol_ranks, dtype=np.int8), n_hgnc_rows)
+    for column in ('ensembl_id', 'entrez_id'):
+        table[f'{column}_keys'], table[f'{column}_rows'] = _secondary_index(
+            table[column], np.arange(n_rows), np.zeros(n_rows, np.int8),
+            n_hgnc_rows)
+    return table
+
+
+class XrefTranslationProvider(TranslationProvider):
+    """
+    Cross-reference Translation Provider for translating between any two
+    of gene symbols, Ensembl IDs and Entrez IDs, from one table joining
+    HGNC and NCBI data.
+    """
+    _XREF_BASE_FILENAME = 'xref_{name}_{date}_{stamp}.npy'
+    _XREF_NAMES = ('symbol', 'ensembl_id', 'entrez_id',
+                   'symbol_keys', 'symbol_rows',
+                   'ensembl_id_keys', 'ensembl_id_rows',
+                   'entrez_id_keys', 'entrez_id_rows')
+
+    def __init__(self,
+                 data_dir,
+                 hgnc_path,
+                 hgnc_date,
+                 ncbi_path,
+                 force=False):
+        """
+        Args:
+            data_dir (str): Where the table is cached.
+            hgnc_path (str): The HGNC complete set to build from. Once it
+            is pruned, the release is read from the release store.
+            hgnc_date (str): The date of that HGNC release.
+            ncbi_path (str): The NCBI gene_info file to build from.
+            force (bool): Rebuild the table even if it exists.
+            Defaults to False.
+        """
+        self.__data_dir = data_dir
+        self.__hgnc_path = hgnc_path
+        self.__hgnc_date = hgnc_date
+        self.__ncbi_path = ncbi_path
+        self.__ncbi_stamp = int(os.path.getmtime(ncbi_path))
+        self.__table = None
+
+        super().__init__(self.__data_dir)
+        self.logger = logging.getLogger(__class__.__name__)
+        self.build_table(force=force)
+        self.__table = {name: np.load(path, mmap_mode='r')
+                        for name, path in self._table_paths().items()}
+
+    def _table_paths(self):
+        # The table is tied to both inputs, so a new HGNC release or NCBI
+        # download gets a new table
+        return {name: self.__data_dir + "/" +
+                self._XREF_BASE_FILENAME.format(name=name,
+                                                date=self.__hgnc_date,
+                                                stamp=self.__ncbi_stamp)
+                for name in self._XREF_NAMES}
+
+    def build_table(self, force=False):
+        """
+        Builds the cross-reference table and its indexes, unless they
+        exist already.
+
+        Args:
+            force (bool): Rebuild even if the table exists.
+            Defaults to False.
+        """
+        paths = self._table_paths()
+        if not force and all(os.path.isfile(p) for p in paths.values()):
+            return
+        with data_dir_lock(self.__data_dir, 'xref_build'):
+            # Another process may have built it while this one waited
+            if force or not all(os.path.isfile(p) for p in paths.values()):
+                self._build_table(paths)
+
+    def _build_table(self, paths):
+        self.logger.info(
+            f"Building cross-reference table for {self.__hgnc_date}")
+        release = self.__hgnc_date
+        with metrics.timer('xref.build_table', release=release):
+            gene_info = load_gene_info(self.__data_dir, self.__ncbi_path)
+            metrics.count('ncbi.records', len(gene_info[0]))
+            table = build_cross_references(
+                metrics.timed_iter('hgnc.parse',
+                                   iter_release_records(self.__data_dir,
+                                                        release,
+                                                        self.__hgnc_path),
+                                   release=release),
+                gene_info)
+            write_arrays(table, paths)
+
+    def is_current(self, ncbi_path) -> bool:
+        """
+        Returns whether the table was built from the NCBI file now at
+        ncbi_path, rather than an earlier download of it.
+        """
+        return int(os.path.getmtime(ncbi_path)) == self.__ncbi_stamp
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.__table.values())
+
+    def close(self):
+        self.__table = None
+
+    def _find_rows(self, genes, source):
+        # Binary search of each gene in the secondary index of the source
+        keys = self.__table[f'{source}_keys']
+        rows = np.full(len(genes), -1, dtype=np.int64)
+        if source == 'entrez_id':
+            values = np.asarray([int(gene) for gene in genes],
+                                dtype=np.int64)
+        else:
+            values = _encode(genes)
+        if len(keys) and len(values):
+            positions = np.searchsorted(keys, values)
+            positions[positions == len(keys)] = 0
+            found = keys[positions] == values
+            rows[found] = self.__table[f'{source}_rows'][positions[found]]
+        return rows
+
+    def lookup(self,
+               gene_list: list,
+               source: TranslationProvider._IDENTIFIER_TYPES,
+               target: TranslationProvider._IDENTIFIER_TYPES) -> list:
+        rows = self._find_rows(list(gene_list), source)
+        values = np.full(len(rows), None, dtype=object)
+        found = rows >= 0
+        column = self.__table[target][rows[found]]
+        if target == 'entrez_id':
+            found_values = column.astype(object)
+            missing = 0
+        else:
+            found_values = np.char.decode(column, 'utf8').astype(object)
+            missing = ''
+        # A row without a value means the gene has no such identifier
+        values[found] = np.where(found_values == missing, None, found_values)
+        return values.tolist()
+
+    def translate_list(self,
+                       gene_list: list,
+                       source: TranslationProvider._IDENTIFIER_TYPES,
+                       target: TranslationProvider._IDENTIFIER_TYPES) -> dict:
+        if source == 'entrez_id':
+            # Entrez IDs keep their established format: int keys, and ''
+            # for genes that cannot be translated
+            gene_list = [int(gene) for gene in gene_list]
+            return {gene: value or '' for gene, value
+                    in zip(gene_list, self.lookup(gene_list, source, target))}
+        # Genes that are missing or map to themselves are left out
+        return {gene: value for gene, value
+                in zip(gene_list, self.lookup(gene_list, source, target))
+                if value is not None and value != gene}
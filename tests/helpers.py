@@ -0,0 +1,42 @@
+import gzip
+import json
+import os
+
+
+GENE_INFO_HEADER = ('#tax_id\tGeneID\tSymbol\tLocusTag\tSynonyms\tdbXrefs\t'
+                    'chromosome\tmap_location\tdescription\n')
+
+# A handful of real genes, enough to exercise every translation offline
+HGNC_DOCS = [
+    {'symbol': 'TNF', 'alias_symbol': ['TNFSF2', 'TNFA'],
+     'ensembl_gene_id': 'ENSG00000232810', 'entrez_id': '7124'},
+    {'symbol': 'EGFR', 'prev_symbol': ['ERBB'], 'alias_symbol': ['ERBB1'],
+     'ensembl_gene_id': 'ENSG00000146648', 'entrez_id': '1956'},
+    {'symbol': 'ZSCAN5C', 'prev_symbol': ['ZSCAN5CP'],
+     'ensembl_gene_id': 'ENSG00000204532', 'entrez_id': '649137'},
+    {'symbol': 'ETV6', 'alias_symbol': ['TEL'],
+     'ensembl_gene_id': 'ENSG00000139083', 'entrez_id': '2120'},
+]
+
+GENE_INFO_ROWS = [
+    (81399, 'OR4F16', 'MIM:612367|HGNC:HGNC:15079|Ensembl:ENSG00000284662'),
+    (102465909, 'MIR6859-2', 'HGNC:HGNC:50039|Ensembl:ENSG00000273874'),
+    (100132287, 'LOC100132287', '-'),
+]
+
+
+def write_hgnc(data_dir, date, docs=HGNC_DOCS):
+    path = os.path.join(data_dir, f"hgnc_complete_set_{date}.json")
+    with open(path, 'w') as f:
+        json.dump({'response': {'docs': docs}}, f)
+    return path
+
+
+def write_gene_info(data_dir, rows=GENE_INFO_ROWS):
+    path = os.path.join(data_dir, 'Homo_sapiens.gene_info.gz')
+    with gzip.open(path, 'wt') as f:
+        f.write(GENE_INFO_HEADER)
+        for gene_id, symbol, db_xrefs in rows:
+            f.write(f'9606\t{gene_id}\t{symbol}\t-\t-\t{db_xrefs}\t'
+                    f'1\t1p36.33\tsynthetic gene\n')
+    return path
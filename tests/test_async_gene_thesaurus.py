@@ -0,0 +1,161 @@
+from gene_thesaurus import AsyncGeneThesaurus
+from gene_thesaurus.xref_translation_provider import XrefTranslationProvider
+import asyncio
+import numpy as np
+import tempfile
+import threading
+import time
+from benchmarks import synthetic
+from freezegun import freeze_time
+from tests.helpers import write_gene_info, write_hgnc
+
+
+def test_translate_genes():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+
+    async def main():
+        async with AsyncGeneThesaurus(data_dir=data_dir.name,
+                                      release='2023-01-31') as agt:
+            symbols = await agt.update_gene_symbols(['TNFSF2', 'ETV6'])
+            ensembl_ids = await agt.translate_genes(['ERBB1', 'NOTAREALGENE'])
+            return symbols, ensembl_ids
+
+    symbols, ensembl_ids = asyncio.run(main())
+    assert symbols == {'TNFSF2': 'TNF'}
+    assert ensembl_ids == {'ERBB1': 'ENSG00000146648'}
+
+
+def test_concurrent_requests_share_one_load():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    agt = AsyncGeneThesaurus(data_dir=data_dir.name, release='2023-01-31')
+    gt = agt.thesaurus
+    loads = []
+    warmup = gt.warmup
+
+    def slow_warmup(datasets, release=None):
+        loads.append(threading.get_ident())
+        time.sleep(0.2)
+        warmup(datasets, release)
+    gt.warmup = slow_warmup
+
+    async def main():
+        # The loop keeps ticking while the data loads in the executor
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        done = asyncio.Event()
+        ticking = asyncio.ensure_future(ticker())
+        results = await asyncio.gather(*(agt.translate_genes(['ETV6'])
+                                         for _ in range(50)))
+        done.set()
+        await ticking
+        return results, ticks
+
+    results, ticks = asyncio.run(main())
+    agt.close()
+
+    assert results == [{'ETV6': 'ENSG00000139083'}] * 50
+    assert len(loads) == 1
+    assert loads[0] != threading.get_ident()
+    assert ticks > 5
+
+
+def test_first_lookup_does_not_block_the_loop():
+    # Large enough that building the indexes takes a noticeable while
+    data_dir = tempfile.TemporaryDirectory()
+    synthetic.write_hgnc(data_dir.name, '2023-01-31', 10000)
+    doc = next(doc for doc in synthetic.make_hgnc_docs(10000)
+               if doc.get('prev_symbol') and doc.get('ensembl_gene_id'))
+
+    async def main():
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        done = asyncio.Event()
+        ticking = asyncio.ensure_future(ticker())
+        start = time.perf_counter()
+        async with AsyncGeneThesaurus(data_dir=data_dir.name,
+                                      release='2023-01-31') as agt:
+            symbols = await agt.update_gene_symbols([doc['prev_symbol'][0]])
+            ensembl_ids = await agt.translate_genes([doc['symbol']])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ticking
+        return symbols, ensembl_ids, max(gaps), elapsed
+
+    symbols, ensembl_ids, max_gap, elapsed = asyncio.run(main())
+    assert symbols == {doc['prev_symbol'][0]: doc['symbol']}
+    assert ensembl_ids == {doc['symbol']: doc['ensembl_gene_id']}
+    # The indexes were built and opened in the executor
+    assert max_gap < 0.1 < elapsed
+
+
+def test_sync_options():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+
+    async def main():
+        async with AsyncGeneThesaurus(data_dir=data_dir.name,
+                                      release='2023-01-31') as agt:
+            return (await agt.update_gene_symbols(['erbb1 '], normalize=True),
+                    await agt.update_gene_symbols(['TEL'],
+                                                  all_candidates=True),
+                    await agt.translate_genes(['TNFA'], release='2023-01-31'),
+                    list(await agt.translate_iter(['ETV6', 'NOPE'])),
+                    await agt.translate_array(np.array(['ETV6', 'ETV6'])))
+
+    normalized, candidates, ensembl_ids, pairs, array = asyncio.run(main())
+    assert normalized == {'erbb1 ': 'EGFR'}
+    assert [c.symbol for c in candidates['TEL']] == ['ETV6']
+    assert ensembl_ids == {'TNFA': 'ENSG00000232810'}
+    assert pairs == [('ETV6', 'ENSG00000139083'), ('NOPE', None)]
+    assert array.tolist() == ['ENSG00000139083'] * 2
+
+
+def test_refreshed_tables_are_built_in_the_executor(monkeypatch):
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    write_gene_info(data_dir.name)
+
+    builds = []
+
+    class RecordingXref(XrefTranslationProvider):
+        def __init__(self, *args, **kwargs):
+            builds.append((args[2], threading.get_ident()))
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr('gene_thesaurus.gene_thesaurus.'
+                        'XrefTranslationProvider', RecordingXref)
+
+    async def main(clock):
+        async with AsyncGeneThesaurus(data_dir=data_dir.name) as agt:
+            await agt.update_gene_symbols(['TEL'])
+            clock.tick(30)
+            await agt.translate_genes(['2120'], source='entrez_id',
+                                      target='symbol')
+
+            # A newer HGNC release is picked up by a symbol lookup
+            write_hgnc(data_dir.name, '2023-02-28',
+                       [{'symbol': 'ETV6NEW', 'entrez_id': '2120'}])
+            clock.tick(31)
+            assert await agt.update_gene_symbols(['ETV6']) == {}
+            return await agt.translate_genes(['2120'], source='entrez_id',
+                                             target='symbol')
+
+    with freeze_time("2023-01-31 12:00:00") as clock:
+        assert asyncio.run(main(clock)) == {2120: 'ETV6NEW'}
+    assert [release for release, _ in builds] == ['2023-01-31', '2023-02-28']
+    assert threading.get_ident() not in [thread for _, thread in builds]
@@ -0,0 +1,45 @@
+from benchmarks import run, synthetic
+from gene_thesaurus import GeneThesaurus
+import tempfile
+
+
+def test_synthetic_data():
+    data_dir = tempfile.TemporaryDirectory()
+    synthetic.write_hgnc(data_dir.name, run.RELEASE, 500)
+    synthetic.write_gene_info(data_dir.name, 500, n_extra=100)
+    docs = synthetic.make_hgnc_docs(500)
+    assert synthetic.make_hgnc_docs(500) == docs
+
+    gt = GeneThesaurus(data_dir=data_dir.name, release=run.RELEASE)
+    doc = next(d for d in docs if 'ensembl_gene_id' in d and
+               'entrez_id' in d and 'alias_symbol' in d)
+    alias = doc['alias_symbol'][0]
+    assert gt.update_gene_symbols([alias]).get(alias) in (
+        doc['symbol'], None)
+    assert gt.translate_genes([doc['symbol']]) == {
+        doc['symbol']: doc['ensembl_gene_id']}
+    assert gt.translate_genes([doc['entrez_id']], source='entrez_id',
+                              target='symbol') == {
+        int(doc['entrez_id']): doc['symbol']}
+    assert gt.translate_genes(['100000001'], source='entrez_id',
+                              target='symbol') == {
+        100000001: 'LOC100000001'}
+
+    results = run.measure_lookups(data_dir.name, 500, 0, [10])
+    assert [r['name'] for r in results] == ['translate_genes',
+                                            'update_gene_symbols']
+    assert all(r['per_second'] > 0 and r['stage_peak_rss_bytes'] > 0
+               for r in results)
+
+
+def test_compare():
+    old = {'results': [{'name': 'import', 'seconds': 0.1},
+                       {'name': 'translate_genes', 'seconds': 1.0,
+                        'n_items': 10}]}
+    new = {'results': [{'name': 'import', 'seconds': 0.2},
+                       {'name': 'translate_genes', 'seconds': 1.1,
+                        'n_items': 10},
+                       {'name': 'cold_start', 'seconds': 0.1}]}
+    assert run.compare(old, new) == [
+        ('import', None, 0.1, 0.2, 2.0, True),
+        ('translate_genes', 10, 1.0, 1.1, 1.1, False)]
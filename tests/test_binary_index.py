@@ -0,0 +1,43 @@
+from gene_thesaurus.binary_index import BinaryIndex, BinaryIndexException
+import os
+import pytest
+import tempfile
+
+
+def test_roundtrip():
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'test.idx')
+    mapping = {'TNFSF2': 'TNF', 'ERBB1': 'EGFR', 'ETV6': 'ETV6',
+               'ÅLAND': 'ÖSTER', '': 'EMPTY'}
+    BinaryIndex.write(path, mapping)
+
+    with BinaryIndex(path) as index:
+        assert len(index) == len(mapping)
+        assert dict(index) == mapping
+        assert index['ERBB1'] == 'EGFR'
+        assert index.get('NOTAREALGENE') is None
+        assert 'ÅLAND' in index
+        assert 12345 not in index
+        assert list(index) == sorted(mapping, key=lambda k: k.encode())
+        with pytest.raises(KeyError):
+            index['NOTAREALGENE']
+
+
+def test_empty_index():
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'empty.idx')
+    BinaryIndex.write(path, {})
+
+    with BinaryIndex(path) as index:
+        assert len(index) == 0
+        assert index.get('TNF') is None
+
+
+def test_not_an_index():
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'symbol_thesaurus.json')
+    with open(path, 'w') as f:
+        f.write('{"TNFSF2": "TNF", "padding": "................"}')
+
+    with pytest.raises(BinaryIndexException):
+        BinaryIndex(path)
@@ -0,0 +1,85 @@
+from gene_thesaurus.bulk_translate import translate_files
+import gzip
+import os
+import pytest
+import tempfile
+from freezegun import freeze_time
+from tests.helpers import write_gene_info, write_hgnc
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_translate_files():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    work_dir = tempfile.TemporaryDirectory()
+    output_dir = os.path.join(work_dir.name, 'out')
+
+    genes = ['TNFSF2', 'ETV6', 'NOTAREALGENE', 'ERBB1'] * 250
+    counts_path = os.path.join(work_dir.name, 'counts.tsv')
+    with open(counts_path, 'w') as f:
+        f.write('gene\tcount\n')
+        for i, gene in enumerate(genes):
+            f.write(f'{gene}\t{i}\n')
+    small_path = os.path.join(work_dir.name, 'sample.csv.gz')
+    with gzip.open(small_path, 'wt') as f:
+        f.write('id,gene\n1,ETV6\n2,NOTAREALGENE\n')
+
+    # A small split size forces the large file into many byte ranges
+    out_paths = translate_files([counts_path, small_path],
+                                output_dir=output_dir,
+                                column='gene',
+                                data_dir=data_dir.name,
+                                workers=2,
+                                split_size=997,
+                                keep_unmapped=True)
+    assert out_paths == [os.path.join(output_dir, 'counts.tsv'),
+                         os.path.join(output_dir, 'sample.csv.gz')]
+
+    ensembl_ids = {'TNFSF2': 'ENSG00000232810', 'ETV6': 'ENSG00000139083',
+                   'ERBB1': 'ENSG00000146648'}
+    with open(out_paths[0]) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'gene\tcount'
+    assert lines[1:] == [f'{ensembl_ids.get(gene, gene)}\t{i}'
+                         for i, gene in enumerate(genes)]
+
+    with gzip.open(out_paths[1], 'rt') as f:
+        assert f.read() == 'id,gene\n1,ENSG00000139083\n2,NOTAREALGENE\n'
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_translate_entrez_files():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    write_gene_info(data_dir.name)
+    work_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(work_dir.name, 'entrez.tsv')
+    with open(path, 'w') as f:
+        f.write('entrez\tcount\n81399\t1\n1\t2\n\t3\n')
+
+    out_paths = translate_files([path],
+                                output_dir=os.path.join(work_dir.name, 'out'),
+                                column='entrez',
+                                source='entrez_id',
+                                target='symbol',
+                                data_dir=data_dir.name,
+                                workers=1)
+    with open(out_paths[0]) as f:
+        assert f.read() == 'entrez\tcount\nOR4F16\t1\n\t2\n\t3\n'
+
+
+def test_translate_files_with_same_name():
+    work_dir = tempfile.TemporaryDirectory()
+    paths = []
+    for name in ('a', 'b'):
+        os.makedirs(os.path.join(work_dir.name, name))
+        paths.append(os.path.join(work_dir.name, name, 'counts.tsv'))
+        with open(paths[-1], 'w') as f:
+            f.write('gene\tcount\nETV6\t1\n')
+
+    # Rejected before anything is loaded or written
+    output_dir = os.path.join(work_dir.name, 'out')
+    with pytest.raises(ValueError, match='counts.tsv'):
+        translate_files(paths, output_dir=output_dir, column='gene',
+                        data_dir=work_dir.name)
+    assert not os.path.exists(output_dir)
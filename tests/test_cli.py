@@ -0,0 +1,86 @@
+from gene_thesaurus import xref_translation_provider
+from gene_thesaurus.cli import main
+from gene_thesaurus.symbol_multimap import MULTIMAP_KEY_NAMES, \
+    MULTIMAP_NAMES
+import os
+import tempfile
+from freezegun import freeze_time
+from tests.helpers import write_gene_info, write_hgnc
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_build_index():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+
+    assert main(['build-index', '--data-dir', data_dir.name]) == 0
+
+    files = sorted(os.listdir(data_dir.name))
+    assert files == sorted(
+        [f'candidates_{name}_2023-01-31.npy' for name in MULTIMAP_NAMES] +
+        [f'normalized_{name}_2023-01-31.npy' for name in MULTIMAP_KEY_NAMES] +
+        ['ensembl_to_symbol_2023-01-31.idx',
+         'hgnc_build.lock',
+         'hgnc_complete_set_2023-01-31.json',
+         'hgnc_download.lock',
+         'hgnc_manifest.json',
+         'hgnc_records.jsonl',
+         'hgnc_records_digests.npy',
+         'hgnc_records_offsets.npy',
+         'hgnc_records.lock',
+         'hgnc_release_2023-01-31.npy',
+         'symbol_thesaurus_2023-01-31.idx',
+         'symbol_to_ensembl_2023-01-31.idx'])
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_build_index_ncbi_force(monkeypatch):
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    write_gene_info(data_dir.name)
+
+    builds = []
+    build = xref_translation_provider.build_cross_references
+    monkeypatch.setattr(
+        xref_translation_provider, 'build_cross_references',
+        lambda *args: builds.append(1) or build(*args))
+
+    # A missing table is built once, even when forced
+    args = ['build-index', '--data-dir', data_dir.name, '--ncbi', '--force']
+    assert main(args) == 0
+    assert len(builds) == 1
+    assert main(args) == 0
+    assert len(builds) == 2
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_translate():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    work_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(work_dir.name, 'counts.tsv')
+    with open(path, 'w') as f:
+        f.write('ensembl\tcount\nENSG00000146648\t5\n')
+
+    assert main(['translate', path,
+                 '--column', 'ensembl',
+                 '--source', 'ensembl_id',
+                 '--target', 'symbol',
+                 '--data-dir', data_dir.name,
+                 '--output-dir', os.path.join(work_dir.name, 'out'),
+                 '--workers', '1']) == 0
+    with open(os.path.join(work_dir.name, 'out', 'counts.tsv')) as f:
+        assert f.read() == 'ensembl\tcount\nEGFR\t5\n'
+
+
+@freeze_time("2023-02-28 12:00:00")
+def test_prune():
+    data_dir = tempfile.TemporaryDirectory()
+    for date in ('2023-01-31', '2023-02-28'):
+        write_hgnc(data_dir.name, date)
+        assert main(['build-index', '--data-dir', data_dir.name,
+                     '--release', date]) == 0
+
+    assert main(['prune', '--data-dir', data_dir.name]) == 0
+    assert [f for f in os.listdir(data_dir.name) if '2023-01-31' in f] == \
+        ['hgnc_release_2023-01-31.npy']
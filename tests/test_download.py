@@ -0,0 +1,198 @@
+from gene_thesaurus.download import DownloadException, Downloader
+from gene_thesaurus.ncbi_translation_provider import NcbiTranslationProvider
+import gzip
+import hashlib
+import os
+import pytest
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _FileServer(BaseHTTPRequestHandler):
+    # Serves `files` with ETags and byte ranges, records the request
+    # headers, cuts off the files in `truncate` halfway, once, and gzips
+    # the files in `encode` for clients that accept it
+    protocol_version = 'HTTP/1.1'
+    files = {}
+    truncate = set()
+    encode = set()
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, dict(self.headers)))
+        name = self.path.lstrip('/')
+        body = self.files.get(name)
+        if body is None:
+            self._send(404, b'')
+            return
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', etag)
+            return
+
+        encoding = None
+        if (name in self.encode and
+                'gzip' in self.headers.get('Accept-Encoding', '')):
+            encoding = 'gzip'
+            body = gzip.compress(body)
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range') == etag:
+            start = int(range_header[len('bytes='):].rstrip('-'))
+        if name in self.truncate:
+            self.truncate.discard(name)
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+        elif start:
+            self._send(206, body[start:], etag,
+                       f"bytes {start}-{len(body) - 1}/{len(body)}",
+                       encoding)
+        else:
+            self._send(200, body, etag, encoding=encoding)
+
+    def _send(self, status, body, etag=None, content_range=None,
+              encoding=None):
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        if content_range:
+            self.send_header('Content-Range', content_range)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def file_server():
+    _FileServer.files = {}
+    _FileServer.truncate = set()
+    _FileServer.encode = set()
+    _FileServer.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FileServer)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield _FileServer, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_resume(file_server):
+    handler, base_url = file_server
+    body = os.urandom(3 << 20)
+    handler.files = {'data.bin': body}
+    handler.truncate = {'data.bin'}
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'data.bin')
+    downloader = Downloader()
+
+    # A cut-off download never takes the place of the file
+    with pytest.raises(DownloadException):
+        downloader.download(base_url + 'data.bin', path)
+    assert not os.path.exists(path)
+    partial_size = os.path.getsize(path + '.partial')
+    assert 0 < partial_size < len(body)
+
+    # The next attempt asks only for the rest
+    assert downloader.download(base_url + 'data.bin', path)
+    with open(path, 'rb') as f:
+        assert f.read() == body
+    assert handler.requests[-1][1]['Range'] == f"bytes={partial_size}-"
+    assert os.listdir(data_dir.name) == ['data.bin']
+
+    # A file that changed meanwhile is downloaded from the start
+    handler.truncate = {'data.bin'}
+    with pytest.raises(DownloadException):
+        downloader.download(base_url + 'data.bin', path)
+    handler.files = {'data.bin': body[::-1]}
+    assert downloader.download(base_url + 'data.bin', path)
+    with open(path, 'rb') as f:
+        assert f.read() == body[::-1]
+    downloader.close()
+
+
+def test_encoded_response(file_server):
+    handler, base_url = file_server
+    body = b'{"response": {"docs": []}}' * 1000
+    handler.files = {'data.json': body}
+    handler.encode = {'data.json'}
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'data.json')
+    downloader = Downloader()
+
+    # The decoded body is stored, although it is longer than sent
+    assert downloader.download(base_url + 'data.json', path)
+    with open(path, 'rb') as f:
+        assert f.read() == body
+
+    # A cut-off encoded download is not resumed, but started over
+    handler.truncate = {'data.json'}
+    with pytest.raises(DownloadException):
+        downloader.download(base_url + 'data.json', path)
+    assert downloader.download(base_url + 'data.json', path)
+    assert 'Range' not in handler.requests[-1][1]
+    with open(path, 'rb') as f:
+        assert f.read() == body
+    assert os.listdir(data_dir.name) == ['data.json']
+    downloader.close()
+
+
+def test_missing_file(file_server):
+    _, base_url = file_server
+    data_dir = tempfile.TemporaryDirectory()
+    downloader = Downloader()
+    assert downloader.exists(base_url + 'missing.bin') is False
+    with pytest.raises(DownloadException):
+        downloader.download(base_url + 'missing.bin',
+                            os.path.join(data_dir.name, 'missing.bin'))
+    assert os.listdir(data_dir.name) == []
+    assert downloader.exists('http://127.0.0.1:1/missing.bin') is None
+
+
+def test_ncbi_conditional_fetch(file_server):
+    handler, base_url = file_server
+    gene_info = gzip.compress(b'#tax_id\tGeneID\tSymbol\tdbXrefs\n'
+                              b'9606\t81399\tOR4F16\t-\n')
+    handler.files = {'Homo_sapiens.gene_info.gz': gene_info}
+    data_dir = tempfile.TemporaryDirectory()
+
+    path = NcbiTranslationProvider.fetch(data_dir.name, base_url=base_url)
+    with open(path, 'rb') as f:
+        assert f.read() == gene_info
+    mtime = os.path.getmtime(path)
+
+    # A fresh file is used without asking the server
+    NcbiTranslationProvider.fetch(data_dir.name, base_url=base_url)
+    assert len(handler.requests) == 1
+
+    # A stale, unchanged file is checked, but not downloaded again
+    NcbiTranslationProvider.fetch(data_dir.name, max_age=0,
+                                  base_url=base_url)
+    assert len(handler.requests) == 2
+    assert 'If-None-Match' in handler.requests[-1][1]
+    assert os.path.getmtime(path) == mtime
+
+    # A changed file is
+    handler.files = {'Homo_sapiens.gene_info.gz': gene_info + gene_info}
+    NcbiTranslationProvider.fetch(data_dir.name, max_age=0,
+                                  base_url=base_url)
+    with open(path, 'rb') as f:
+        assert f.read() == gene_info + gene_info
+
+    # An unreachable server leaves the cached file in use
+    assert NcbiTranslationProvider.fetch(
+        data_dir.name, max_age=0, base_url='http://127.0.0.1:1/') == path
@@ -1,6 +1,16 @@
-from gene_thesaurus import GeneThesaurus
+from gene_thesaurus import GeneThesaurus, ProviderRegistry, metrics
+import errno
+import itertools
+import numpy as np
+import pandas as pd
 import pytest
 import tempfile
+from freezegun import freeze_time
+from gene_thesaurus.download import Downloader
+from gene_thesaurus.file_lock import FileLock
+from gene_thesaurus.hgnc_translation_provider import HgncTranslationProvider
+from gene_thesaurus.symbol_multimap import SymbolCandidate
+from tests.helpers import HGNC_DOCS, write_gene_info, write_hgnc
 
 
 data_dir = tempfile.TemporaryDirectory()
@@ -68,3 +78,250 @@ def test_entrez_translation():
     assert gt_dict == {102465909: 'ENSG00000273874',
                        100132287: '',
                        81399: 'ENSG00000284662'}
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_translate_iter():
+    iter_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(iter_data_dir.name, '2023-01-31')
+    write_gene_info(iter_data_dir.name)
+    iter_gt = GeneThesaurus(data_dir=iter_data_dir.name)
+
+    consumed = []
+
+    def genes():
+        for gene in itertools.cycle(['TNFSF2', 'NOTAREALGENE', 'ETV6']):
+            consumed.append(gene)
+            yield gene
+
+    # Only as much input as needed is consumed, one chunk at a time
+    pairs = iter_gt.translate_iter(genes(), chunk_size=2)
+    assert list(itertools.islice(pairs, 3)) == [
+        ('TNFSF2', 'ENSG00000232810'),
+        ('NOTAREALGENE', None),
+        ('ETV6', 'ENSG00000139083')]
+    assert len(consumed) == 4
+
+    pairs = iter_gt.translate_iter(['81399', '100132287', '1'],
+                                   source='entrez_id', target='ensembl_id')
+    assert list(pairs) == [('81399', 'ENSG00000284662'),
+                           ('100132287', None),
+                           ('1', None)]
+
+    pairs = iter_gt.update_iter(iter(['ERBB1', 'ETV6', 'NOTAREALGENE']))
+    assert list(pairs) == [('ERBB1', 'EGFR'),
+                           ('ETV6', 'ETV6'),
+                           ('NOTAREALGENE', None)]
+
+    with pytest.raises(ValueError):
+        iter_gt.translate_iter([], source='symbol', target='symbol')
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_translate_array():
+    array_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(array_data_dir.name, '2023-01-31')
+    write_gene_info(array_data_dir.name)
+    array_gt = GeneThesaurus(data_dir=array_data_dir.name)
+
+    genes = np.array(['ETV6', 'TNFSF2', 'NOTAREALGENE', 'ETV6'])
+    translated = array_gt.translate_array(genes, fill_value='')
+    assert translated.tolist() == ['ENSG00000139083', 'ENSG00000232810',
+                                   '', 'ENSG00000139083']
+
+    index = pd.Index(['ENSG00000146648', None, 'ENSG00000232810'],
+                     name='gene')
+    translated = array_gt.translate_series(index, source='ensembl_id',
+                                           target='symbol')
+    assert isinstance(translated, pd.Index)
+    assert translated.name == 'gene'
+    assert translated.tolist() == ['EGFR', None, 'TNF']
+
+    series = pd.Series([81399, 1, 81399], index=['a', 'b', 'c'])
+    translated = array_gt.translate_series(series, source='entrez_id',
+                                           target='symbol',
+                                           fill_value='unknown')
+    assert translated.index.tolist() == ['a', 'b', 'c']
+    assert translated.tolist() == ['OR4F16', 'unknown', 'OR4F16']
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_relabel_matrix():
+    matrix_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(matrix_data_dir.name, '2023-01-31')
+    matrix_gt = GeneThesaurus(data_dir=matrix_data_dir.name)
+
+    counts = pd.DataFrame({'s1': [1, 2, 3, 4], 's2': [10, 20, 30, 40]},
+                          index=['TNFSF2', 'TNF', 'ERBB1', 'NOTAREALGENE'])
+    relabeled = matrix_gt.relabel_matrix(counts)
+    assert relabeled.index.tolist() == ['TNF', 'EGFR', 'NOTAREALGENE']
+    assert relabeled.loc['TNF'].tolist() == [3, 30]
+
+    matrix = counts.to_numpy()
+    relabeled, labels = matrix_gt.relabel_matrix(
+        matrix, ['ENSG00000232810', 'ENSG00000232810', 'ENSG00000146648',
+                 'NOTAREALGENE'],
+        source='ensembl_id', target='symbol', agg='max',
+        drop_unmapped=True)
+    assert labels.tolist() == ['TNF', 'EGFR']
+    assert relabeled.tolist() == [[2, 20], [3, 30]]
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_translate_genes_to_entrez_id():
+    xref_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(xref_data_dir.name, '2023-01-31')
+    write_gene_info(xref_data_dir.name)
+    xref_gt = GeneThesaurus(data_dir=xref_data_dir.name)
+
+    assert xref_gt.translate_genes(['ERBB1', 'OR4F16', 'NOTAREALGENE'],
+                                   source='symbol', target='entrez_id') == \
+        {'ERBB1': 1956, 'OR4F16': 81399}
+    assert xref_gt.translate_genes(['ENSG00000139083'], source='ensembl_id',
+                                   target='entrez_id') == \
+        {'ENSG00000139083': 2120}
+    assert xref_gt.translate_genes(['7124'], source='entrez_id',
+                                   target='symbol') == {7124: 'TNF'}
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_update_gene_symbols_all_candidates():
+    candidates_data_dir = tempfile.TemporaryDirectory()
+    # TEL is also the previous symbol of a made-up gene
+    docs = HGNC_DOCS + [{'symbol': 'FAKE1', 'prev_symbol': ['TEL']}]
+    write_hgnc(candidates_data_dir.name, '2023-01-31', docs=docs)
+    candidates_gt = GeneThesaurus(data_dir=candidates_data_dir.name)
+
+    assert candidates_gt.update_gene_symbols(
+        ['TEL', 'ETV6', 'NOTAREALGENE'], all_candidates=True) == {
+        'TEL': [SymbolCandidate('FAKE1', None, None, 'prev_symbol'),
+                SymbolCandidate('ETV6', 'ENSG00000139083', 2120,
+                                'alias_symbol')],
+        'ETV6': [SymbolCandidate('ETV6', 'ENSG00000139083', 2120,
+                                 'symbol')]}
+    # The default keeps a single answer per gene
+    assert candidates_gt.update_gene_symbols(['TEL']) == {'TEL': 'FAKE1'}
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_normalized_lookup():
+    normalized_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(normalized_data_dir.name, '2023-01-31')
+    normalized_gt = GeneThesaurus(data_dir=normalized_data_dir.name)
+
+    genes = ['erbb1', 'TNFSF2 ', 'Etv6', 'ETV6', 'NOTAREALGENE']
+    assert normalized_gt.update_gene_symbols(genes) == {}
+    assert normalized_gt.update_gene_symbols(genes, normalize=True) == {
+        'erbb1': 'EGFR', 'TNFSF2 ': 'TNF', 'Etv6': 'ETV6'}
+    assert normalized_gt.translate_genes(genes, normalize=True) == {
+        'erbb1': 'ENSG00000146648', 'TNFSF2 ': 'ENSG00000232810',
+        'Etv6': 'ENSG00000139083', 'ETV6': 'ENSG00000139083'}
+    assert normalized_gt.translate_genes(['zscan5cp'], target='entrez_id',
+                                         normalize=True) == \
+        {'zscan5cp': 649137}
+    with pytest.raises(ValueError):
+        normalized_gt.translate_genes(genes, source='ensembl_id',
+                                      target='symbol', normalize=True)
+
+    assert [symbol for symbol, _ in normalized_gt.complete('tnf')] == \
+        ['TNF', 'TNFA', 'TNFSF2']
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_stats():
+    stats_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(stats_data_dir.name, '2023-01-31')
+    with GeneThesaurus(data_dir=stats_data_dir.name,
+                       collect_stats=True) as stats_gt:
+        stats_gt.translate_genes(['TNFSF2', 'ERBB1', 'NOTAREALGENE'])
+        stats_gt.update_gene_symbols(['TNFSF2'])
+        stats = stats_gt.stats()
+
+    assert stats['counts']['hgnc.records'] == len(HGNC_DOCS)
+    assert stats['counts']['hgnc.bytes_read'] > 0
+    assert stats['counts']['hgnc.manifest_misses'] == 1
+    assert stats['counts']['registry.misses'] == 1
+    assert stats['counts']['registry.hits'] == 1
+    assert stats['counts']['lookup.genes'] == 4
+    assert stats['timings']['lookup']['count'] == 2
+    assert stats['timings']['hgnc.build_indexes']['count'] == 1
+    assert stats['registry']['providers'] == 1
+
+    # Without collect_stats nothing is aggregated
+    assert GeneThesaurus(data_dir=stats_data_dir.name).stats()['counts'] == {}
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_stats_per_instance():
+    stats_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(stats_data_dir.name, '2023-01-31')
+    stats_gt = GeneThesaurus(data_dir=stats_data_dir.name, shared=True,
+                             collect_stats=True)
+    other_gt = GeneThesaurus(data_dir=stats_data_dir.name, shared=True,
+                             collect_stats=True)
+    # Collecting registers no process-wide hook that could outlive them
+    assert not metrics.enabled()
+
+    stats_gt.warmup(datasets=('hgnc',))
+    other_gt.translate_genes(['TNFSF2', 'ERBB1'])
+    assert list(stats_gt.translate_iter(['TNFSF2', 'TEL', 'NOPE'],
+                                        chunk_size=2))
+    stats_gt.translate_array(np.array(['TNFSF2', 'TNFSF2']))
+    stats_gt.relabel_matrix(np.ones((2, 2)), labels=['TNFSF2', 'TEL'])
+
+    # Only the lookups of each instance are its own
+    stats = stats_gt.stats()
+    assert stats['counts']['registry.misses'] == 1
+    assert stats['counts']['lookup.genes'] == 7
+    assert stats['timings']['lookup']['count'] == 4
+    assert other_gt.stats()['counts']['lookup.genes'] == 2
+    assert 'registry.misses' not in other_gt.stats()['counts']
+    ProviderRegistry.shared().close()
+
+
+def test_read_only_data_dir(monkeypatch):
+    ro_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(ro_data_dir.name, '2023-01-31')
+    write_gene_info(ro_data_dir.name)
+    with freeze_time("2023-01-31 12:00:00"), \
+            GeneThesaurus(data_dir=ro_data_dir.name) as ro_gt:
+        ro_gt.warmup()
+
+    # Long after it was prebuilt, the directory can no longer be written
+    def fail(*args, **kwargs):
+        raise PermissionError(errno.EROFS, 'Read-only file system')
+    monkeypatch.setattr('gene_thesaurus.file_lock.os.access',
+                        lambda path, mode: False)
+    monkeypatch.setattr(FileLock, 'acquire', fail)
+    monkeypatch.setattr(Downloader, 'exists', fail)
+    monkeypatch.setattr(Downloader, 'download', fail)
+    with freeze_time("2030-01-31 12:00:00"), \
+            GeneThesaurus(data_dir=ro_data_dir.name) as ro_gt:
+        assert ro_gt.hgnc_release == '2023-01-31'
+        assert ro_gt.update_gene_symbols(['TNFSF2']) == {'TNFSF2': 'TNF'}
+        assert ro_gt.translate_genes(['81399'], source='entrez_id',
+                                     target='symbol') == {81399: 'OR4F16'}
+
+
+@freeze_time("2023-02-28 12:00:00")
+def test_pinned_release():
+    pinned_data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(pinned_data_dir.name, '2023-01-31')
+    # ERBB1 was moved to a new gene in the later release
+    docs = HGNC_DOCS + [{'symbol': 'FAKE1', 'alias_symbol': ['ERBB1']}]
+    write_hgnc(pinned_data_dir.name, '2023-02-28', docs=docs)
+    pinned_gt = GeneThesaurus(data_dir=pinned_data_dir.name)
+
+    assert pinned_gt.update_gene_symbols(['ERBB1']) == {'ERBB1': 'FAKE1'}
+    assert pinned_gt.update_gene_symbols(['ERBB1'],
+                                         release='2023-01-31') == \
+        {'ERBB1': 'EGFR'}
+    assert pinned_gt.diff_releases('2023-01-31', '2023-02-28') == \
+        (['FAKE1'], [], [])
+    assert pinned_gt.releases() == ['2023-01-31', '2023-02-28']
+
+    # Old releases can still be pinned once their files are pruned
+    HgncTranslationProvider.prune_releases(pinned_data_dir.name)
+    pinned_gt = GeneThesaurus(data_dir=pinned_data_dir.name)
+    assert pinned_gt.translate_genes(['ERBB1'], release='2023-01-31') == \
+        {'ERBB1': 'ENSG00000146648'}
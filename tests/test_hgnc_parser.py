@@ -0,0 +1,78 @@
+from gene_thesaurus.hgnc_parser import HgncParseException, iter_hgnc_records
+import json
+import os
+import pytest
+import tempfile
+import tracemalloc
+
+
+def _write_complete_set(path, n_records):
+    # Mimics the layout of the HGNC complete set, including the many
+    # fields that the indexes never use
+    with open(path, 'w', encoding='utf8') as f:
+        f.write('{"responseHeader": {"status": 0, "QTime": 12},\n')
+        f.write(f' "response": {{"numFound": {n_records}, "start": 0,\n')
+        f.write('  "docs": [\n')
+        for i in range(n_records):
+            record = {
+                'hgnc_id': f'HGNC:{i}',
+                'symbol': f'GENE{i}',
+                'name': f'synthetic gene {i} with a reasonably long name',
+                'locus_group': 'protein-coding gene',
+                'location': '6p21.33',
+                'alias_symbol': [f'ALIAS{i}A', f'ALIAS{i}B'],
+                'prev_symbol': [f'PREV{i}'],
+                'ensembl_gene_id': f'ENSG{i:011d}',
+                'pubmed_id': list(range(i, i + 10)),
+                'uniprot_ids': ['P01375'],
+                'date_modified': '2023-01-01',
+            }
+            if i:
+                f.write(',\n')
+            json.dump(record, f)
+        f.write(']}}\n')
+
+
+def test_projected_records():
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'hgnc_complete_set_2023-01-01.json')
+    _write_complete_set(path, 100)
+
+    # A tiny chunk size makes records straddle chunk boundaries
+    records = list(iter_hgnc_records(path, chunk_size=7))
+    assert len(records) == 100
+    assert records[42] == {'hgnc_id': 'HGNC:42',
+                           'symbol': 'GENE42',
+                           'prev_symbol': ['PREV42'],
+                           'alias_symbol': ['ALIAS42A', 'ALIAS42B'],
+                           'ensembl_gene_id': 'ENSG00000000042'}
+
+
+def test_truncated_file():
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'hgnc_complete_set_2023-01-01.json')
+    _write_complete_set(path, 10)
+    with open(path, 'r+') as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    with pytest.raises(HgncParseException):
+        list(iter_hgnc_records(path))
+
+
+def test_peak_memory():
+    data_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(data_dir.name, 'hgnc_complete_set_2023-01-01.json')
+    _write_complete_set(path, 20000)
+    file_size = os.path.getsize(path)
+
+    tracemalloc.start()
+    try:
+        n_records = sum(1 for _ in iter_hgnc_records(path))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert n_records == 20000
+    # Loading the whole file would need several times its size
+    assert peak < 1024 * 1024
+    assert peak < file_size / 8
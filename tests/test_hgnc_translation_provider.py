@@ -1,8 +1,66 @@
 from gene_thesaurus.hgnc_translation_provider import HgncException, HgncTranslationProvider
+import json
+import multiprocessing
+import os
 import pytest
 import tempfile
+import threading
 from datetime import datetime
+from gene_thesaurus import metrics
 from freezegun import freeze_time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _hgnc_json(docs):
+    return json.dumps({'response': {'docs': docs}}).encode('utf8')
+
+
+class _HgncStandIn(BaseHTTPRequestHandler):
+    # Serves only the files in `files`, and counts the requests
+    protocol_version = 'HTTP/1.1'
+    files = {}
+    requests = []
+
+    def do_HEAD(self):
+        self._respond(with_body=False)
+
+    def do_GET(self):
+        self._respond(with_body=True)
+
+    def _respond(self, with_body):
+        self.requests.append((self.command, self.path))
+        body = self.files.get(self.path.lstrip('/'))
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StandInServer(ThreadingHTTPServer):
+    # Room for every concurrent probe
+    request_queue_size = 128
+    daemon_threads = True
+
+
+@pytest.fixture
+def hgnc_server():
+    _HgncStandIn.files = {}
+    _HgncStandIn.requests = []
+    server = _StandInServer(('127.0.0.1', 0), _HgncStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield _HgncStandIn, f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
 
 
 @freeze_time("2023-02-05 12:00:00")
@@ -28,3 +86,134 @@ def test_hgnc_exception():
                                        data_end_date = datetime.now(),
                                        n_attempted_months=2)
 
+
+@freeze_time("2023-01-31 12:00:00")
+def test_binary_indexes():
+    data_dir = tempfile.TemporaryDirectory()
+    data_dir_name = data_dir.name
+    docs = [{'symbol': 'TNF', 'alias_symbol': ['TNFSF2'],
+             'ensembl_gene_id': 'ENSG00000232810'},
+            {'symbol': 'EGFR', 'prev_symbol': ['ERBB1'],
+             'ensembl_gene_id': 'ENSG00000146648'},
+            {'symbol': 'NOENSEMBL'}]
+    with open(os.path.join(data_dir_name,
+                           'hgnc_complete_set_2023-01-31.json'), 'w') as f:
+        json.dump({'response': {'docs': docs}}, f)
+
+    hgnc = HgncTranslationProvider(data_dir=data_dir_name)
+    assert hgnc.update_gene_symbols(['TNFSF2', 'EGFR', 'NOTAREALGENE']) == \
+        {'TNFSF2': 'TNF'}
+    assert hgnc.translate_list(['ERBB1', 'NOENSEMBL'], 'symbol',
+                               'ensembl_id') == {'ERBB1': 'ENSG00000146648'}
+    assert hgnc.translate_list(['ENSG00000232810'], 'ensembl_id',
+                               'symbol') == {'ENSG00000232810': 'TNF'}
+    hgnc.close()
+
+    files = os.listdir(data_dir_name)
+    assert 'symbol_thesaurus_2023-01-31.idx' in files
+    assert 'symbol_thesaurus_2023-01-31.json' not in files
+
+    # A new provider reads the existing indexes
+    hgnc = HgncTranslationProvider(data_dir=data_dir_name)
+    assert hgnc.update_gene_symbols(['ERBB1']) == {'ERBB1': 'EGFR'}
+
+    hgnc.export_json()
+    with open(os.path.join(data_dir_name,
+                           'symbol_thesaurus_2023-01-31.json')) as f:
+        assert json.load(f)['TNFSF2'] == 'TNF'
+    hgnc.close()
+
+
+def test_concurrent_release_discovery(hgnc_server):
+    handler, base_url = hgnc_server
+    data_end_date = datetime(2023, 3, 20)
+    handler.files = {
+        'hgnc_complete_set_2023-01-03.json': _hgnc_json([{'symbol': 'OLD'}]),
+        'hgnc_complete_set_2023-02-07.json': _hgnc_json([{'symbol': 'NEW'}]),
+    }
+    data_dir = tempfile.TemporaryDirectory()
+    data_dir_name = data_dir.name
+
+    hgnc = HgncTranslationProvider(data_dir=data_dir_name,
+                                   data_end_date=data_end_date,
+                                   base_url=base_url,
+                                   n_attempted_months=3)
+    assert hgnc.data_date == '2023-02-07'
+    assert os.path.isfile(os.path.join(data_dir_name,
+                                       'hgnc_complete_set_2023-02-07.json'))
+    assert ('GET', '/hgnc_complete_set_2023-02-07.json') in handler.requests
+    assert ('GET', '/hgnc_complete_set_2023-01-03.json') \
+        not in handler.requests
+
+    # The manifest lets later providers skip discovery
+    handler.requests.clear()
+    hgnc = HgncTranslationProvider(data_dir=data_dir_name,
+                                   data_end_date=data_end_date,
+                                   base_url=base_url,
+                                   n_attempted_months=3)
+    assert hgnc.data_date == '2023-02-07'
+    assert handler.requests == []
+
+
+def test_discovery_only_probes_newer_than_local(hgnc_server):
+    handler, base_url = hgnc_server
+    data_end_date = datetime(2023, 2, 20)
+    data_dir = tempfile.TemporaryDirectory()
+    data_dir_name = data_dir.name
+    with open(os.path.join(data_dir_name,
+                           'hgnc_complete_set_2023-02-07.json'), 'wb') as f:
+        f.write(_hgnc_json([{'symbol': 'LOCAL'}]))
+
+    hgnc = HgncTranslationProvider(data_dir=data_dir_name,
+                                   data_end_date=data_end_date,
+                                   base_url=base_url,
+                                   n_attempted_months=3)
+    assert hgnc.data_date == '2023-02-07'
+    assert all(path > '/hgnc_complete_set_2023-02-07.json'
+               for _, path in handler.requests)
+    assert len(handler.requests) == 31 - 7
+
+
+def _cold_start(data_dir, base_url, start, results):
+    stats = metrics.StatsCollector()
+    metrics.add_hook(stats)
+    start.wait()
+    hgnc = HgncTranslationProvider(data_dir=data_dir,
+                                   data_end_date=datetime(2023, 2, 20),
+                                   base_url=base_url,
+                                   n_attempted_months=2)
+    symbols = hgnc.update_gene_symbols(['OLDNAME'])
+    timings = stats.snapshot()['timings']
+    results.put((hgnc.data_date, symbols,
+                 timings.get('hgnc.build_indexes', {}).get('count', 0)))
+
+
+def test_concurrent_cold_start(hgnc_server):
+    handler, base_url = hgnc_server
+    handler.files = {'hgnc_complete_set_2023-02-07.json': _hgnc_json(
+        [{'symbol': 'NEW', 'prev_symbol': ['OLDNAME']}])}
+    data_dir = tempfile.TemporaryDirectory()
+
+    # Processes sharing a cold data directory start at the same time
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=_cold_start,
+                                 args=(data_dir.name, base_url, start,
+                                       results))
+                 for _ in range(8)]
+    for process in processes:
+        process.start()
+    start.set()
+    answers = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert answers.count(('2023-02-07', {'OLDNAME': 'NEW'}, 0)) == 7
+    assert ('2023-02-07', {'OLDNAME': 'NEW'}, 1) in answers
+    # One process discovered and downloaded the release
+    assert handler.requests.count(
+        ('GET', '/hgnc_complete_set_2023-02-07.json')) == 1
+    assert len([r for r in handler.requests if r[0] == 'HEAD']) == \
+        2 * 31
@@ -0,0 +1,79 @@
+from gene_thesaurus.hgnc_translation_provider import HgncTranslationProvider
+from gene_thesaurus.matrix import factorize
+import json
+import math
+import os
+import pytest
+import subprocess
+import sys
+import tempfile
+from tests.helpers import write_hgnc
+
+_SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+
+# Generous limits: the module checks catch heavy imports, the timings
+# catch anything else that makes short-lived jobs slow
+_MAX_IMPORT_SECONDS = 1.0
+_MAX_FIRST_LOOKUP_SECONDS = 3.0
+
+_COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+import gene_thesaurus
+import_seconds = time.perf_counter() - start
+imported = sorted(m for m in ('numpy', 'pandas', 'requests')
+                  if m in sys.modules)
+
+start = time.perf_counter()
+gt = gene_thesaurus.GeneThesaurus(data_dir=sys.argv[1], release='2023-01-31')
+updated = gt.update_gene_symbols(['TNFSF2', 'ETV6'])
+lookup_seconds = time.perf_counter() - start
+translated = gt.translate_array(['ERBB1', None]).tolist()
+
+print(json.dumps({
+    'import_seconds': import_seconds,
+    'lookup_seconds': lookup_seconds,
+    'imported': imported,
+    'imported_after_lookup': sorted(m for m in ('pandas', 'requests')
+                                    if m in sys.modules),
+    'updated': updated,
+    'translated': translated,
+}))
+"""
+
+
+def test_cold_start():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    HgncTranslationProvider(data_dir.name,
+                            release='2023-01-31').build_indexes()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        p for p in (_SRC_DIR, env.get('PYTHONPATH')) if p)
+    out = subprocess.run([sys.executable, '-c', _COLD_START, data_dir.name],
+                         env=env, check=True, capture_output=True,
+                         text=True)
+    result = json.loads(out.stdout)
+
+    assert result['updated'] == {'TNFSF2': 'TNF'}
+    assert result['translated'] == ['ENSG00000146648', None]
+    # Nothing heavy is imported up front, and HGNC lookups need neither
+    # pandas nor requests
+    assert result['imported'] == []
+    assert result['imported_after_lookup'] == []
+    assert result['import_seconds'] < _MAX_IMPORT_SECONDS
+    assert result['lookup_seconds'] < _MAX_FIRST_LOOKUP_SECONDS
+
+
+def test_factorize_without_pandas(monkeypatch):
+    # Loaded pandas is used, and the fallback gives the same result
+    pytest.importorskip('pandas')
+    values = ['TNF', None, 'EGFR', 'TNF', math.nan]
+    expected_codes, expected_uniques = factorize(values)
+
+    monkeypatch.setitem(sys.modules, 'pandas', None)
+    codes, uniques = factorize(values)
+    assert codes.tolist() == expected_codes.tolist() == [0, -1, 1, 0, -1]
+    assert uniques.tolist() == expected_uniques.tolist() == ['TNF', 'EGFR']
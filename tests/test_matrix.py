@@ -0,0 +1,55 @@
+from gene_thesaurus.matrix import collapse_rows
+import numpy as np
+import pandas as pd
+import pytest
+
+LABELS = ['TNF', 'EGFR', None, 'TNF', 'ETV6', 'EGFR']
+MATRIX = np.array([[1, 0, 3],
+                   [0, 0, 2],
+                   [9, 9, 9],
+                   [4, 0, -1],
+                   [0, 5, 0],
+                   [2, 0, 0]])
+
+
+def _expected(agg):
+    df = pd.DataFrame(MATRIX, index=pd.Index(LABELS, dtype=object))
+    df = df[df.index.notna()]
+    return df.groupby(level=0, sort=False).agg(agg)
+
+
+@pytest.mark.parametrize('agg', ['sum', 'mean', 'max', 'first'])
+def test_collapse_dense(agg):
+    collapsed, labels = collapse_rows(MATRIX, LABELS, agg)
+    expected = _expected(agg)
+    assert labels.tolist() == ['TNF', 'EGFR', 'ETV6']
+    np.testing.assert_array_equal(collapsed, expected.to_numpy())
+
+
+@pytest.mark.parametrize('agg', ['sum', 'mean', 'max', 'first'])
+def test_collapse_sparse(agg):
+    # Only the sparse tests need the sparse extra
+    scipy_sparse = pytest.importorskip('scipy.sparse')
+    matrix = scipy_sparse.csr_matrix(MATRIX)
+    collapsed, labels = collapse_rows(matrix, LABELS, agg)
+    expected = _expected(agg)
+    assert scipy_sparse.issparse(collapsed)
+    assert labels.tolist() == ['TNF', 'EGFR', 'ETV6']
+    np.testing.assert_array_equal(collapsed.toarray(), expected.to_numpy())
+
+
+def test_collapse_dataframe():
+    df = pd.DataFrame(MATRIX, columns=['a', 'b', 'c'],
+                      index=pd.Index(LABELS, name='gene'))
+    collapsed = collapse_rows(df, LABELS, 'sum')
+    assert collapsed.index.tolist() == ['TNF', 'EGFR', 'ETV6']
+    assert collapsed.index.name == 'gene'
+    assert collapsed.columns.tolist() == ['a', 'b', 'c']
+    assert collapsed.loc['TNF'].tolist() == [5, 0, 2]
+
+
+def test_invalid_agg():
+    with pytest.raises(ValueError):
+        collapse_rows(MATRIX, LABELS, 'median')
+    with pytest.raises(ValueError):
+        collapse_rows(MATRIX, LABELS[:2], 'sum')
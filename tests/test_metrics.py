@@ -0,0 +1,60 @@
+from gene_thesaurus import metrics
+from gene_thesaurus.metrics import MetricEvent, StatsCollector
+
+
+def test_disabled_without_hooks():
+    assert not metrics.enabled()
+    records = ['a', 'b']
+    # Nothing is wrapped when nobody listens
+    assert metrics.timed_iter('parse', records) is records
+    with metrics.timer('stage'):
+        pass
+
+
+def test_hooks_receive_events():
+    events = []
+    metrics.add_hook(events.append)
+    try:
+        metrics.count('bytes', 10, release='2023-01-31')
+        with metrics.timer('stage'):
+            pass
+        assert list(metrics.timed_iter('parse', ['a', 'b'],
+                                       'records')) == ['a', 'b']
+    finally:
+        metrics.remove_hook(events.append)
+
+    assert not metrics.enabled()
+    assert events[0] == MetricEvent('bytes', 'count', 10,
+                                    {'release': '2023-01-31'})
+    assert [(e.name, e.kind) for e in events[1:]] == [
+        ('stage', 'timing'), ('parse', 'timing'), ('records', 'count')]
+    assert events[-1].value == 2
+
+
+def test_failing_hook_is_ignored():
+    def failing_hook(event):
+        raise RuntimeError('broken exporter')
+
+    collector = StatsCollector()
+    metrics.add_hook(failing_hook)
+    metrics.add_hook(collector)
+    try:
+        metrics.count('bytes', 10)
+    finally:
+        metrics.remove_hook(failing_hook)
+        metrics.remove_hook(collector)
+    assert collector.snapshot()['counts'] == {'bytes': 10}
+
+
+def test_stats_collector():
+    collector = StatsCollector()
+    collector(MetricEvent('bytes', 'count', 10, {}))
+    collector(MetricEvent('bytes', 'count', 5, {}))
+    collector(MetricEvent('stage', 'timing', 1.0, {}))
+    collector(MetricEvent('stage', 'timing', 3.0, {}))
+    assert collector.snapshot() == {
+        'counts': {'bytes': 15},
+        'timings': {'stage': {'count': 2, 'total': 4.0, 'max': 3.0}}}
+
+    collector.reset()
+    assert collector.snapshot() == {'counts': {}, 'timings': {}}
@@ -0,0 +1,50 @@
+from gene_thesaurus.ncbi_translation_provider import NcbiTranslationProvider
+from gene_thesaurus.xref_translation_provider import XrefTranslationProvider
+import os
+import tempfile
+from freezegun import freeze_time
+from tests.helpers import write_gene_info, write_hgnc
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_translate_list():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    write_gene_info(data_dir.name)
+
+    ncbi = NcbiTranslationProvider(data_dir=data_dir.name)
+    test_genes = ['102465909', '100132287', '81399', '1']
+    assert ncbi.translate_list(test_genes, 'entrez_id', 'symbol') == \
+        {102465909: 'MIR6859-2', 100132287: 'LOC100132287',
+         81399: 'OR4F16', 1: ''}
+    assert ncbi.translate_list(test_genes, 'entrez_id', 'ensembl_id') == \
+        {102465909: 'ENSG00000273874', 100132287: '',
+         81399: 'ENSG00000284662', 1: ''}
+    assert ncbi.translate_list(['2120'], 'entrez_id', 'symbol') == \
+        {2120: 'ETV6'}
+    ncbi.close()
+
+
+def test_gene_info_cache():
+    data_dir = tempfile.TemporaryDirectory()
+    ncbi_path = write_gene_info(data_dir.name)
+    hgnc_paths = {date: write_hgnc(data_dir.name, date)
+                  for date in ('2023-01-31', '2023-02-28')}
+
+    xref = XrefTranslationProvider(data_dir.name, hgnc_paths['2023-01-31'],
+                                   '2023-01-31', ncbi_path)
+    xref.close()
+
+    # The table of a later HGNC release reads the cache instead of the
+    # gzipped TSV, which is garbled here without changing its stamp
+    mtime = os.path.getmtime(ncbi_path)
+    with open(ncbi_path, 'wb') as f:
+        f.write(b'not gzip')
+    os.utime(ncbi_path, (mtime, mtime))
+
+    xref = XrefTranslationProvider(data_dir.name, hgnc_paths['2023-02-28'],
+                                   '2023-02-28', ncbi_path)
+    assert xref.translate_list([81399, 100132287], 'entrez_id',
+                               'ensembl_id') == \
+        {81399: 'ENSG00000284662', 100132287: ''}
+    xref.close()
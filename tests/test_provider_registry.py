@@ -0,0 +1,111 @@
+from gene_thesaurus import GeneThesaurus, ProviderRegistry
+import os
+import tempfile
+from freezegun import freeze_time
+from tests.helpers import write_gene_info, write_hgnc
+
+
+class FakeProvider:
+    def __init__(self, name, nbytes=0):
+        self.name = name
+        self.nbytes = nbytes
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_provider_loaded_once():
+    registry = ProviderRegistry()
+    loads = []
+
+    def factory():
+        loads.append(1)
+        return FakeProvider('a')
+
+    first = registry.get('a', factory)
+    second = registry.get('a', factory)
+    assert first is second
+    assert len(loads) == 1
+
+
+def test_lru_eviction():
+    registry = ProviderRegistry(max_bytes=25)
+    registry.get('a', lambda: FakeProvider('a', 10))
+    registry.get('b', lambda: FakeProvider('b', 10))
+
+    # Touch 'a' so that 'b' is the least recently used
+    registry.get('a', lambda: FakeProvider('a', 10))
+    registry.get('c', lambda: FakeProvider('c', 10))
+
+    assert 'a' in registry
+    assert 'b' not in registry
+    assert 'c' in registry
+    assert registry.nbytes == 20
+
+
+def test_refresh():
+    registry = ProviderRegistry(refresh_interval=0)
+    old = registry.get('a', lambda: FakeProvider('old'))
+    same = registry.get('a', lambda: None, lambda p: None)
+    new = registry.get('a', lambda: None, lambda p: FakeProvider('new'))
+    assert same is old
+    assert new.name == 'new'
+
+    registry.close()
+    assert new.closed
+    assert len(registry) == 0
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_switch_to_newer_cached_release():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+
+    with GeneThesaurus(data_dir=data_dir.name, refresh_interval=0) as gt:
+        gt.warmup(datasets=('hgnc',))
+        assert gt.update_gene_symbols(['TNFSF2']) == {'TNFSF2': 'TNF'}
+
+        # A newer release shows up in the data directory
+        write_hgnc(data_dir.name, '2023-02-28',
+                   [{'symbol': 'TNFNEW', 'prev_symbol': ['TNFSF2']}])
+        assert gt.update_gene_symbols(['TNFSF2']) == {'TNFSF2': 'TNFNEW'}
+
+
+def test_eviction_of_real_providers():
+    data_dir = tempfile.TemporaryDirectory()
+    for date in ('2023-01-31', '2023-02-28'):
+        write_hgnc(data_dir.name, date)
+
+    with GeneThesaurus(data_dir=data_dir.name, max_bytes=1) as gt:
+        # Providers open their indexes after they are loaded, so they are
+        # measured again on each access
+        assert gt.update_gene_symbols(['TNFSF2'], release='2023-01-31') == \
+            {'TNFSF2': 'TNF'}
+        assert gt.stats()['registry']['nbytes'] > 0
+
+        gt.update_gene_symbols(['TNFSF2'], release='2023-02-28')
+        assert gt.stats()['registry']['providers'] == 1
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_switch_to_newer_ncbi_download():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    ncbi_path = write_gene_info(data_dir.name)
+
+    with GeneThesaurus(data_dir=data_dir.name, refresh_interval=0) as gt:
+        assert gt.translate_genes(['81399'], source='entrez_id',
+                                  target='symbol') == {81399: 'OR4F16'}
+
+        # A newer NCBI file is downloaded
+        mtime = os.path.getmtime(ncbi_path)
+        write_gene_info(data_dir.name, [(81399, 'OR4F16NEW', '-')])
+        os.utime(ncbi_path, (mtime + 10, mtime + 10))
+        assert gt.translate_genes(['81399'], source='entrez_id',
+                                  target='symbol') == {81399: 'OR4F16NEW'}
+
+        # The table of a superseded HGNC release is dropped
+        write_hgnc(data_dir.name, '2023-02-28')
+        gt.translate_genes(['81399'], source='entrez_id', target='symbol')
+        assert gt.stats()['registry']['providers'] == 2
@@ -0,0 +1,132 @@
+from gene_thesaurus.hgnc_translation_provider import HgncTranslationProvider
+from gene_thesaurus.release_store import ReleaseDiff, ReleaseStore, \
+    match_rows
+import json
+import multiprocessing
+import numpy as np
+import os
+import tempfile
+from benchmarks.synthetic import make_hgnc_docs
+from tests.helpers import write_hgnc
+
+
+def _next_release(docs):
+    # Changes, removes and adds a few genes, and moves one
+    docs = [dict(doc) for doc in docs]
+    docs[3]['alias_symbol'] = docs[3].get('alias_symbol', []) + ['NEW3']
+    docs[10]['symbol'] = docs[10]['symbol'] + 'R'
+    del docs[7]
+    docs.append(docs.pop(0))
+    docs.append({'hgnc_id': 'HGNC:999999', 'symbol': 'ADDED1',
+                 'alias_symbol': [docs[20]['symbol']]})
+    return docs
+
+
+def test_deduplicated_releases():
+    data_dir = tempfile.TemporaryDirectory()
+    docs = make_hgnc_docs(200)
+    new_docs = _next_release(docs)
+    store = ReleaseStore(data_dir.name)
+    store.add_release('2023-01-31', docs)
+    records_path = os.path.join(data_dir.name, 'hgnc_records.jsonl')
+    size = os.path.getsize(records_path)
+    store.add_release('2023-02-28', new_docs)
+
+    assert store.releases() == ['2023-01-31', '2023-02-28']
+    assert list(store.iter_records('2023-01-31')) == docs
+    assert list(store.iter_records('2023-02-28')) == new_docs
+    # Only the three changed or added records were stored again
+    assert sum(1 for _ in open(records_path)) == len(docs) + 3
+    assert os.path.getsize(records_path) - size < 1000
+
+    assert store.diff('2023-01-31', '2023-02-28') == ReleaseDiff(
+        ['HGNC:999999'], ['HGNC:8'], ['HGNC:11', 'HGNC:4'])
+
+
+def test_match_rows():
+    row_map, rows = match_rows([10, 20, 30, 30], [30, 40, 10, 30])
+    assert row_map.tolist() == [2, -1, 0, -1]
+    assert rows.tolist() == [1, 3]
+
+
+def _index_files(hgnc):
+    paths = [*hgnc._index_paths().values(),
+             *hgnc._normalized_paths().values()]
+    return {os.path.basename(path): open(path, 'rb').read()
+            for path in paths}
+
+
+def test_incremental_build():
+    data_dir = tempfile.TemporaryDirectory()
+    docs = make_hgnc_docs(300)
+    write_hgnc(data_dir.name, '2023-01-31', docs=docs)
+    HgncTranslationProvider(data_dir.name,
+                            release='2023-01-31').build_indexes()
+
+    write_hgnc(data_dir.name, '2023-02-28', docs=_next_release(docs))
+    hgnc = HgncTranslationProvider(data_dir.name, release='2023-02-28')
+    hgnc.build_indexes()
+    updated = _index_files(hgnc)
+    hgnc.build_indexes(force=True)
+    assert updated == _index_files(hgnc)
+
+
+def test_prune_releases():
+    data_dir = tempfile.TemporaryDirectory()
+    docs = make_hgnc_docs(50)
+    for date, release_docs in (('2023-01-31', docs),
+                               ('2023-02-28', _next_release(docs))):
+        write_hgnc(data_dir.name, date, docs=release_docs)
+        HgncTranslationProvider(data_dir.name, release=date).build_indexes()
+    old = HgncTranslationProvider(data_dir.name, release='2023-01-31')
+    expected = old.lookup_symbols([docs[10]['symbol']])
+
+    assert HgncTranslationProvider.prune_releases(data_dir.name) == \
+        ['2023-01-31']
+    assert not any('2023-01-31' in filename and
+                   not filename.startswith('hgnc_release_')
+                   for filename in os.listdir(data_dir.name))
+
+    # Rebuilt from the store, without the complete set
+    old = HgncTranslationProvider(data_dir.name, release='2023-01-31')
+    assert old.lookup_symbols([docs[10]['symbol']]) == expected
+    assert np.load(os.path.join(
+        data_dir.name, 'candidates_keys_2023-01-31.npy')).size
+
+
+def _add_release(data_dir, date, docs, start):
+    start.wait()
+    ReleaseStore(data_dir).add_release(date, docs)
+
+
+def test_concurrent_releases():
+    data_dir = tempfile.TemporaryDirectory()
+    releases = {}
+    docs = make_hgnc_docs(200)
+    for month in range(1, 5):
+        releases[f'2023-0{month}-01'] = docs
+        docs = _next_release(docs)
+
+    # The processes append to the store at the same time
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    processes = [context.Process(target=_add_release,
+                                 args=(data_dir.name, date, docs, start))
+                 for date, docs in releases.items()]
+    for process in processes:
+        process.start()
+    start.set()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    store = ReleaseStore(data_dir.name)
+    assert store.releases() == sorted(releases)
+    for date, docs in releases.items():
+        assert list(store.iter_records(date)) == docs
+    # Each distinct record was stored once
+    with open(os.path.join(data_dir.name, 'hgnc_records.jsonl')) as f:
+        lines = f.readlines()
+    assert len(lines) == len(set(lines)) == len(
+        {json.dumps(doc, sort_keys=True)
+         for docs in releases.values() for doc in docs})
@@ -0,0 +1,131 @@
+from gene_thesaurus import GeneThesaurusClient
+from gene_thesaurus.client import ServerException
+from gene_thesaurus.release_store import ReleaseDiff
+from gene_thesaurus.server import TranslationServer
+from gene_thesaurus.symbol_multimap import SymbolCandidate
+import numpy as np
+import pytest
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from freezegun import freeze_time
+from tests.helpers import HGNC_DOCS, write_gene_info, write_hgnc
+
+
+@pytest.fixture
+def server():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    write_gene_info(data_dir.name)
+    server = TranslationServer(port=0, data_dir=data_dir.name,
+                               release='2023-01-31', cache_size=4,
+                               batch_window=0.05)
+    server.warmup()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    data_dir.cleanup()
+
+
+def test_client(server):
+    with GeneThesaurusClient(server.url) as client:
+        assert client.hgnc_release == '2023-01-31'
+        assert client.update_gene_symbols(
+            ['TNFSF2', 'ETV6', 'NOTAREALGENE']) == {'TNFSF2': 'TNF'}
+        assert client.translate_genes(['ERBB1', 'NOTAREALGENE']) == {
+            'ERBB1': 'ENSG00000146648'}
+        assert client.translate_genes(
+            ['ENSG00000139083'], source='ensembl_id', target='symbol') == {
+            'ENSG00000139083': 'ETV6'}
+        assert client.translate_genes(
+            ['81399', '100132287'], source='entrez_id',
+            target='ensembl_id') == {81399: 'ENSG00000284662',
+                                     100132287: ''}
+        translated = client.translate_array(np.array(['ETV6', 'TNFA',
+                                                      'ETV6', 'NOPE']))
+        assert translated.tolist() == ['ENSG00000139083', 'ENSG00000232810',
+                                       'ENSG00000139083', None]
+
+        assert client.update_gene_symbols(['ERBB1'], all_candidates=True) == {
+            'ERBB1': [SymbolCandidate('EGFR', 'ENSG00000146648', 1956,
+                                      'alias_symbol')]}
+
+        assert client.update_gene_symbols(['erbb1 '], normalize=True) == {
+            'erbb1 ': 'EGFR'}
+        assert [symbol for symbol, _ in client.complete('zscan')] == \
+            ['ZSCAN5C', 'ZSCAN5CP']
+
+        with pytest.raises(ValueError):
+            client.translate_genes(['ETV6'], source='symbol',
+                                   target='symbol')
+        with pytest.raises(ValueError):
+            client.translate_genes(['x'], source='entrez_id',
+                                   target='symbol')
+
+
+def test_client_warmup(server):
+    with GeneThesaurusClient(server.url) as client:
+        client.warmup()
+        assert client.update_gene_symbols(['TNFSF2']) == {'TNFSF2': 'TNF'}
+
+    # An unreachable server is reported up front
+    with GeneThesaurusClient('http://127.0.0.1:1', timeout=1) as client:
+        with pytest.raises(ServerException):
+            client.warmup()
+
+
+def test_concurrent_requests_are_batched(server):
+    genes = ['TNFSF2', 'ERBB1', 'ZSCAN5CP', 'TEL', 'NOTAREALGENE']
+    expected = {'TNFSF2': 'ENSG00000232810', 'ERBB1': 'ENSG00000146648',
+                'ZSCAN5CP': 'ENSG00000204532', 'TEL': 'ENSG00000139083'}
+
+    with GeneThesaurusClient(server.url) as client, \
+            ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(
+            lambda i: client.translate_genes(genes[i % 5:] + genes[:i % 5]),
+            range(64)))
+
+    assert all(result == expected for result in results)
+    assert server.n_batches < 64
+
+
+@freeze_time("2023-01-31 12:00:00")
+def test_cache_follows_newer_release():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    server = TranslationServer(port=0, data_dir=data_dir.name,
+                               batch_window=0, refresh_interval=0)
+    try:
+        assert server.lookup(['TNFSF2']) == ['TNF']
+
+        # A newer release shows up in the data directory
+        write_hgnc(data_dir.name, '2023-02-28',
+                   [{'symbol': 'TNFNEW', 'prev_symbol': ['TNFSF2']}])
+        assert server.lookup(['TNFSF2']) == ['TNFNEW']
+        assert server.hgnc_release == '2023-02-28'
+    finally:
+        server.server_close()
+
+
+@freeze_time("2023-02-28 12:00:00")
+def test_client_releases():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    write_hgnc(data_dir.name, '2023-02-28',
+               HGNC_DOCS[1:] + [{'symbol': 'TNFNEW',
+                                 'prev_symbol': ['TNFSF2']}])
+    server = TranslationServer(port=0, data_dir=data_dir.name)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        # Answered from the data directory of the server
+        with GeneThesaurusClient(server.url) as client:
+            diff = client.diff_releases('2023-01-31', '2023-02-28')
+            assert diff == ReleaseDiff(added=['TNFNEW'], removed=['TNF'],
+                                       changed=[])
+            assert client.releases() == ['2023-01-31', '2023-02-28']
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,114 @@
+from gene_thesaurus.index_builder import build_hgnc_maps, write_arrays
+from gene_thesaurus.symbol_multimap import MULTIMAP_NAMES, SymbolCandidate, \
+    SymbolMultimap, SymbolMultimapBuilder, normalize_symbol
+import os
+import sys
+import tempfile
+
+
+def test_candidates_are_ranked():
+    builder = SymbolMultimapBuilder()
+    records = [
+        {'symbol': 'EGFR', 'prev_symbol': ['ERBB'], 'alias_symbol': ['ERBB1'],
+         'ensembl_gene_id': 'ENSG00000146648', 'entrez_id': '1956'},
+        # Shares ERBB as an alias and lists its own alias twice
+        {'symbol': 'ERBB2', 'alias_symbol': ['ERBB', 'NEU', 'NEU'],
+         'entrez_id': '2064'},
+        {'symbol': 'ERBB', 'alias_symbol': ['EGFR']},
+    ]
+    assert list(builder.consume(records)) == records
+    multimap = SymbolMultimap(builder.build())
+
+    assert len(multimap) == 5
+    assert multimap.lookup(['ERBB', 'NEU', 'EGFR', 'NOPE']) == [
+        [SymbolCandidate('ERBB', None, None, 'symbol'),
+         SymbolCandidate('EGFR', 'ENSG00000146648', 1956, 'prev_symbol'),
+         SymbolCandidate('ERBB2', None, 2064, 'alias_symbol')],
+        [SymbolCandidate('ERBB2', None, 2064, 'alias_symbol')],
+        [SymbolCandidate('EGFR', 'ENSG00000146648', 1956, 'symbol'),
+         SymbolCandidate('ERBB', None, None, 'alias_symbol')],
+        []]
+
+
+def test_resolve_matches_symbol_indexes():
+    records = [
+        {'symbol': 'EGFR', 'prev_symbol': ['ERBB'],
+         'ensembl_gene_id': 'ENSG00000146648'},
+        # The later record wins a shared symbol, even without a value
+        {'symbol': 'ERBB2', 'alias_symbol': ['ERBB', 'NEU'],
+         'ensembl_gene_id': 'ENSG00000141736'},
+        {'symbol': 'NEU2', 'alias_symbol': ['NEU']},
+        # And a shared Ensembl ID
+        {'symbol': 'ERBB2B', 'ensembl_gene_id': 'ENSG00000141736'},
+    ]
+    builder = SymbolMultimapBuilder()
+    for record in records:
+        builder.add(record)
+    multimap = SymbolMultimap(builder.build())
+    maps = build_hgnc_maps(records)
+
+    symbols = ['ERBB', 'NEU', 'EGFR', 'NOPE', None, '']
+    assert multimap.resolve(symbols, 'ensembl_id') == \
+        [maps['symbol_to_ensembl'].get(s) for s in symbols] == \
+        ['ENSG00000141736', None, 'ENSG00000146648', None, None, None]
+    ensembl_ids = ['ENSG00000141736', 'ENSG00000146648', 'ENSG0']
+    assert multimap.resolve_by(ensembl_ids + [None], 'ensembl_id',
+                               'symbol') == \
+        [maps['ensembl_to_symbol'].get(e) for e in ensembl_ids] + [None] == \
+        ['ERBB2B', 'EGFR', None, None]
+
+
+def test_normalized_keys_and_completion():
+    assert normalize_symbol(' erbb1 ') == 'ERBB1'
+    assert normalize_symbol('"TNFSF2";') == 'TNFSF2'
+    assert normalize_symbol('ＥＧＦＲ') == 'EGFR'
+    assert normalize_symbol(None) is None
+
+    builder = SymbolMultimapBuilder(normalize=normalize_symbol)
+    builder.add({'symbol': 'C1orf112', 'alias_symbol': ['FLJ10706']})
+    builder.add({'symbol': 'EGFR', 'alias_symbol': ['ERBB1']})
+    builder.add({'symbol': 'ERBB2', 'alias_symbol': ['NEU']})
+    multimap = SymbolMultimap(builder.build())
+
+    c1orf112 = SymbolCandidate('C1orf112', None, None, 'symbol')
+    assert multimap.lookup(['C1ORF112', 'c1orf112']) == [[c1orf112], []]
+    assert [key for key, _ in multimap.complete('ERB')] == ['ERBB1', 'ERBB2']
+    assert multimap.complete('ERB', limit=1) == [
+        ('ERBB1', [SymbolCandidate('EGFR', None, None, 'alias_symbol')])]
+    assert multimap.complete('C1') == [('C1ORF112', [c1orf112])]
+    assert multimap.complete('X') == []
+    assert len(multimap.complete('')) == 6
+
+
+def test_memory_use():
+    records = [{'symbol': f'GENE{i}',
+                'prev_symbol': [f'OLD{i}'],
+                'alias_symbol': [f'ALIAS{i}', f'ALIAS{i + 1}'],
+                'ensembl_gene_id': f'ENSG{i:011d}',
+                'entrez_id': str(i)} for i in range(20000)]
+    builder = SymbolMultimapBuilder()
+    for record in records:
+        builder.add(record)
+    arrays = builder.build()
+
+    data_dir = tempfile.TemporaryDirectory()
+    paths = {name: os.path.join(data_dir.name, f'{name}.npy')
+             for name in MULTIMAP_NAMES}
+    write_arrays(arrays, paths)
+    multimap = SymbolMultimap.load(paths)
+    assert [c.symbol for c in multimap.lookup(['ALIAS7'])[0]] == \
+        ['GENE6', 'GENE7']
+
+    # The same candidates as a dict of lists of (gene, rank) pairs
+    candidates = {}
+    for gene_id, record in enumerate(records):
+        for rank, field in enumerate(('symbol', 'prev_symbol',
+                                      'alias_symbol')):
+            synonyms = record[field]
+            for key in [synonyms] if rank == 0 else synonyms:
+                candidates.setdefault(key, []).append((gene_id, rank))
+    dict_bytes = sys.getsizeof(candidates) + sum(
+        sys.getsizeof(key) + sys.getsizeof(value) +
+        sum(sys.getsizeof(pair) for pair in value)
+        for key, value in candidates.items())
+    assert multimap.nbytes < dict_bytes / 3
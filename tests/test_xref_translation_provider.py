@@ -0,0 +1,59 @@
+from gene_thesaurus.hgnc_translation_provider import HgncTranslationProvider
+from gene_thesaurus.xref_translation_provider import XrefTranslationProvider
+import tempfile
+from tests.helpers import HGNC_DOCS, GENE_INFO_ROWS, write_gene_info, \
+    write_hgnc
+
+
+def test_any_to_any_translation():
+    data_dir = tempfile.TemporaryDirectory()
+    # TEL is also an alias of a made-up gene listed before ETV6, which
+    # wins like in the HGNC indexes
+    docs = [{'symbol': 'FAKE1', 'alias_symbol': ['TEL'],
+             'ensembl_gene_id': 'ENSG00000000001'}] + HGNC_DOCS
+    hgnc_path = write_hgnc(data_dir.name, '2023-01-31', docs=docs)
+    # ETV6 lacks an Ensembl ID in NCBI, EGFR has one that HGNC overrides
+    rows = GENE_INFO_ROWS + [
+        (2120, 'ETV6', 'MIM:600618|HGNC:HGNC:3495'),
+        (1956, 'EGFR', 'HGNC:HGNC:3236|Ensembl:ENSG00000999999')]
+    ncbi_path = write_gene_info(data_dir.name, rows=rows)
+
+    xref = XrefTranslationProvider(data_dir.name, hgnc_path, '2023-01-31',
+                                   ncbi_path)
+    genes = ['ERBB1', 'ZSCAN5C', 'OR4F16', 'TEL', 'NOTAREALGENE']
+    assert xref.lookup(genes, 'symbol', 'entrez_id') == \
+        [1956, 649137, 81399, 2120, None]
+    assert xref.lookup(['ENSG00000146648', 'ENSG00000284662', 'ENSG1'],
+                       'ensembl_id', 'entrez_id') == [1956, 81399, None]
+    assert xref.lookup(['1956', 2120, 100132287], 'entrez_id',
+                       'ensembl_id') == \
+        ['ENSG00000146648', 'ENSG00000139083', None]
+    assert xref.lookup([7124, 100132287], 'entrez_id', 'symbol') == \
+        ['TNF', 'LOC100132287']
+    assert xref.lookup(['ENSG00000273874'], 'ensembl_id', 'symbol') == \
+        ['MIR6859-2']
+
+    # Entrez IDs as source keep their established dict format
+    assert xref.translate_list(['81399', '1'], 'entrez_id', 'symbol') == \
+        {81399: 'OR4F16', 1: ''}
+    assert xref.translate_list(['TNFSF2', 'TNF', 'NOPE'], 'symbol',
+                               'ensembl_id') == {
+        'TNFSF2': 'ENSG00000232810', 'TNF': 'ENSG00000232810'}
+    xref.close()
+
+    # The table is built once and reopened from the cache
+    reopened = XrefTranslationProvider(data_dir.name, hgnc_path,
+                                       '2023-01-31', ncbi_path)
+    assert reopened.lookup(['TEL'], 'symbol', 'entrez_id') == [2120]
+    reopened.close()
+
+
+def test_translate_list_from_hgnc_release():
+    data_dir = tempfile.TemporaryDirectory()
+    write_hgnc(data_dir.name, '2023-01-31')
+    ncbi_path = write_gene_info(data_dir.name)
+    hgnc = HgncTranslationProvider(data_dir.name, release='2023-01-31')
+    xref = XrefTranslationProvider(data_dir.name, hgnc.data_path,
+                                   hgnc.data_date, ncbi_path)
+    assert xref.translate_list(['ETV6'], 'symbol', 'entrez_id') == \
+        {'ETV6': 2120}